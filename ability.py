@@ -0,0 +1,102 @@
+import json
+
+# Targets and effect kinds that make an effect random
+RANDOM_TARGETS = {"RandomFriend", "RandomEnemy"}
+RANDOM_EFFECTS = {"OneOf", "SummonRandomPet"}
+
+
+class Target:
+    """Represents the compiled target of an ability effect."""
+    __slots__ = ("kind", "n", "including_future")
+
+    def __init__(self, target_json: dict):
+        """Initializes a target from the JSON dictionary representing it."""
+        self.kind = target_json["kind"]
+        self.n = target_json.get("n")
+        self.including_future = target_json.get("includingFuture", False)
+
+
+class Effect:
+    """Represents an ability effect, with its parameters resolved and its handler bound at load time."""
+    __slots__ = ("kind", "handler", "target", "source", "effects", "health_amount", "attack_amount", "until_end_of_battle",
+                 "with_health", "with_attack", "base_health", "base_attack", "amount", "attack_damage_percent", "percentage",
+                 "pet", "team", "tier", "level", "into", "status", "copy_health", "copy_attack", "damage_modifier", "applies_once",
+                 "is_random")
+
+    def __init__(self, effect_json: dict, handlers: dict):
+        """Initializes an effect from the JSON dictionary representing it.
+
+        Args:
+            effect_json (dict): The JSON of the effect.
+            handlers (dict): Maps effect kinds to the functions performing them. Unknown kinds get no handler.
+        """
+        self.kind = effect_json["kind"]
+        self.handler = handlers.get(self.kind)
+
+        target_json = effect_json.get("target") or effect_json.get("to")
+        self.target = Target(target_json) if target_json else None
+        self.source = Target(effect_json["from"]) if "from" in effect_json else None
+        self.effects = [Effect(effect, handlers) for effect in effect_json.get("effects", [])]
+
+        self.health_amount = effect_json.get("healthAmount", 0)
+        self.attack_amount = effect_json.get("attackAmount", 0)
+        self.until_end_of_battle = effect_json.get("untilEndOfBattle", False)
+        self.with_health = effect_json.get("withHealth", -1)
+        self.with_attack = effect_json.get("withAttack", -1)
+        self.base_health = effect_json.get("baseHealth", -1)
+        self.base_attack = effect_json.get("baseAttack", -1)
+        self.amount = effect_json.get("amount")
+        self.attack_damage_percent = effect_json.get("attackDamagePercent")
+        self.percentage = effect_json.get("percentage")
+
+        self.pet = effect_json.get("pet")
+        self.team = effect_json.get("team")
+        self.tier = effect_json.get("tier")
+        self.level = effect_json.get("level", 1)
+        self.into = effect_json.get("into")
+        self.status = effect_json.get("status")
+        self.copy_health = effect_json.get("copyHealth", False)
+        self.copy_attack = effect_json.get("copyAttack", False)
+        self.damage_modifier = effect_json.get("damageModifier")
+        self.applies_once = effect_json.get("appliesOnce", False)
+
+        self.is_random = (self.kind in RANDOM_EFFECTS or (self.target is not None and self.target.kind in RANDOM_TARGETS)
+                          or any(effect.is_random for effect in self.effects))
+
+
+class Ability:
+    """Represents an ability compiled from its JSON form, so it can be performed without reading the JSON again."""
+    __slots__ = ("description", "trigger", "triggered_by", "effect", "json", "owner")
+
+    def __init__(self, ability_json: dict | str, handlers: dict, owner=None):
+        """Initializes an ability from a JSON dictionary (or string) representing it.
+
+        Args:
+            ability_json (dict | str): The JSON of the ability.
+            handlers (dict): Maps effect kinds to the functions performing them.
+            owner (str): The id of the pet type the ability belongs to, if any.
+        """
+        if isinstance(ability_json, str):
+            ability_json = json.loads(ability_json)
+        self.json = ability_json
+        self.owner = owner
+        self.description = ability_json.get("description")
+        self.trigger = ability_json["trigger"]
+        self.triggered_by = ability_json["triggeredBy"]["kind"]
+        self.effect = Effect(ability_json["effect"], handlers)
+
+    def __setstate__(self, state):
+        """Restores a pickled ability, including ones pickled before abilities had owners."""
+        self.owner = None
+        for name, value in state[1].items():
+            setattr(self, name, value)
+
+    def __str__(self):
+        """Returns a string representation of the ability."""
+        return self.description
+
+
+def compile_abilities(abilities: dict, handlers: dict, owner=None):
+    """Compiles a dictionary of abilities by level, leaving already compiled abilities as they are."""
+    return {level: Ability(ability, handlers, owner) if isinstance(ability, dict) else ability
+            for level, ability in abilities.items()}
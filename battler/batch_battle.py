@@ -0,0 +1,359 @@
+import numpy as np
+
+from team import Team
+from pet import MAX_HEALTH, MAX_ATTACK
+from battler.battle_turn import BattleTurn, BattleResult, BATTLE_TRIGGERS, MAX_ROUNDS
+
+SLOTS = Team.TEAM_SIZE
+CELLS = 2 * SLOTS # Target cells of a pet, its own team's slots followed by the enemy team's slots
+
+# Triggers that can fire during a battle the kernel plays, pets listening to any of them must be supported by the kernel.
+# Summoned isn't one of them, since the kernel doesn't play battles with summons.
+KERNEL_TRIGGERS = BATTLE_TRIGGERS - {"Summoned"}
+
+NO_TRIGGER, START_OF_BATTLE, BEFORE_ATTACK, HURT, FAINT = range(5)
+TRIGGER_CODES = {"StartOfBattle": START_OF_BATTLE, "BeforeAttack": BEFORE_ATTACK, "Hurt": HURT, "Faint": FAINT}
+TRIGGERED_BY = {START_OF_BATTLE: "Player", BEFORE_ATTACK: "Self", HURT: "Self", FAINT: "Self"}
+
+MODIFY_STATS, DEAL_DAMAGE = 1, 2
+# Damage dealt by Hurt and Faint abilities is queued after the attack, which the kernel doesn't model
+EFFECT_CODES = {"ModifyStats": MODIFY_STATS, "DealDamage": DEAL_DAMAGE}
+IMMEDIATE_DAMAGE_TRIGGERS = {START_OF_BATTLE, BEFORE_ATTACK}
+
+(SELF, EACH_FRIEND, RANDOM_FRIEND, FRIEND_BEHIND, FRIEND_AHEAD, LEFT_MOST_FRIEND, RIGHT_MOST_FRIEND, ADJACENT_FRIENDS,
+ EACH_ENEMY, RANDOM_ENEMY, FIRST_ENEMY, LAST_ENEMY, LOWEST_HEALTH_ENEMY, HIGHEST_HEALTH_ENEMY, ALL) = range(15)
+TARGET_CODES = {
+    "Self": SELF, "EachFriend": EACH_FRIEND, "RandomFriend": RANDOM_FRIEND, "FriendBehind": FRIEND_BEHIND,
+    "FriendAhead": FRIEND_AHEAD, "LeftMostFriend": LEFT_MOST_FRIEND, "RightMostFriend": RIGHT_MOST_FRIEND,
+    "AdjacentFriends": ADJACENT_FRIENDS, "EachEnemy": EACH_ENEMY, "RandomEnemy": RANDOM_ENEMY, "FirstEnemy": FIRST_ENEMY,
+    "LastEnemy": LAST_ENEMY, "LowestHealthEnemy": LOWEST_HEALTH_ENEMY, "HighestHealthEnemy": HIGHEST_HEALTH_ENEMY, "All": ALL,
+}
+# Start of battle abilities run while iterating their own team, so they can't be allowed to remove pets from it
+FRIENDLY_TARGETS = {SELF, EACH_FRIEND, RANDOM_FRIEND, FRIEND_BEHIND, FRIEND_AHEAD, LEFT_MOST_FRIEND, RIGHT_MOST_FRIEND,
+                    ADJACENT_FRIENDS, ALL}
+
+# Results, scored the same way mcts.simulate scores a battle
+RESULT_SCORES = {BattleResult.TEAM_1_WIN.value: 1, BattleResult.TEAM_2_WIN.value: -1, BattleResult.DRAW.value: 0.5}
+
+PET_FIELDS = ("attack", "health", "trigger", "kind", "target", "n", "health_amount", "attack_amount", "amount", "percent",
+              "dealt_modifier", "dealt_once", "taken_modifier", "taken_once", "has_dealt", "has_taken")
+
+
+def encode_pet(pet):
+    """Encodes a pet as a tuple of PET_FIELDS, or returns None if the kernel can't play it."""
+    trigger = kind = target = n = health_amount = attack_amount = amount = percent = 0
+    ability = pet.get_ability()
+    if ability and ability.trigger in KERNEL_TRIGGERS:
+        trigger = TRIGGER_CODES.get(ability.trigger)
+        effect = ability.effect
+        kind = EFFECT_CODES.get(effect.kind)
+        if trigger is None or kind is None or ability.triggered_by != TRIGGERED_BY[trigger] or effect.target is None:
+            return None
+        target = TARGET_CODES.get(effect.target.kind)
+        if target is None:
+            return None
+        n = effect.target.n or 1
+        if kind == MODIFY_STATS:
+            health_amount = effect.health_amount
+            attack_amount = effect.attack_amount
+        else:
+            if trigger not in IMMEDIATE_DAMAGE_TRIGGERS or (trigger == START_OF_BATTLE and target in FRIENDLY_TARGETS):
+                return None
+            if effect.amount is not None:
+                amount = effect.amount
+            elif effect.attack_damage_percent is not None:
+                amount = -1
+                percent = effect.attack_damage_percent
+            else:
+                return None
+
+    dealt_modifier = dealt_once = taken_modifier = taken_once = has_dealt = has_taken = 0
+    status = pet.status
+    if status:
+        status_effect = status.ability.effect
+        if status.modifies_damage_dealt or status.modifies_damage_taken:
+            if status_effect.damage_modifier is None:
+                return None
+            if status.modifies_damage_dealt:
+                has_dealt, dealt_modifier, dealt_once = 1, status_effect.damage_modifier, status_effect.applies_once
+            else:
+                has_taken, taken_modifier, taken_once = 1, status_effect.damage_modifier, status_effect.applies_once
+        elif status.ability.trigger in KERNEL_TRIGGERS:
+            return None
+
+    return (pet.attack, pet.health, trigger, kind, target, n, health_amount, attack_amount, amount, percent,
+            dealt_modifier, dealt_once, taken_modifier, taken_once, has_dealt, has_taken)
+
+
+def encode_team(team):
+    """Encodes the pets of a team, or returns None if the kernel can't play it."""
+    if len(team.pets) > SLOTS:
+        return None
+    encoded = []
+    for pet in team.pets:
+        encoded_pet = encode_pet(pet)
+        if encoded_pet is None:
+            return None
+        encoded.append(encoded_pet)
+    return encoded
+
+
+def score_results(results):
+    """Returns the total score of a results array, as scored by mcts.simulate."""
+    counts = np.bincount(results, minlength=4)
+    return float(sum(counts[result] * score for result, score in RESULT_SCORES.items()))
+
+
+class BatchBattle:
+    """Plays many battles at once, advancing all of them in lockstep on arrays.
+
+    The kernel covers stat pets, damage modifying statuses, start of battle and before attack abilities that modify stats
+    or deal damage, and hurt or faint abilities that modify stats. Any other matchup is played by BattleTurn.
+    """
+
+    def __init__(self, matchups, game=None, rng=None):
+        """Initializes the batch.
+
+        Args:
+            matchups (list): Pairs of teams to battle.
+            game (Game): The game to battle in, used by matchups the kernel can't play.
+            rng (np.random.Generator): The generator used for random targets, seeded from the game's stream by default.
+        """
+        self.matchups = list(matchups)
+        self.game = game
+        if rng is None:
+            rng = np.random.default_rng(game.rng.getrandbits(64) if game is not None else None)
+        self.rng = rng
+
+    def play(self) -> np.ndarray:
+        """Play the battles and return an array of their BattleResult values."""
+        results = np.zeros(len(self.matchups), dtype=np.int8)
+        encoded_teams = {}
+        kernel_indices = []
+        kernel_matchups = []
+        for i, (team_1, team_2) in enumerate(self.matchups):
+            for team in (team_1, team_2):
+                if id(team) not in encoded_teams:
+                    encoded_teams[id(team)] = encode_team(team)
+            encoded_1, encoded_2 = encoded_teams[id(team_1)], encoded_teams[id(team_2)]
+            if encoded_1 is None or encoded_2 is None:
+                results[i] = BattleTurn(team_1, team_2, self.game).play().value
+            else:
+                kernel_indices.append(i)
+                kernel_matchups.append((encoded_1, encoded_2))
+
+        if kernel_matchups:
+            self._load(kernel_matchups)
+            results[kernel_indices] = self._play_kernel()
+            for i in kernel_indices:
+                for team in self.matchups[i]:
+                    for pet in team.pets:
+                        pet.trigger_end_of_battle()
+        return results
+
+    def _load(self, matchups):
+        """Loads the encoded matchups into (battle, side, slot) arrays."""
+        table = np.zeros((len(matchups), 2, SLOTS, len(PET_FIELDS)), dtype=np.float64)
+        alive = np.zeros((len(matchups), 2, SLOTS), dtype=bool)
+        for b, teams in enumerate(matchups):
+            for side, pets in enumerate(teams):
+                if pets:
+                    table[b, side, :len(pets)] = pets
+                    alive[b, side, :len(pets)] = True
+        self._load_table(table, alive)
+
+    def _load_table(self, table, alive):
+        """Loads (battle, side, slot, PET_FIELDS) and (battle, side, slot) arrays of encoded pets."""
+        for field_index, field in enumerate(PET_FIELDS):
+            dtype = np.float64 if field == "percent" else np.int64
+            setattr(self, f"_{field}", table[..., field_index].astype(dtype))
+        self._alive = alive
+        self._has_dealt = self._has_dealt.astype(bool)
+        self._has_taken = self._has_taken.astype(bool)
+
+    def play_table(self, table, alive) -> np.ndarray:
+        """Plays battles that are already encoded, and returns an array of their BattleResult values.
+
+        Args:
+            table (np.ndarray): The PET_FIELDS of the pets, by (battle, side, slot), with the front pets in the last
+                alive slots.
+            alive (np.ndarray): Whether there's a pet in each (battle, side, slot).
+        """
+        self._load_table(table, alive)
+        return self._play_kernel()
+
+    def _play_kernel(self):
+        """Plays the loaded battles and returns their results."""
+        battle_count = len(self._alive)
+        all_battles = np.arange(battle_count)
+
+        for side in (0, 1):
+            for slot in range(SLOTS):
+                rows = all_battles[self._alive[:, side, slot] & (self._trigger[:, side, slot] == START_OF_BATTLE)]
+                self._cast(rows, np.full(len(rows), side), np.full(len(rows), slot))
+
+        results = np.full(battle_count, BattleResult.DRAW.value, dtype=np.int8)
+        active = all_battles
+        for _ in range(MAX_ROUNDS):
+            team_1_alive = self._alive[active, 0].any(axis=1)
+            team_2_alive = self._alive[active, 1].any(axis=1)
+            results[active[team_1_alive & ~team_2_alive]] = BattleResult.TEAM_1_WIN.value
+            results[active[~team_1_alive & team_2_alive]] = BattleResult.TEAM_2_WIN.value
+            active = active[team_1_alive & team_2_alive]
+            if len(active) == 0:
+                break
+            self._play_next_attack(active)
+        return results
+
+    def _front(self, rows, side):
+        """Returns the slot of the front pet of a side in each battle."""
+        return SLOTS - 1 - np.argmax(self._alive[rows, side, ::-1], axis=1)
+
+    def _play_next_attack(self, rows):
+        """Plays an attack between the front pets of the battles."""
+        zeros, ones = np.zeros(len(rows), dtype=np.int64), np.ones(len(rows), dtype=np.int64)
+        front_1, front_2 = self._front(rows, 0), self._front(rows, 1)
+        damage_1, damage_2 = self._attack[rows, 0, front_1], self._attack[rows, 1, front_2]
+
+        # Before the attack, skipping it if a BeforeAttack ability killed its target
+        self._trigger_events(rows, zeros, front_1, BEFORE_ATTACK)
+        skip_attack = self._health[rows, 1, front_2] <= 0
+        self._trigger_events(rows, ones, front_2, BEFORE_ATTACK)
+        skip_attack |= self._health[rows, 0, front_1] <= 0
+        attacking = ~skip_attack
+        rows, zeros, ones = rows[attacking], zeros[attacking], ones[attacking]
+        front_1, front_2, damage_1, damage_2 = front_1[attacking], front_2[attacking], damage_1[attacking], damage_2[attacking]
+
+        # Play the attack, both pets hit before either of their hurt or faint abilities trigger
+        damage_1 = self._hit(rows, ones, front_2, damage_1 + self._use_dealt_modifier(rows, zeros, front_1))
+        damage_2 = self._hit(rows, zeros, front_1, damage_2 + self._use_dealt_modifier(rows, ones, front_2))
+        self._trigger_damage(rows, ones, front_2, damage_1)
+        self._trigger_damage(rows, zeros, front_1, damage_2)
+        self._remove_fainted(rows, ones, front_2)
+        self._remove_fainted(rows, zeros, front_1)
+
+    def _use_dealt_modifier(self, rows, sides, slots):
+        """Returns the damage modifier of the attackers' statuses, using up statuses that apply once."""
+        has_dealt = self._has_dealt[rows, sides, slots]
+        self._has_dealt[rows, sides, slots] = has_dealt & ~self._dealt_once[rows, sides, slots].astype(bool)
+        return np.where(has_dealt, self._dealt_modifier[rows, sides, slots], 0)
+
+    def _hit(self, rows, sides, slots, damage):
+        """Damages the targets after their statuses modify it, and returns the health they lost."""
+        has_taken = self._has_taken[rows, sides, slots]
+        self._has_taken[rows, sides, slots] = has_taken & ~self._taken_once[rows, sides, slots].astype(bool)
+        damage = damage - np.where(has_taken, self._taken_modifier[rows, sides, slots], 0)
+        self._health[rows, sides, slots] -= damage
+        return damage
+
+    def _trigger_damage(self, rows, sides, slots, damage):
+        """Triggers the hurt or faint abilities of the pets that lost health."""
+        damaged = damage != 0
+        rows, sides, slots = rows[damaged], sides[damaged], slots[damaged]
+        events = np.where(self._health[rows, sides, slots] <= 0, FAINT, HURT)
+        self._trigger_events(rows, sides, slots, events)
+
+    def _remove_fainted(self, rows, sides, slots):
+        """Removes the pets that fainted from their teams."""
+        self._alive[rows, sides, slots] &= self._health[rows, sides, slots] > 0
+
+    def _trigger_events(self, rows, sides, slots, events):
+        """Casts the abilities of the pets that are triggered by the events."""
+        triggered = self._trigger[rows, sides, slots] == events
+        self._cast(rows[triggered], sides[triggered], slots[triggered])
+
+    def _cast(self, rows, sides, slots):
+        """Casts the abilities of the pets."""
+        if len(rows) == 0:
+            return
+        kinds = self._kind[rows, sides, slots]
+        modify = kinds == MODIFY_STATS
+        if modify.any():
+            self._modify_stats(rows[modify], sides[modify], slots[modify])
+        deal = kinds == DEAL_DAMAGE
+        if deal.any():
+            self._deal_damage(rows[deal], sides[deal], slots[deal])
+
+    def _modify_stats(self, rows, sides, slots):
+        """Buffs the targets of modify stats abilities."""
+        target_sides, target_slots = self._targets(rows, sides, slots)
+        valid = target_slots >= 0
+        counts = valid.sum(axis=1)
+        target_rows = np.repeat(rows, counts)
+        health_amounts = np.repeat(self._health_amount[rows, sides, slots], counts)
+        attack_amounts = np.repeat(self._attack_amount[rows, sides, slots], counts)
+        target_sides, target_slots = target_sides[valid], target_slots[valid]
+        health = self._health[target_rows, target_sides, target_slots] + health_amounts
+        self._health[target_rows, target_sides, target_slots] = np.minimum(health, MAX_HEALTH)
+        attack = self._attack[target_rows, target_sides, target_slots] + attack_amounts
+        self._attack[target_rows, target_sides, target_slots] = np.minimum(attack, MAX_ATTACK)
+
+    def _deal_damage(self, rows, sides, slots):
+        """Deals the damage of deal damage abilities to their targets, one target at a time."""
+        amounts = self._amount[rows, sides, slots]
+        percent_damage = (self._attack[rows, sides, slots] * self._percent[rows, sides, slots] / 100).astype(np.int64)
+        damage = np.where(amounts == -1, percent_damage, amounts)
+        target_sides, target_slots = self._targets(rows, sides, slots)
+        for i in range(CELLS):
+            target_slot = target_slots[:, i]
+            hitting = target_slot >= 0
+            if not hitting.any():
+                break
+            hit_rows, hit_sides, hit_slots = rows[hitting], target_sides[hitting, i], target_slot[hitting]
+            in_team = self._alive[hit_rows, hit_sides, hit_slots]
+            hit_rows, hit_sides, hit_slots = hit_rows[in_team], hit_sides[in_team], hit_slots[in_team]
+            hit_damage = self._hit(hit_rows, hit_sides, hit_slots, damage[hitting][in_team])
+            self._trigger_damage(hit_rows, hit_sides, hit_slots, hit_damage)
+            self._remove_fainted(hit_rows, hit_sides, hit_slots)
+
+    def _targets(self, rows, sides, slots):
+        """Returns the (side, slot) targets of the pets' abilities in order, padded with -1 slots."""
+        count = len(rows)
+        own = self._alive[rows, sides]
+        enemy = self._alive[rows, 1 - sides]
+        positions = np.arange(SLOTS)
+        is_self = positions == slots[:, None]
+        behind = own & (positions < slots[:, None])
+        ahead = own & (positions > slots[:, None])
+
+        targets = self._target[rows, sides, slots]
+        limits = np.where(np.isin(targets, (RANDOM_FRIEND, FRIEND_BEHIND, FRIEND_AHEAD, RANDOM_ENEMY)),
+                          self._n[rows, sides, slots], CELLS)
+        limits[np.isin(targets, (LEFT_MOST_FRIEND, RIGHT_MOST_FRIEND, FIRST_ENEMY, LAST_ENEMY,
+                                 LOWEST_HEALTH_ENEMY, HIGHEST_HEALTH_ENEMY))] = 1
+
+        mask = np.zeros((count, CELLS), dtype=bool)
+        keys = np.zeros((count, CELLS), dtype=np.float64)
+        own_cells, enemy_cells = slice(0, SLOTS), slice(SLOTS, CELLS)
+        random_keys = self.rng.random((count, SLOTS))
+        enemy_health = self._health[rows, 1 - sides]
+
+        def select(target, cells, candidates, target_keys):
+            selected = targets == target
+            mask[selected, cells] = candidates[selected]
+            keys[selected, cells] = np.broadcast_to(target_keys, candidates.shape)[selected]
+
+        select(SELF, own_cells, own & is_self, positions)
+        select(EACH_FRIEND, own_cells, own & ~is_self, positions)
+        select(RANDOM_FRIEND, own_cells, own & ~is_self, random_keys)
+        select(FRIEND_BEHIND, own_cells, behind, -positions)
+        select(FRIEND_AHEAD, own_cells, ahead, positions)
+        select(LEFT_MOST_FRIEND, own_cells, own, positions)
+        select(RIGHT_MOST_FRIEND, own_cells, own, -positions)
+        nearest_behind = positions == (SLOTS - 1 - np.argmax(behind[:, ::-1], axis=1))[:, None]
+        nearest_ahead = positions == np.argmax(ahead, axis=1)[:, None]
+        select(ADJACENT_FRIENDS, own_cells, (behind & nearest_behind) | (ahead & nearest_ahead), ahead)
+        select(EACH_ENEMY, enemy_cells, enemy, positions)
+        select(RANDOM_ENEMY, enemy_cells, enemy, random_keys)
+        select(FIRST_ENEMY, enemy_cells, enemy, -positions)
+        select(LAST_ENEMY, enemy_cells, enemy, positions)
+        select(LOWEST_HEALTH_ENEMY, enemy_cells, enemy, enemy_health)
+        select(HIGHEST_HEALTH_ENEMY, enemy_cells, enemy, -enemy_health)
+        select(ALL, own_cells, own, positions)
+        select(ALL, enemy_cells, enemy, positions + SLOTS)
+
+        order = np.argsort(np.where(mask, keys, np.inf), axis=1, kind="stable")
+        valid = np.take_along_axis(mask, order, axis=1) & (np.arange(CELLS) < limits[:, None])
+        target_sides = np.where(order < SLOTS, sides[:, None], 1 - sides[:, None])
+        target_slots = np.where(valid, order % SLOTS, -1)
+        return target_sides, target_slots
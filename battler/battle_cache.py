@@ -0,0 +1,210 @@
+import random
+import sqlite3
+from collections import OrderedDict
+
+from state_hash import pet_abilities_key
+from battler.battle_turn import BattleTurn, BattleResult, BATTLE_TRIGGERS
+
+# Outcomes are stored as counts, in the order of this list
+RESULTS = [BattleResult.TEAM_1_WIN, BattleResult.TEAM_2_WIN, BattleResult.DRAW]
+# The amount of outcomes recorded for battles that can involve randomness, enough to sample them as a distribution
+DEFAULT_SAMPLES = 16
+# Bumped whenever the keys of the sqlite file change, files of other versions are rejected
+CACHE_VERSION = 1
+
+
+def team_fingerprint(team):
+    """Returns a canonical fingerprint of the team, which is equal for teams that battle the same way.
+
+    Pets that carry another type's abilities after a transfer have the ids of the pet types the abilities belong to,
+    see state_hash.pet_abilities_key.
+    """
+    return tuple((pet.pet_type.id, pet.attack, pet.health, pet.level, pet.experience, pet.status.id if pet.status else None,
+                  pet_abilities_key(pet)) for pet in team.pets)
+
+
+def effect_can_be_random(effect, game, seen=None):
+    """Returns whether performing the effect can involve randomness, including the abilities of pets it summons."""
+    if seen is None:
+        seen = set()
+    if effect.is_random or effect.kind == "TransferAbility": # A transfered ability can be any ability
+        return True
+    if effect.kind == "SummonPet" and effect.pet not in seen:
+        seen.add(effect.pet)
+        pet_type = game.pet_types.get(effect.pet)
+        if pet_type is None:
+            return True
+        if any(ability_can_be_random(ability, game, seen) for ability in pet_type.abilities.values()):
+            return True
+    if effect.kind == "ApplyStatus" and effect.status not in seen:
+        seen.add(effect.status)
+        status_type = game.status_types.get(effect.status)
+        if status_type is None or ability_can_be_random(status_type.ability, game, seen):
+            return True
+    return any(effect_can_be_random(nested_effect, game, seen) for nested_effect in effect.effects)
+
+
+def ability_can_be_random(ability, game, seen=None):
+    """Returns whether the ability can involve randomness in a battle."""
+    return ability.trigger in BATTLE_TRIGGERS and effect_can_be_random(ability.effect, game, seen)
+
+
+def battle_can_be_random(team_1, team_2, game):
+    """Returns whether a battle between the teams can involve randomness."""
+    seen = set()
+    for team in (team_1, team_2):
+        for pet in team.pets:
+            ability = pet.get_ability()
+            if ability and ability_can_be_random(ability, game, seen):
+                return True
+            if pet.status and ability_can_be_random(pet.status.ability, game, seen):
+                return True
+    return False
+
+
+def end_battle(team_1, team_2):
+    """Ends a battle that was answered from the cache, the same way BattleTurn.play ends it."""
+    for team in (team_1, team_2):
+        for pet in team.pets:
+            pet.trigger_end_of_battle()
+
+
+class BattleCache:
+    """Caches battle outcomes by the fingerprints of the battling teams.
+
+    Battles that can't involve randomness are played once and answered exactly from then on. Battles that can are
+    played until `samples` outcomes are recorded, and are then answered by sampling the recorded outcomes.
+    Outcomes are kept in an in-memory LRU, and optionally in an sqlite file that separate runs and processes share.
+    """
+
+    def __init__(self, max_size=100000, path=None, samples=DEFAULT_SAMPLES, rng=random):
+        """Initializes the cache.
+
+        Args:
+            max_size (int): The maximum amount of matchups to keep in memory.
+            path (str): The path of an sqlite file to store outcomes in, if any.
+            samples (int): The amount of outcomes to record for battles that can involve randomness.
+            rng (random.Random): The random stream recorded outcomes are sampled with.
+        """
+        self.max_size = max_size
+        self.samples = samples
+        self.rng = rng
+        self.outcomes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self._init_table(path)
+
+    def _init_table(self, path):
+        """Creates the outcomes table of a new sqlite file, or checks the version of an existing one."""
+        exists = self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'outcomes'").fetchone()
+        if exists:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_VERSION:
+                self.close()
+                raise ValueError(f"The cache {path} has version {version}, expected {CACHE_VERSION}")
+            return
+        self.connection.execute("CREATE TABLE IF NOT EXISTS outcomes (key TEXT PRIMARY KEY, team_1_wins INTEGER, "
+                                "team_2_wins INTEGER, draws INTEGER)")
+        self.connection.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.connection.commit()
+
+    @staticmethod
+    def get_key(team_1, team_2, game):
+        """Returns the cache key of a battle between the teams."""
+        return repr((game.pack, team_fingerprint(team_1), team_fingerprint(team_2)))
+
+    def play(self, team_1, team_2, game) -> BattleResult:
+        """Returns the result of a battle between the teams, playing it only if the cache can't answer it."""
+        key = self.get_key(team_1, team_2, game)
+        result = self.get_result(key, not battle_can_be_random(team_1, team_2, game))
+        if result is None:
+            result = BattleTurn(team_1, team_2, game).play()
+            self.record(key, result)
+        else:
+            end_battle(team_1, team_2)
+        return result
+
+    def play_batch(self, matchups, game):
+        """Returns an array of the BattleResult values of the matchups, playing the ones the cache can't answer in a batch."""
+        import numpy as np
+        from battler.batch_battle import BatchBattle
+
+        results = np.zeros(len(matchups), dtype=np.int8)
+        missing = []
+        missing_keys = []
+        for i, (team_1, team_2) in enumerate(matchups):
+            key = self.get_key(team_1, team_2, game)
+            result = self.get_result(key, not battle_can_be_random(team_1, team_2, game))
+            if result is None:
+                missing.append(i)
+                missing_keys.append(key)
+            else:
+                results[i] = result.value
+                end_battle(team_1, team_2)
+
+        if missing:
+            played = BatchBattle([matchups[i] for i in missing], game).play()
+            for key, result in zip(missing_keys, played):
+                self.record(key, BattleResult(int(result)), commit=False)
+            if self.connection is not None:
+                self.connection.commit()
+            results[missing] = played
+        return results
+
+    def get_outcomes(self, key):
+        """Returns the recorded [team 1 wins, team 2 wins, draws] of a key, or None if nothing is recorded."""
+        outcomes = self.outcomes.get(key)
+        if outcomes is not None:
+            self.outcomes.move_to_end(key)
+            return outcomes
+        if self.connection is not None:
+            row = self.connection.execute("SELECT team_1_wins, team_2_wins, draws FROM outcomes WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                outcomes = list(row)
+                self._remember(key, outcomes)
+        return outcomes
+
+    def get_result(self, key, deterministic):
+        """Returns a result for the key from the recorded outcomes, or None if the battle has to be played."""
+        outcomes = self.get_outcomes(key)
+        if outcomes is None or (not deterministic and sum(outcomes) < self.samples):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if deterministic:
+            return next(result for result, count in zip(RESULTS, outcomes) if count)
+        return self.rng.choices(RESULTS, weights=outcomes)[0]
+
+    def record(self, key, result: BattleResult, commit=True):
+        """Records an outcome of a battle."""
+        outcomes = self.get_outcomes(key)
+        if outcomes is None:
+            outcomes = [0, 0, 0]
+            self._remember(key, outcomes)
+        outcomes[RESULTS.index(result)] += 1
+
+        if self.connection is not None:
+            added = [int(result == RESULTS[i]) for i in range(len(RESULTS))]
+            self.connection.execute("INSERT INTO outcomes VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                                    "team_1_wins = team_1_wins + excluded.team_1_wins, "
+                                    "team_2_wins = team_2_wins + excluded.team_2_wins, draws = draws + excluded.draws",
+                                    (key, *added))
+            if commit:
+                self.connection.commit()
+
+    def _remember(self, key, outcomes):
+        """Keeps outcomes in memory, evicting the least recently used ones when the cache is full."""
+        self.outcomes[key] = outcomes
+        self.outcomes.move_to_end(key)
+        while len(self.outcomes) > self.max_size:
+            self.outcomes.popitem(last=False)
+
+    def close(self):
+        """Closes the sqlite file of the cache, if any."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -4,8 +4,11 @@ from team import Team
 from pet_type import PetType
 from pet import Pet
 from battler.attack import Attack
-import logging
-from utils.concat import concat_strings_horizontally
+from battler.event_context import EventContext, PetsSnapshot
+
+# The events a battle triggers, abilities triggered by anything else never act in a battle
+BATTLE_TRIGGERS = {"StartOfBattle", "BeforeAttack", "AfterAttack", "Hurt", "Faint", "KnockOut", "Summoned", "CastsAbility"}
+MAX_ROUNDS = 200 # Battles where neither front pet can hurt the other never end, they are counted as draws
 
 class BattleResult(Enum):
     """Represents the result of a battle between 2 teams."""
@@ -18,29 +21,32 @@ class BattleTurn:
     """Represents a super auto pets turn of a battle between 2 teams."""
 
     # Rework battle turn to not depend on game, possible GameMetadata/GameData/Metadata class?
-    def __init__(self, team_1: Team, team_2: Team, game=None):
-        self.team_1 = team_1.clone()
-        self.team_2 = team_2.clone()
+    def __init__(self, team_1: Team, team_2: Team, game=None, rng=None):
+        # The battle's clones are thrown away, so they don't keep their state hashes up to date
+        self.team_1 = team_1.clone(track_hash=False)
+        self.team_2 = team_2.clone(track_hash=False)
         self.original_teams = {self.team_1: team_1, self.team_2: team_2}
         self.game = game
-        self.event_data = {"pet_types": self.game.pet_types, "food_types": self.game.food_types, "status_types": self.game.status_types,
-                            "turn_type": "battle", "turn": self, "team_1": self.team_1, "team_2": self.team_2}
+        self.rng = rng if rng is not None else game.rng
+        self.event_data = EventContext(self, "battle", self.game.pet_types, self.game.food_types, self.game.status_types)
+        self.team_contexts = {
+            self.team_1: self.event_data.copy(team=self.team_1, original_team=team_1, enemy_team=self.team_2),
+            self.team_2: self.event_data.copy(team=self.team_2, original_team=team_2, enemy_team=self.team_1),
+        }
 
 
-    def play(self, log=True) -> BattleResult:
-        """Play the battle and return the result."""
-        if log:
-            team_strings = [str(self.team_1), str(self.team_2)]
-            # logging.debug(concat_strings_horizontally(team_strings, "|"))
+    def play(self, trace=None) -> BattleResult:
+        """Play the battle and return the result. With a BattleTrace, the events of the battle are recorded to it."""
+        if trace is not None:
+            return trace.record(self)
 
         self.queued_attacks = {self.team_1: [], self.team_2: []}
 
-        team_1_data = {"team": self.team_1, "original_team": self.original_teams[self.team_1], "enemy_team": self.team_2} | self.event_data
-        team_2_data = {"team": self.team_2, "original_team": self.original_teams[self.team_2], "enemy_team": self.team_1} | self.event_data
-        self.trigger_event("StartOfBattle", team_1_data | self.event_data)
-        self.trigger_event("StartOfBattle", team_2_data | self.event_data)
+        self.trigger_event("StartOfBattle", self.team_contexts[self.team_1])
+        self.trigger_event("StartOfBattle", self.team_contexts[self.team_2])
 
-        while True:
+        battle_result = BattleResult.DRAW
+        for _ in range(MAX_ROUNDS):
             if len(self.team_1.pets) == 0 and len(self.team_2.pets) == 0:
                 battle_result = BattleResult.DRAW
                 break
@@ -53,10 +59,6 @@ class BattleTurn:
 
             self.play_next_attack()
 
-            if log:
-                team_strings = [str(self.team_1), str(self.team_2)]
-                # logging.debug(concat_strings_horizontally(team_strings, "|"))
-
         for original_team in self.original_teams.values():
             for pet in original_team.pets:
                 pet.trigger_end_of_battle()
@@ -99,24 +101,28 @@ class BattleTurn:
 
     def play_attack(self, team_1_attack: Attack, team_2_attack: Attack):
         """Play a double-sided or single-sided attack"""
-        team_1_data = {"team": self.team_1, "original_team": self.original_teams[self.team_1], "team_pets_snapshot": self.team_1.pets[:], "enemy_team": self.team_2} | self.event_data
-        team_2_data = {"team": self.team_2, "original_team": self.original_teams[self.team_2], "team_pets_snapshot": self.team_2.pets[:], "enemy_team": self.team_1} | self.event_data
-        team_data_dicts = {self.team_1: team_1_data, self.team_2: team_2_data}
+        team_1_snapshot = PetsSnapshot(self.team_1)
+        team_2_snapshot = PetsSnapshot(self.team_2)
+        team_1_data = self.team_contexts[self.team_1]
+        team_2_data = self.team_contexts[self.team_2]
+        snapshots = {self.team_1: team_1_snapshot, self.team_2: team_2_snapshot}
 
         # Before the attack
         skip_attack = False
         if team_1_attack and team_1_attack.is_main_attack:
-            self.trigger_event("BeforeAttack", {"pet": team_1_attack.attacker} | team_1_data, team_1_attack.is_main_attack)
+            self.trigger_event("BeforeAttack", team_1_data, team_1_attack.is_main_attack, team_1_attack.attacker, team_1_snapshot)
             if all(target.health <= 0 for target in team_1_attack.targets):
                 skip_attack = True
 
         if team_2_attack and team_2_attack.is_main_attack:
-            self.trigger_event("BeforeAttack", {"pet": team_2_attack.attacker} | team_2_data, team_2_attack.is_main_attack)
+            self.trigger_event("BeforeAttack", team_2_data, team_2_attack.is_main_attack, team_2_attack.attacker, team_2_snapshot)
             if all(target.health <= 0 for target in team_2_attack.targets):
                 skip_attack = True
 
         # If a BeforeAttack ability killed all targets, skip the attack
         if skip_attack:
+            team_1_snapshot.release()
+            team_2_snapshot.release()
             return
 
         # Get attack targets
@@ -148,34 +154,42 @@ class BattleTurn:
                     event_type = "Faint"
                 else:
                     event_type = "Hurt"
-                self.trigger_event(event_type, {"pet": team_1_target} | team_data_dicts[team_1_target_team])
+                self.trigger_event(event_type, self.team_contexts[team_1_target_team], True, team_1_target, snapshots[team_1_target_team])
 
             if cast_team_2_attack and team_2_attack_damage:
                 if team_2_target.health <= 0:
                     event_type = "Faint"
                 else:
                     event_type = "Hurt"
-                self.trigger_event(event_type, {"pet": team_2_target} | team_data_dicts[team_2_target_team])
+                self.trigger_event(event_type, self.team_contexts[team_2_target_team], True, team_2_target, snapshots[team_2_target_team])
 
             if cast_team_1_attack and team_1_target.health <= 0:
-                team_1_target_team.pets.remove(team_1_target)
-                self.trigger_event("KnockOut", {"pet": team_1_attack.attacker} | team_1_data, team_1_attack.is_main_attack)
+                team_1_target_team.remove_pet(team_1_target)
+                self.trigger_event("KnockOut", team_1_data, team_1_attack.is_main_attack, team_1_attack.attacker, team_1_snapshot)
             if cast_team_2_attack and team_2_target.health <= 0:
-                team_2_target_team.pets.remove(team_2_target)
-                self.trigger_event("KnockOut", {"pet": team_2_attack.attacker} | team_2_data, team_2_attack.is_main_attack)
+                team_2_target_team.remove_pet(team_2_target)
+                self.trigger_event("KnockOut", team_2_data, team_2_attack.is_main_attack, team_2_attack.attacker, team_2_snapshot)
 
         # After the attack
         if team_1_attack and team_1_attack.is_main_attack:
-            self.trigger_event("AfterAttack", {"pet": team_1_attack.attacker} | team_1_data, team_1_attack.is_main_attack)
+            self.trigger_event("AfterAttack", team_1_data, team_1_attack.is_main_attack, team_1_attack.attacker, team_1_snapshot)
         if team_2_attack and team_2_attack.is_main_attack:
-            self.trigger_event("AfterAttack", {"pet": team_2_attack.attacker} | team_2_data, team_2_attack.is_main_attack)
+            self.trigger_event("AfterAttack", team_2_data, team_2_attack.is_main_attack, team_2_attack.attacker, team_2_snapshot)
+        team_1_snapshot.release()
+        team_2_snapshot.release()
 
-    def trigger_event(self, event_type, event_data, include_self=True):
+    def trigger_event(self, event_type, event_data, include_self=True, pet=None, snapshot=None):
         """
         Called when a pet in the team triggers an event.
+        The triggering pet and the snapshot of the team can be given separately, so the context is only copied when
+        the event has listeners.
         """
-        triggering_pet = event_data.get("pet")
-        team = event_data["team"]
+        team = event_data.team
+        if not team.has_listeners(event_type):
+            return
+        if pet is not None:
+            event_data = event_data.copy(pet=pet, snapshot=snapshot)
+        triggering_pet = event_data.pet
         for pet in team.pets:
             if not include_self and pet and pet == triggering_pet:
                 continue
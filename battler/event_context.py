@@ -0,0 +1,90 @@
+class PetsSnapshot:
+    """A snapshot of the pets of a team, which is only copied if the team changes while the snapshot is in use."""
+    __slots__ = ("team", "pets")
+
+    def __init__(self, team):
+        self.team = team
+        self.pets = None
+        if team.pending_snapshots is None:
+            team.pending_snapshots = []
+        team.pending_snapshots.append(self)
+
+    def get(self):
+        """Returns the pets of the team at the time the snapshot was taken."""
+        if self.pets is None: # The team hasn't changed since
+            return self.team.pets
+        return self.pets
+
+    def release(self):
+        """Stops tracking changes to the team, after which the snapshot shouldn't be read."""
+        if self.pets is None:
+            self.team.pending_snapshots.remove(self)
+
+
+class EventContext:
+    """Represents the data of a triggered event, which is passed to the abilities it triggers.
+
+    Contexts are treated as immutable, events derive their context from a base context with copy.
+    """
+    __slots__ = ("turn", "turn_type", "pet_types", "food_types", "status_types", "shop", "team", "original_team",
+                 "enemy_team", "pet", "food", "purchase_target", "snapshot", "ability_context", "repeated")
+
+    def __init__(self, turn, turn_type, pet_types, food_types, status_types, shop=None, team=None, original_team=None,
+                 enemy_team=None):
+        """Initializes a base context of a turn.
+
+        Args:
+            turn (BattleTurn | ShopTurn): The turn the event happened in.
+            turn_type (str): "battle" or "shop".
+            pet_types (dict): The dictionary of pet types in the game.
+            food_types (dict): The dictionary of food types in the game.
+            status_types (dict): The dictionary of status types in the game.
+            shop (Shop): The shop of the turn, in shop turns.
+            team (Team): The team the event happened in.
+            original_team (Team): The team the event's team was cloned from, if any.
+            enemy_team (Team): The team opposing the event's team, in battles.
+        """
+        self.turn = turn
+        self.turn_type = turn_type
+        self.pet_types = pet_types
+        self.food_types = food_types
+        self.status_types = status_types
+        self.shop = shop
+        self.team = team
+        self.original_team = original_team
+        self.enemy_team = enemy_team
+        self.pet = None # The pet that triggered the event
+        self.food = None # The food that triggered the event
+        self.purchase_target = None # The pet a food was bought for
+        self.snapshot = None # A PetsSnapshot of the team at the start of the attack, in battles
+        self.ability_context = None # The context of the ability that was cast, for CastsAbility events
+        self.repeated = False # Whether the ability is being repeated, so it doesn't trigger CastsAbility again
+
+    @property
+    def team_pets_snapshot(self):
+        """Returns the pets of the team at the start of the attack, or None if there's no snapshot."""
+        if self.snapshot is None:
+            return None
+        return self.snapshot.get()
+
+    def copy(self, **changes):
+        """Returns a copy of the context, with the given fields changed."""
+        context = EventContext.__new__(EventContext)
+        context.turn = self.turn
+        context.turn_type = self.turn_type
+        context.pet_types = self.pet_types
+        context.food_types = self.food_types
+        context.status_types = self.status_types
+        context.shop = self.shop
+        context.team = self.team
+        context.original_team = self.original_team
+        context.enemy_team = self.enemy_team
+        context.pet = self.pet
+        context.food = self.food
+        context.purchase_target = self.purchase_target
+        context.snapshot = self.snapshot
+        context.ability_context = self.ability_context
+        context.repeated = self.repeated
+        for name, value in changes.items():
+            setattr(context, name, value)
+        return context
@@ -0,0 +1,265 @@
+import os
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from itertools import islice
+
+from pet import Pet
+from team import Team
+from battler.game import Game
+from battler.player import Player
+from battler.battle_turn import BattleResult
+from battler.battle_cache import team_fingerprint
+from battler.rng import make_rng
+from battler.policies import DEFAULT_POLICY, get_policy
+
+# The catalogs of a worker process, loaded once by its initializer
+_worker_catalogs = None
+_worker_games = {}
+_worker_pools = {}
+
+
+@dataclass
+class GameSpec:
+    """A class that represents a game to be played by an executor."""
+
+    pack: str = field(default="StandardPack")
+    players: tuple = field(default=("Me", "You"))
+    seed: int = field(default=None) # The seed of the game's random stream, which makes it reproducible
+    policies: tuple = field(default=None) # The names of the policies of the players, the default one for all of them
+
+    def build(self, pet_types, food_types, status_types):
+        """Returns the game of the spec, ready to be played."""
+        policies = self.policies or (DEFAULT_POLICY,) * len(self.players)
+        players = [Player(name, policy) for name, policy in zip(self.players, policies)]
+        return Game(pet_types, food_types, status_types, players, self.pack, make_rng(self.seed))
+
+
+def _get_abilities(abilities_key, pet_types):
+    """Returns the abilities of a state_hash.pet_abilities_key, None for a pet's own abilities."""
+    if abilities_key is None:
+        return None
+    # Transferred abilities are the abilities of a single pet type, and every pet type without abilities has the same
+    return pet_types[abilities_key[0]].abilities if abilities_key else {}
+
+
+def team_from_fingerprint(fingerprint, pet_types, status_types):
+    """Builds a team from its fingerprint, resolving the ids against the catalogs."""
+    team = Team()
+    for pet_type_id, attack, health, level, experience, status_id, abilities_key in fingerprint:
+        status = status_types[status_id] if status_id else None
+        team.add_pet(Pet(pet_types[pet_type_id], team, health, attack, level, experience, status,
+                         _get_abilities(abilities_key, pet_types)))
+    return team
+
+
+def _init_worker(pet_types, food_types, status_types, catalog_path=None):
+    """Loads the catalogs into a worker process, from the catalog file if one is given."""
+    global _worker_catalogs
+    if catalog_path is not None:
+        from catalog import load_catalog
+        pet_types, food_types, status_types = load_catalog(catalog_path)
+    _worker_catalogs = (pet_types, food_types, status_types)
+    _worker_games.clear()
+    _worker_pools.clear()
+    random.seed() # Forked workers would otherwise share the global random state of the parent
+
+
+def get_worker_catalogs():
+    """Returns the pet, food and status types of the current worker process."""
+    return _worker_catalogs
+
+
+def _get_worker_game(pack):
+    """Returns the game battles of a pack are played in, creating it once per worker."""
+    if pack not in _worker_games:
+        _worker_games[pack] = Game(*_worker_catalogs, [Player("Dummy")], pack)
+    return _worker_games[pack]
+
+
+def _battle_chunk(pack, seed, start, chunk):
+    """Battles a chunk of fingerprint pairs in a worker and returns their BattleResult values."""
+    from battler.batch_battle import BatchBattle
+
+    pet_types, _, status_types = _worker_catalogs
+    matchups = [(team_from_fingerprint(fingerprint_1, pet_types, status_types),
+                 team_from_fingerprint(fingerprint_2, pet_types, status_types)) for fingerprint_1, fingerprint_2 in chunk]
+    game = _get_worker_game(pack)
+    # Each chunk gets its own stream, so the results don't depend on which worker played it
+    game.rng = make_rng(None if seed is None else f"{seed}:{start}")
+    return [int(result) for result in BatchBattle(matchups, game).play()]
+
+
+def _shop_turn_chunk(start, chunk):
+    """Plays a chunk of shop turns in a worker and returns the encoded teams they end with."""
+    from serialization import encode_teams, decode_teams
+    from battler.shop_turn import ShopTurn
+
+    pet_types, food_types, status_types = _worker_catalogs
+    teams = []
+    for pack, turn, arrays, lost_last_battle, seed, policy in chunk:
+        player = Player("Dummy", policy)
+        game = Game(pet_types, food_types, status_types, [player], pack, make_rng(seed))
+        game.turn = turn
+        if lost_last_battle:
+            game.battle_results.append({"result": BattleResult.TEAM_2_WIN, "winner": None, "loser": player})
+        player.team = decode_teams(arrays, pet_types, status_types)[0]
+        get_policy(policy)(ShopTurn(player, game))
+        teams.append(encode_teams([player.team], pet_types))
+    return teams
+
+
+def _get_worker_pool(path):
+    """Returns the opponent pool at a path, mapping it once per worker."""
+    if path not in _worker_pools:
+        from opponent_pool import OpponentPool
+        pet_types, _, status_types = _worker_catalogs
+        _worker_pools[path] = OpponentPool(path, pet_types, status_types)
+    return _worker_pools[path]
+
+
+def _pool_chunk(pack, seed, path, fingerprint, start, chunk):
+    """Battles a team against a chunk of the indices of an opponent pool in a worker and returns their BattleResult values."""
+    import numpy as np
+
+    pet_types, _, status_types = _worker_catalogs
+    team = team_from_fingerprint(fingerprint, pet_types, status_types)
+    game = _get_worker_game(pack)
+    game.rng = make_rng(None if seed is None else f"{seed}:{start}")
+    return _get_worker_pool(path).battle(team, game, np.array(chunk, dtype=np.int64)).tolist()
+
+
+def _game_chunk(start, chunk):
+    """Plays a chunk of games in a worker and returns their winners."""
+    return [game_spec.build(*_worker_catalogs).play() for game_spec in chunk]
+
+
+def _record_chunk(start, chunk):
+    """Plays a chunk of games in a worker and returns their records."""
+    from battler.simulation import get_game_record
+
+    records = []
+    for game_spec in chunk:
+        game = game_spec.build(*_worker_catalogs)
+        game.play()
+        records.append(get_game_record(game_spec, game))
+    return records
+
+
+class BattleExecutor:
+    """Spreads battles and games across a pool of worker processes.
+
+    Each worker loads the catalogs once when it starts, and tasks only carry team fingerprints or game specs.
+    """
+
+    def __init__(self, pet_types=None, food_types=None, status_types=None, max_workers=None, chunk_size=64,
+                 catalog_path=None):
+        """Initializes the executor.
+
+        Args:
+            pet_types (dict): The dictionary of pet types in the game.
+            food_types (dict): The dictionary of food types in the game.
+            status_types (dict): The dictionary of status types in the game.
+            max_workers (int): The amount of worker processes, defaults to the amount of cores.
+            chunk_size (int): The amount of battles or games sent to a worker at a time.
+            catalog_path (str): A catalog file for workers to load the types from, instead of receiving them.
+        """
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        if catalog_path is not None:
+            pet_types = food_types = status_types = None
+        self.pool = ProcessPoolExecutor(self.max_workers, initializer=_init_worker,
+                                        initargs=(pet_types, food_types, status_types, catalog_path))
+
+    def battle(self, matchups, pack="StandardPack", ordered=True, seed=None):
+        """Battles pairs of teams, yielding BattleResults in order, or (index, BattleResult) pairs as they complete.
+
+        With a seed, the random streams of the battles are derived from it, so the results are reproducible.
+        """
+        fingerprints = ((team_fingerprint(team_1), team_fingerprint(team_2)) for team_1, team_2 in matchups)
+        for item in self._map(_battle_chunk, fingerprints, ordered, pack, seed):
+            if ordered:
+                yield BattleResult(item)
+            else:
+                yield item[0], BattleResult(item[1])
+
+    def battle_pool(self, team, pool, indices=None, pack="StandardPack", seed=None):
+        """Battles a team against teams of an opponent pool, and returns an array of the BattleResult values in order.
+
+        Workers map the pool's files themselves, so only the team and the indices are sent to them.
+
+        Args:
+            team (Team): The team to battle, as team 1.
+            pool (OpponentPool): The pool of the opponents.
+            indices (np.ndarray): The indices of the opponents, defaults to the whole pool.
+            pack (str): The pack of the game to battle in.
+            seed (int): Derives the random streams of the battles, so the results are reproducible.
+        """
+        import numpy as np
+        from opponent_pool import BATTLE_CHUNK_SIZE
+
+        indices = np.arange(len(pool)) if indices is None else np.asarray(indices)
+        chunk_size = min(BATTLE_CHUNK_SIZE, max(self.chunk_size, -(-len(indices) // self.max_workers)))
+        results = self._map(_pool_chunk, indices.tolist(), True, pack, seed, os.path.abspath(pool.path),
+                            team_fingerprint(team), chunk_size=chunk_size)
+        return np.fromiter(results, dtype=np.int8, count=len(indices))
+
+    def play_shop_turns(self, turn_states, ordered=True):
+        """Plays shop turns, yielding the teams they end with in order, encoded by serialization.encode_teams.
+
+        Each turn state is a (pack, turn, encoded team, whether the player lost their last battle, seed, policy name)
+        tuple.
+        """
+        yield from self._map(_shop_turn_chunk, turn_states, ordered, chunk_size=1)
+
+    def play_games(self, game_specs, ordered=True):
+        """Plays games, yielding their winners in order, or (index, winner) pairs as they complete."""
+        yield from self._map(_game_chunk, game_specs, ordered)
+
+    def record_games(self, game_specs, ordered=True):
+        """Plays games, yielding their records (see simulation.get_game_record) in order, or (index, record) pairs as
+        they complete.
+        """
+        yield from self._map(_record_chunk, game_specs, ordered)
+
+    def _map(self, function, items, ordered, *args, chunk_size=None):
+        """Submits the items in chunks, keeping a bounded amount of chunks in flight, and streams back their results.
+
+        The function is called with the arguments, the index of the chunk's first item and the chunk. Chunks are of the
+        executor's chunk size unless given another.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        items = iter(items)
+        max_in_flight = 2 * self.max_workers
+        in_flight = deque()
+        start = 0
+        while True:
+            while len(in_flight) < max_in_flight:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append((start, self.pool.submit(function, *args, start, chunk)))
+                start += len(chunk)
+            if not in_flight:
+                return
+
+            if ordered:
+                _, future = in_flight.popleft()
+                yield from future.result()
+            else:
+                done, _ = wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+                for chunk_start, future in [item for item in in_flight if item[1] in done]:
+                    in_flight.remove((chunk_start, future))
+                    for i, result in enumerate(future.result()):
+                        yield chunk_start + i, result
+
+    def close(self):
+        """Shuts down the worker processes."""
+        self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
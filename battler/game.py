@@ -1,7 +1,12 @@
 from battler.player import Player
 from battler.battle_turn import BattleTurn, BattleResult
+from battler.battle_cache import end_battle
 from battler.shop_turn import ShopTurn
+from battler.game_rules import GameRules
+from battler.policies import get_policy
 import logging
+import random
+from itertools import takewhile
 from utils.concat import concat_strings_horizontally
 
 TURNS_TO_LIVES = {
@@ -14,61 +19,137 @@ TURNS_TO_LIVES = {
 }
 
 class Game:
-    def __init__(self, pet_types, food_types, status_types, players=[], pack="StandardPack"):
+    def __init__(self, pet_types, food_types, status_types, players=[], pack="StandardPack", rng=None):
         self.pack = pack
-        self.triggers = {}
-        for pet_id, pet_type in pet_types.items():
-            for ability in pet_type.abilities.values():
-                self.triggers[ability["trigger"]] = self.triggers.get(ability["trigger"], set()) | {pet_id}
-        for food_id, food_type in food_types.items():
-            ability = food_type.ability
-            self.triggers[ability["trigger"]] = self.triggers.get(ability["trigger"], set()) | {food_id}
-        for status_id, status_type in status_types.items():
-            ability = status_type.ability
-            self.triggers[ability["trigger"]] = self.triggers.get(ability["trigger"], set()) | {status_id}
-        for pet_id, pet_type in pet_types.items():
-            for ability in pet_type.abilities.values():
-                if ability["effect"]["kind"] == "TransferAbility": # A transfered ability can become any type of ability
-                    for trigger in self.triggers:
-                        self.triggers[trigger] |= {pet_id}
-
-        self.pet_types = {pet_id: pet_type for pet_id, pet_type in pet_types.items() if pack in pet_type.packs}
-        self.food_types = {food_id: food_type for food_id, food_type in food_types.items() if pack in food_type.packs}
-        self.status_types = status_types
+        # The random stream of the game and all of its turns, the global random module if none is given
+        self.rng = rng if rng is not None else random
+        # The rules are shared by every game of the pack, so creating a game does no catalog work
+        self.rules = GameRules.get(pet_types, food_types, status_types, pack)
+        self.triggers = self.rules.triggers
+        self.pet_types = self.rules.pet_types
+        self.food_types = self.rules.food_types
+        self.status_types = self.rules.status_types
 
         self.players = players
         self.battle_results = []
         self.turn = 1
+        self.eliminated = [] # The players knocked out, in the order they were
+        self.last_opponents = {} # Every player to the opponent of their last battle
 
-    def play(self):
-        logging.info(str(self))
-        while all(player.health > 0 for player in self.players):
-            for player in self.players:
-                logging.info(f"Shop turn for player {player.name}:")
-                ShopTurn(player, self).play()
-            # TODO: Support more than 2 players
-            battle_result = BattleTurn(self.players[0].team, self.players[1].team, self).play()
-            if battle_result == BattleResult.TEAM_1_WIN:
-                self.players[1].health -= TURNS_TO_LIVES.get(self.turn, 3)
-                self.battle_results.append({"result": BattleResult.TEAM_1_WIN, "winner": self.players[0], "loser": self.players[1]})
-            elif battle_result == BattleResult.TEAM_2_WIN:
-                self.players[0].health -= TURNS_TO_LIVES.get(self.turn, 3)
-                self.battle_results.append({"result": BattleResult.TEAM_2_WIN, "winner": self.players[1], "loser": self.players[0]})
-            else:
-                self.battle_results.append({"result": BattleResult.DRAW, "winner": None, "loser": None})
-
-
-            self.turn += 1
-            logging.info(str(self))
-
-        if self.players[0].health > 0:
-            logging.info(f"{self.players[0].name} wins!")
-            return self.players[0].name
+    def play(self, executor=None):
+        """Plays rounds until a single player is left, and returns their name.
+
+        Args:
+            executor (BattleExecutor): Plays the shop turns and battles of every round concurrently in its workers.
+                Each turn and battle then has its own random stream, derived from the game's.
+        """
+        logging.info("%s", self)
+        while len(self.get_alive_players()) > 1:
+            self.play_round(executor)
+
+        winner = self.get_placements()[0]
+        logging.info("%s wins!", winner.name)
+        return winner.name
+
+    def play_round(self, executor=None):
+        """Plays a round, where every player left plays a shop turn and battles an opponent."""
+        players = self.get_alive_players()
+        if executor is None:
+            for player in players:
+                logging.info("Shop turn for player %s:", player.name)
+                get_policy(player.policy)(ShopTurn(player, self))
         else:
-            logging.info(f"{self.players[1].name} wins!")
-            return self.players[1].name
+            self._play_shop_turns(players, executor)
+
+        pairs = self.get_pairs(players)
+        matchups = []
+        for player_1, player_2 in pairs:
+            if player_2 is None:
+                # The odd player out battles a ghost, the team of another player, which isn't hurt by the battle
+                player_2 = self.rng.choice([player for player in players if player is not player_1])
+            matchups.append((player_1.team, player_2.team))
+        results = self.play_battles(matchups, executor)
+        for (player_1, player_2), result in zip(pairs, results):
+            self._record_battle(player_1, player_2, result)
+
+        # Players knocked out in the same round are placed by their health
+        self.eliminated.extend(sorted((player for player in players if player.health <= 0), key=lambda player: player.health))
+        self.turn += 1
+        logging.info("%s", self)
+
+    def play_battles(self, matchups, executor=None):
+        """Battles pairs of teams, in the workers of an executor if one is given, and returns the BattleResults."""
+        if executor is None:
+            return [BattleTurn(team_1, team_2, self).play() for team_1, team_2 in matchups]
+        results = list(executor.battle(matchups, self.pack, seed=self.rng.getrandbits(64)))
+        # The workers battle copies of the teams, so the battles are ended on the teams themselves here
+        for team_1, team_2 in matchups:
+            end_battle(team_1, team_2)
+        return results
+
+    def get_alive_players(self):
+        """Returns the players that weren't eliminated yet."""
+        return [player for player in self.players if player.health > 0]
+
+    def get_placements(self):
+        """Returns the players from first place to last, the ones left ordered by their health."""
+        alive = sorted(self.get_alive_players(), key=lambda player: player.health, reverse=True)
+        return alive + self.eliminated[::-1]
+
+    def get_pairs(self, players):
+        """Returns the (player, opponent) pairs of a round, avoiding last round's opponents where possible.
+
+        With an odd amount of players, the last pair is the odd player out and None, for the player to battle a ghost.
+        """
+        if len(players) <= 2:
+            return [tuple(players)] if len(players) == 2 else []
+        unpaired = players[:]
+        self.rng.shuffle(unpaired)
+        bye = unpaired.pop() if len(unpaired) % 2 else None
+        pairs = []
+        while unpaired:
+            player = unpaired.pop()
+            last_opponent = self.last_opponents.get(player)
+            opponent = next((other for other in unpaired if other is not last_opponent), unpaired[0])
+            unpaired.remove(opponent)
+            pairs.append((player, opponent))
+        if bye is not None:
+            pairs.append((bye, None))
+        return pairs
+
+    def lost_last_battle(self, player):
+        """Returns whether a player lost their battle of the last round."""
+        if not self.battle_results:
+            return False
+        last_result = self.battle_results[-1]
+        last_round = [last_result]
+        if "turn" in last_result:
+            last_round = takewhile(lambda result: result.get("turn") == last_result["turn"], reversed(self.battle_results))
+        return any(result["loser"] is player for result in last_round)
+
+    def _record_battle(self, player_1, player_2, result):
+        """Damages the loser of a battle and records its result. Player 2 is None for battles against ghosts."""
+        winner = loser = None
+        if result == BattleResult.TEAM_1_WIN:
+            winner, loser = player_1, player_2
+        elif result == BattleResult.TEAM_2_WIN:
+            winner, loser = player_2, player_1
+        if loser is not None:
+            loser.health -= TURNS_TO_LIVES.get(self.turn, 3)
+        self.battle_results.append({"result": result, "winner": winner, "loser": loser, "turn": self.turn})
+        if player_2 is not None:
+            self.last_opponents[player_1] = player_2
+            self.last_opponents[player_2] = player_1
 
+    def _play_shop_turns(self, players, executor):
+        """Plays the shop turns of players in the workers of an executor, each with a random stream of its own."""
+        from serialization import encode_teams, decode_teams
 
+        pet_types = self.rules.all_pet_types
+        turn_states = [(self.pack, self.turn, encode_teams([player.team], pet_types), self.lost_last_battle(player),
+                        self.rng.getrandbits(64), player.policy) for player in players]
+        for player, arrays in zip(players, executor.play_shop_turns(turn_states)):
+            player.team = decode_teams(arrays, pet_types, self.status_types)[0]
 
     def __str__(self) -> str:
         """Returns a string representation of the team."""
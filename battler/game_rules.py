@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from itertools import accumulate
+from types import MappingProxyType
+
+# The last turn the shop probabilities change in
+LAST_SHOP_TURN = 11
+# The amount of (catalogs, pack) rules kept, the least recently used ones are dropped past it
+MAX_CACHED_RULES = 16
+
+
+class GameRules:
+    """The rules of a pack, derived from the catalogs once and shared by every game, battle and shop of the pack.
+
+    Rules are immutable, and are memoized per catalogs and pack, so the catalogs shouldn't change after they're used.
+    """
+    __slots__ = ("pack", "all_pet_types", "pet_types", "food_types", "status_types", "triggers", "pets_by_tier",
+                 "shop_pet_tables", "shop_food_tables")
+    _rules = OrderedDict()
+
+    def __init__(self, pet_types, food_types, status_types, pack):
+        """Initializes the rules of a pack. Use GameRules.get to share them instead.
+
+        Args:
+            pet_types (dict): The dictionary of pet types in the game.
+            food_types (dict): The dictionary of food types in the game.
+            status_types (dict): The dictionary of status types in the game.
+            pack (str): The pack the rules are of.
+        """
+        triggers = {}
+        for pet_id, pet_type in pet_types.items():
+            for ability in pet_type.abilities.values():
+                triggers.setdefault(ability.trigger, set()).add(pet_id)
+        for food_id, food_type in food_types.items():
+            triggers.setdefault(food_type.ability.trigger, set()).add(food_id)
+        for status_id, status_type in status_types.items():
+            triggers.setdefault(status_type.ability.trigger, set()).add(status_id)
+        for pet_id, pet_type in pet_types.items():
+            if pet_type.listens_to_all:
+                for trigger_ids in triggers.values():
+                    trigger_ids.add(pet_id)
+
+        pack_pet_types = {pet_id: pet_type for pet_id, pet_type in pet_types.items() if pack in pet_type.packs}
+        pack_food_types = {food_id: food_type for food_id, food_type in food_types.items() if pack in food_type.packs}
+        pets_by_tier = {}
+        for pet_type in pack_pet_types.values():
+            pets_by_tier.setdefault(pet_type.tier, []).append(pet_type)
+
+        set_slot = object.__setattr__
+        set_slot(self, "pack", pack)
+        set_slot(self, "all_pet_types", MappingProxyType(pet_types))
+        set_slot(self, "pet_types", MappingProxyType(pack_pet_types))
+        set_slot(self, "food_types", MappingProxyType(pack_food_types))
+        set_slot(self, "status_types", MappingProxyType(status_types))
+        set_slot(self, "triggers", MappingProxyType({trigger: frozenset(ids) for trigger, ids in triggers.items()}))
+        set_slot(self, "pets_by_tier", MappingProxyType({tier: tuple(tier_pet_types) for tier, tier_pet_types in pets_by_tier.items()}))
+        # Pets are rolled straight into shop slots of (pet id, health, attack), and are only instantiated when bought
+        set_slot(self, "shop_pet_tables", self._get_shop_tables(
+            pack_pet_types, pack, lambda pet_type: (pet_type.id, pet_type.health, pet_type.attack)))
+        set_slot(self, "shop_food_tables", self._get_shop_tables(pack_food_types, pack, lambda food_type: food_type))
+
+    @staticmethod
+    def _get_shop_tables(types, pack, get_slot):
+        """Returns the shop tables of each turn, as (slots, cumulative weights) of the types that can appear in the shop."""
+        tables = {}
+        for turn in range(1, LAST_SHOP_TURN + 1):
+            slots = []
+            weights = []
+            for item_type in types.values():
+                if hasattr(item_type, 'probabilities') and turn in item_type.probabilities:
+                    slots.append(get_slot(item_type))
+                    weights.append(item_type.probabilities[turn][pack])
+            tables[turn] = (tuple(slots), tuple(accumulate(weights)))
+        return MappingProxyType(tables)
+
+    @classmethod
+    def get(cls, pet_types, food_types, status_types, pack):
+        """Returns the rules of a pack, building them only the first time they're requested for the catalogs."""
+        key = (id(pet_types), id(food_types), id(status_types), pack)
+        entry = cls._rules.get(key)
+        if entry is None:
+            # The catalogs are kept with the rules, so their ids can't be reused by other catalogs while they're cached
+            entry = cls._rules[key] = (pet_types, food_types, status_types, cls(pet_types, food_types, status_types, pack))
+            if len(cls._rules) > MAX_CACHED_RULES:
+                cls._rules.popitem(last=False)
+        else:
+            cls._rules.move_to_end(key)
+        return entry[3]
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameRules are immutable")
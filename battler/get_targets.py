@@ -1,27 +1,24 @@
 import logging
-import random
 
 
 
 
 def get_targets(ability_effect, event_data=None, pet=None, team_pets=None, enemy_pets=None, team_pets_snapshot=None):
-    ability_target = ability_effect.get("target")
-    if not ability_target:
-        ability_target = ability_effect.get("to")
-    
+    ability_target = ability_effect.target
+
     affected_pets = []
-    match ability_target["kind"]:
+    match ability_target.kind:
         case "Self":
             affected_pets.append(pet)
         case "TriggeringEntity":
-            affected_pets.append(event_data["pet"])
+            affected_pets.append(event_data.pet)
         case "PurchaseTarget":
-            affected_pets.append(event_data["purchase_target"])
+            affected_pets.append(event_data.purchase_target)
         case "RandomFriend":
             pets = team_pets[:]
             if pet and pet in pets:
                 pets.remove(pet)
-            affected_pets += random.sample(pets, min(ability_target["n"], len(pets)))
+            affected_pets += event_data.turn.rng.sample(pets, min(ability_target.n, len(pets)))
         case "EachFriend":
             pets = team_pets[:]
             if pet and pet in pets:
@@ -56,14 +53,14 @@ def get_targets(ability_effect, event_data=None, pet=None, team_pets=None, enemy
         case "FriendBehind":
             affected_pets = []
             pets = team_pets
-            pet_amount = ability_target["n"]
+            pet_amount = ability_target.n
             index = pets.index(pet) - 1
             for pet_index in range(index, index - pet_amount, -1):
                 if 0 <= pet_index < len(pets):
                     affected_pets.append(pets[pet_index])
         case "FriendAhead":
             pets = team_pets
-            pet_amount = ability_target["n"]
+            pet_amount = ability_target.n
             index = pets.index(pet) + 1
             for pet_index in range(index, index + pet_amount):
                 if 0 <= pet_index < len(pets):
@@ -73,7 +70,7 @@ def get_targets(ability_effect, event_data=None, pet=None, team_pets=None, enemy
         case "EachEnemy":
             affected_pets += enemy_pets
         case "RandomEnemy":
-            affected_pets += random.sample(enemy_pets, min(ability_target["n"], len(enemy_pets)))
+            affected_pets += event_data.turn.rng.sample(enemy_pets, min(ability_target.n, len(enemy_pets)))
         case "FirstEnemy":
             if len(enemy_pets) > 0:
                 affected_pets.append(enemy_pets[-1])
@@ -87,7 +84,7 @@ def get_targets(ability_effect, event_data=None, pet=None, team_pets=None, enemy
         case "AdjacentAnimals":
             if len(enemy_pets) > 0:
                 affected_pets.append(enemy_pets[-1])
-            index = team_pets.index(event_data["pet"])
+            index = team_pets.index(event_data.pet)
             if index != 0:
                 affected_pets.append(team_pets[index - 1])
         case "HighestHealthEnemy":
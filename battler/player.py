@@ -1,10 +1,12 @@
 from team import Team
+from battler.policies import DEFAULT_POLICY
 STARTING_HEALTH = 10
 
 class Player:
 
-    def __init__(self, name: str):
+    def __init__(self, name: str, policy: str = DEFAULT_POLICY):
         self.name = name
+        self.policy = policy # The name of the policy that plays the player's shop turns
         self.health = STARTING_HEALTH
         self.team = Team()
 
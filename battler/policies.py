@@ -0,0 +1,25 @@
+# Policies play the shop turns of players. They're named, so games can be described by specs that workers rebuild.
+POLICIES = {}
+DEFAULT_POLICY = "random"
+
+
+def register_policy(name):
+    """Returns a decorator that registers a function as a policy, called with the ShopTurn it plays."""
+    def register(function):
+        POLICIES[name] = function
+        return function
+    return register
+
+
+def get_policy(name):
+    """Returns the policy of a name, raising a KeyError for unknown ones."""
+    policy = POLICIES.get(name)
+    if policy is None:
+        raise KeyError(f"Unknown policy {name}, the policies are {', '.join(POLICIES)}")
+    return policy
+
+
+@register_policy("random")
+def play_random(shop_turn):
+    """Plays random moves, weighted by ShopTurn.get_move_options."""
+    shop_turn.play()
@@ -0,0 +1,67 @@
+import random
+
+
+class ReplayError(Exception):
+    """Raised when a replayed run draws differently from its recorded run."""
+
+
+class RecordingRandom(random.Random):
+    """A seeded random stream that records its draws, so a run can be replayed from them.
+
+    Every draw of random.Random goes through random() or getrandbits(), so recording those two records the run.
+    """
+
+    def __init__(self, seed=None):
+        self.draws = []
+        self.initial_seed = seed
+        super().__init__(seed)
+
+    def random(self):
+        value = super().random()
+        self.draws.append(value)
+        return value
+
+    def getrandbits(self, k):
+        value = super().getrandbits(k)
+        self.draws.append(value)
+        return value
+
+
+class ReplayRandom(random.Random):
+    """A random stream that replays recorded draws, raising ReplayError once the run draws differently."""
+
+    def __init__(self, draws):
+        self.replayed_draws = list(draws)
+        self.position = 0
+        super().__init__(0)
+
+    def _next_draw(self):
+        """Returns the next recorded draw."""
+        if self.position >= len(self.replayed_draws):
+            raise ReplayError(f"The run drew more than the {len(self.replayed_draws)} recorded draws")
+        value = self.replayed_draws[self.position]
+        self.position += 1
+        return value
+
+    def random(self):
+        value = self._next_draw()
+        if not isinstance(value, float):
+            raise ReplayError(f"Draw {self.position - 1} was recorded as bits, but replayed as a float")
+        return value
+
+    def getrandbits(self, k):
+        value = self._next_draw()
+        if not isinstance(value, int) or value >> k:
+            raise ReplayError(f"Draw {self.position - 1} was recorded as {value!r}, but replayed as {k} bits")
+        return value
+
+    def is_done(self):
+        """Returns True if every recorded draw was replayed."""
+        return self.position == len(self.replayed_draws)
+
+
+def make_rng(seed=None):
+    """Returns a random stream for a seed, or the global random module if there's no seed."""
+    if seed is None:
+        return random
+    return random.Random(seed)
@@ -4,8 +4,9 @@ from shop import Shop
 from battler.player import Player
 from pet_type import PetType
 from pet import Pet
+from battler.event_context import EventContext
+from state_hash import position_hash
 
-import random
 import logging
 
 REROLL_WEIGHT = 2
@@ -21,15 +22,17 @@ class ShopTurn:
         """Initializes the shop turn."""
         self.player = player
         self.game = game
+        self.rng = game.rng
         self.team = team
         self.shop = shop
         if team is None:
             self.team = self.player.team
         if shop is None:
-            self.shop = Shop(self.game.pet_types, self.game.food_types, self.game.turn, self.game.pack, self.team.buffs)
+            self.shop = Shop(self.game.rules, self.game.turn, self.team.buffs, self.rng)
 
-        self.event_data = {"pet_types": self.game.pet_types, "food_types": self.game.food_types, "status_types": self.game.status_types,
-                            "turn_type": "shop", "turn": self, "shop": self.shop, "team": self.team, "original_team": self.team}
+        self.event_data = EventContext(self, "shop", self.game.pet_types, self.game.food_types, self.game.status_types,
+                                       shop=self.shop, team=self.team, original_team=self.team)
+        self.undo_log = [] # The states before each move played with make_move, to revert them with unmake_move
 
     def get_move_options(self):
         """Returns a list of options for the move."""
@@ -49,7 +52,7 @@ class ShopTurn:
                 for j in range(-1, self.team.TEAM_SIZE):
                     options.append(("buy_pet", pet_index, j, -1))
                     weights.append(buy_pet_weight)
-                    if 0 <= j < len(self.team.pets) and self.team.pets[j].pet_type.id == self.shop.get_pets()[pet_index].pet_type.id:
+                    if 0 <= j < len(self.team.pets) and self.team.pets[j].pet_type.id == self.shop.get_pet_id(pet_index):
                         options.append(("buy_pet", pet_index, j, j))
                         weights.append(merge_pet_weight)
 
@@ -76,7 +79,7 @@ class ShopTurn:
         if not self.are_moves_left(options):
             return []
 
-        return random.choices(population=options, weights=weights, k=1)[0]
+        return self.rng.choices(population=options, weights=weights, k=1)[0]
 
     @staticmethod
     def are_moves_left(move_options):
@@ -101,15 +104,59 @@ class ShopTurn:
 
         return False
 
+    def make_move(self, move):
+        """Plays a move like play_move, recording the state before it so unmake_move can revert it exactly.
+
+        Random draws aren't rewound, so playing a random move again after reverting it can have a different outcome.
+        """
+        self.undo_log.append(self._record_state())
+        return self.play_move(move)
+
+    def unmake_move(self):
+        """Reverts the last move played with make_move, with everything its triggered abilities changed."""
+        self._restore_state(self.undo_log.pop())
+
+    def _record_state(self):
+        """Returns everything a move can change in the turn."""
+        team = self.team
+        shop = self.shop
+        # Pets a move adds are dropped with the pet list, so only the pets already in the team are recorded
+        pets = [(pet, pet.pet_type, pet.team, pet.health, pet.attack, pet.level, pet.experience, pet.status, pet.abilities,
+                 pet.buffs, pet.state, pet.state_hash) for pet in team.pets]
+        return (shop.gold, shop.pet_slots[:], shop.foods[:], shop.slots_hash, shop.foods_hash, team.pets[:], team.buffs[:],
+                team.listeners.copy(), team.status_listeners.copy(), team.state_hash, team.buffs_hash, pets)
+
+    def _restore_state(self, state):
+        """Restores a state returned by _record_state."""
+        team = self.team
+        shop = self.shop
+        (shop.gold, shop.pet_slots, shop.foods, shop.slots_hash, shop.foods_hash, pets, buffs, team.listeners,
+         team.status_listeners, team.state_hash, team.buffs_hash, pet_states) = state
+        team.pets[:] = pets
+        team.buffs[:] = buffs # The shop shares the buffs list of the team
+        for (pet, pet_type, pet_team, health, attack, level, experience, status, abilities, pet_buffs, pet_state,
+             pet_hash) in pet_states:
+            pet.pet_type = pet_type
+            pet.team = pet_team
+            pet.health = health
+            pet.attack = attack
+            pet.level = level
+            pet.experience = experience
+            pet.status = status
+            pet.abilities = abilities
+            pet.buffs = pet_buffs
+            pet.state = pet_state
+            pet.state_hash = pet_hash
+
     def buy_food(self, food: FoodType | int, team_index):
         """Buys food from the shop."""
         food = self.shop.buy_food(food)
         bought = food is not None
         if bought:
             # logging.debug(f"Bought food {food}.")
-            food.trigger_event("BuyFood", {"food": food, "purchase_target": self.team.pets[team_index]} | self.event_data)
+            food.trigger_event("BuyFood", self.event_data.copy(food=food, purchase_target=self.team.pets[team_index]))
 
-    def buy_pet(self, pet: Pet | int, buy_index, merge_index=-1):
+    def buy_pet(self, pet: int, buy_index, merge_index=-1):
         """Buys a pet from the shop."""
         if merge_index != -1 and not self.team.can_add_pet():
             return False
@@ -125,13 +172,13 @@ class ShopTurn:
                 # logging.debug(f"Merged pet {new_pet} to {merge_pet}.")
                 merge_pet.add_experience(1, self)
 
-            self.trigger_event("Buy", {"pet": new_pet} | self.event_data)
+            self.trigger_event("Buy", self.event_data.copy(pet=new_pet))
             if new_pet.pet_type.tier == 1:
-                self.trigger_event("BuyTier1Animal", {"pet": new_pet} | self.event_data)
-            if self.game.battle_results and self.player == self.game.battle_results[-1]["loser"]:
-                self.trigger_event("BuyAfterLoss", {"pet": new_pet} | self.event_data)
+                self.trigger_event("BuyTier1Animal", self.event_data.copy(pet=new_pet))
+            if self.game.lost_last_battle(self.player):
+                self.trigger_event("BuyAfterLoss", self.event_data.copy(pet=new_pet))
             if merge_index == -1:
-                self.trigger_event("Summoned", {"pet": new_pet} | self.event_data)
+                self.trigger_event("Summoned", self.event_data.copy(pet=new_pet))
                 
 
         return bought
@@ -144,7 +191,7 @@ class ShopTurn:
         if sell_result:
             # logging.debug(f"Sold pet {pet}.")
             self.shop.add_gold(pet.level)
-            self.trigger_event("Sell", {"pet": pet} | self.event_data)
+            self.trigger_event("Sell", self.event_data.copy(pet=pet))
         return sell_result
         
     def play(self):
@@ -170,9 +217,11 @@ class ShopTurn:
 
     def trigger_event(self, event_type, event_data, trigger_own_events=True):
         """Called when a pet in the team triggers an event."""
-        triggering_pet = event_data.get("pet")
-        triggering_food = event_data.get("food")
-        team = event_data["team"]
+        triggering_food = event_data.food
+        team = event_data.team
+        if not triggering_food and not team.has_listeners(event_type, include_status=False):
+            return
+        triggering_pet = event_data.pet
         for pet in team.pets:
             if not trigger_own_events and pet and pet == triggering_pet:
                 continue
@@ -181,6 +230,21 @@ class ShopTurn:
                 pet.trigger_event(event_type, event_data)
 
         
+    def get_state_key(self):
+        """Returns a hashable key of the turn, equal for turns that reached the same team and shop in any move order."""
+        return self.team.get_state_key(), self.shop.get_state_key()
+
+    def get_state_hash(self):
+        """Returns a hash of the turn's state, kept up to date as moves are played, equal for equal state keys."""
+        return self.team.get_state_hash() ^ position_hash(self.shop.get_state_hash(), 1)
+
+    def state_equals(self, other):
+        """Returns True if the turns have the same state, comparing their canonical state keys."""
+        return self.get_state_key() == other.get_state_key()
+
     def clone(self):
         """Returns a clone of this shop turn."""
-        return ShopTurn(self.player, self.game, self.team.clone(), self.shop.clone())
+        team = self.team.clone()
+        shop = self.shop.clone()
+        shop.buffs = team.buffs # The shop rolls with the buffs of its own team
+        return ShopTurn(self.player, self.game, team, shop)
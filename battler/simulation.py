@@ -0,0 +1,190 @@
+import json
+import math
+import os
+from dataclasses import dataclass, field, asdict
+from itertools import islice
+
+# Bumped whenever the checkpoint changes in a way that older ones can't be resumed from
+CHECKPOINT_VERSION = 1
+
+
+def get_game_record(game_spec, game):
+    """Returns a JSON record of a played game. Players are referred to by their index, since names can repeat."""
+    return {
+        "pack": game.pack,
+        "seed": game_spec.seed,
+        "players": [player.name for player in game.players],
+        "policies": [player.policy for player in game.players],
+        "winner": game.players.index(game.get_placements()[0]),
+        "placements": [game.players.index(player) for player in game.get_placements()],
+        "turns": game.turn - 1,
+        "health": [player.health for player in game.players],
+        "teams": [[pet.pet_type.id for pet in player.team.pets] for player in game.players],
+    }
+
+
+def _increment(counts, key, amount=1):
+    counts[key] = counts.get(key, 0) + amount
+
+
+@dataclass
+class SimulationStats:
+    """A class that represents running aggregates of game records, which take the same memory however many games
+    they count.
+    """
+
+    games: int = field(default=0)
+    turns: int = field(default=0) # The sum of the turns of the games
+    turns_squared: int = field(default=0)
+    min_turns: int = field(default=None)
+    max_turns: int = field(default=None)
+    packs: dict = field(default_factory=dict) # Pack to games
+    player_games: dict = field(default_factory=dict) # Player name to games
+    player_wins: dict = field(default_factory=dict)
+    policy_games: dict = field(default_factory=dict) # Policy name to games, counted once per player that has it
+    policy_wins: dict = field(default_factory=dict)
+    teams: int = field(default=0) # The amount of final teams, one per player of every game
+    pet_picks: dict = field(default_factory=dict) # Pet id to the final teams that have it
+    pet_wins: dict = field(default_factory=dict) # Pet id to the winning teams that have it
+
+    def add(self, record):
+        """Counts a record returned by get_game_record."""
+        turns = record["turns"]
+        self.games += 1
+        self.turns += turns
+        self.turns_squared += turns * turns
+        self.min_turns = turns if self.min_turns is None else min(self.min_turns, turns)
+        self.max_turns = turns if self.max_turns is None else max(self.max_turns, turns)
+        _increment(self.packs, record["pack"])
+        winner = record["winner"]
+        for i, (name, policy, team) in enumerate(zip(record["players"], record["policies"], record["teams"])):
+            _increment(self.player_games, name)
+            _increment(self.policy_games, policy)
+            self.teams += 1
+            for pet_id in set(team):
+                _increment(self.pet_picks, pet_id)
+                if i == winner:
+                    _increment(self.pet_wins, pet_id)
+            if i == winner:
+                _increment(self.player_wins, name)
+                _increment(self.policy_wins, policy)
+
+    def get_mean_turns(self):
+        """Returns the mean length of the games in turns."""
+        return self.turns / self.games if self.games else 0.0
+
+    def get_turns_std(self):
+        """Returns the standard deviation of the length of the games in turns."""
+        if not self.games:
+            return 0.0
+        return math.sqrt(max(self.turns_squared / self.games - self.get_mean_turns() ** 2, 0.0))
+
+    def get_win_rates(self, by="player"):
+        """Returns the win rates of the players, or of the policies with by="policy", highest first."""
+        games, wins = (self.policy_games, self.policy_wins) if by == "policy" else (self.player_games, self.player_wins)
+        rates = {key: wins.get(key, 0) / count for key, count in games.items()}
+        return dict(sorted(rates.items(), key=lambda item: item[1], reverse=True))
+
+    def get_pick_rates(self):
+        """Returns the share of the final teams that have each pet, and the share of those that won, most picked first."""
+        rates = {pet_id: (picks / self.teams, self.pet_wins.get(pet_id, 0) / picks) for pet_id, picks in self.pet_picks.items()}
+        return dict(sorted(rates.items(), key=lambda item: item[1][0], reverse=True))
+
+    def format(self, limit=10):
+        """Returns a summary of the stats."""
+        lines = [f"{self.games} games, {self.get_mean_turns():.1f} turns on average (std {self.get_turns_std():.1f}, "
+                 f"{self.min_turns}-{self.max_turns})"]
+        lines.append("win rates: " + ", ".join(f"{name} {rate:.1%}" for name, rate in self.get_win_rates().items()))
+        if len(self.policy_games) > 1:
+            lines.append("policy win rates: " + ", ".join(f"{name} {rate:.1%}"
+                                                          for name, rate in self.get_win_rates("policy").items()))
+        lines.append(f"{'pet':<24} {'picked':>8} {'won':>8}")
+        for pet_id, (pick_rate, win_rate) in list(self.get_pick_rates().items())[:limit]:
+            lines.append(f"{pet_id:<24} {pick_rate:>8.1%} {win_rate:>8.1%}")
+        return "\n".join(lines)
+
+
+def get_checkpoint_path(path):
+    """Returns the path of the checkpoint of a records file."""
+    return f"{path}.checkpoint.json"
+
+
+def _load_checkpoint(path):
+    """Returns the (completed games, records offset, stats) of the checkpoint of a records file, or None if it has none."""
+    checkpoint_path = get_checkpoint_path(path)
+    if not os.path.exists(checkpoint_path) or not os.path.exists(path):
+        return None
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"The checkpoint {checkpoint_path} has version {checkpoint.get('version')}, "
+                         f"expected {CHECKPOINT_VERSION}")
+    return checkpoint["completed"], checkpoint["offset"], SimulationStats(**checkpoint["stats"])
+
+
+def _save_checkpoint(path, records_file, completed, stats):
+    """Flushes the records and writes the checkpoint after them, replacing the last one at once."""
+    records_file.flush()
+    os.fsync(records_file.fileno())
+    checkpoint = {"version": CHECKPOINT_VERSION, "completed": completed, "offset": records_file.tell(),
+                  "stats": asdict(stats)}
+    checkpoint_path = get_checkpoint_path(path)
+    with open(checkpoint_path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def simulate_games(game_specs, path, pet_types=None, food_types=None, status_types=None, executor=None, resume=True,
+                   checkpoint_every=100):
+    """Plays games, streaming their records to a JSONL file in the order of their specs, and returns their stats.
+
+    Every checkpoint_every games, the stats are saved to a checkpoint next to the records. Resuming drops the records
+    written after the checkpoint and skips the specs before it, so a campaign can be stopped at any time, and resumed
+    without reading the records. Nothing is kept per game, so campaigns run in constant memory.
+
+    Args:
+        game_specs (iterable): The GameSpecs of the games, which can be generated. Resuming expects the same specs.
+        path (str): The path of the records file.
+        pet_types (dict): The dictionary of pet types in the game, when playing without an executor.
+        food_types (dict): The dictionary of food types in the game, when playing without an executor.
+        status_types (dict): The dictionary of status types in the game, when playing without an executor.
+        executor (BattleExecutor): Plays the games in its workers.
+        resume (bool): Whether to resume from the checkpoint of the records file, instead of starting over.
+        checkpoint_every (int): The amount of games between checkpoints.
+
+    Returns:
+        SimulationStats: The stats of all of the games of the records file.
+    """
+    checkpoint = _load_checkpoint(path) if resume else None
+    completed, offset, stats = checkpoint or (0, 0, SimulationStats())
+    game_specs = islice(game_specs, completed, None)
+    if executor is not None:
+        records = executor.record_games(game_specs)
+    else:
+        records = (_play_game(game_spec, pet_types, food_types, status_types) for game_spec in game_specs)
+
+    with open(path, "r+b" if checkpoint else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        for record in records:
+            f.write(json.dumps({"index": completed, **record}, separators=(",", ":")).encode() + b"\n")
+            stats.add(record)
+            completed += 1
+            if completed % checkpoint_every == 0:
+                _save_checkpoint(path, f, completed, stats)
+        _save_checkpoint(path, f, completed, stats)
+    return stats
+
+
+def _play_game(game_spec, pet_types, food_types, status_types):
+    """Plays the game of a spec and returns its record."""
+    game = game_spec.build(pet_types, food_types, status_types)
+    game.play()
+    return get_game_record(game_spec, game)
+
+
+def read_records(path):
+    """Yields the records of a records file, one at a time."""
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,161 @@
+import math
+
+from battler.battle_turn import BattleResult
+from battler.battle_cache import BattleCache
+
+INITIAL_RATING = 1500
+# The score a team gets for each result, from the point of view of team 1
+RESULT_SCORES = {BattleResult.TEAM_1_WIN: 1, BattleResult.TEAM_2_WIN: 0, BattleResult.DRAW: 0.5}
+
+
+class SwissTournament:
+    """Ranks teams by Elo rating using Swiss-style rounds, instead of battling every pair.
+
+    Each round pairs teams of similar rating that haven't met yet, so every team plays once per round. A team's
+    K-factor shrinks as it plays more, the way its rating deviation would in Glicko, so early rounds move ratings
+    fast and later rounds refine them. The rounds stop once the top-K teams stay the same for a few rounds.
+
+    Ratings find the strong teams, but battles aren't transitive, so they don't order them like a round robin would.
+    The best rated teams then battle each other in a final round robin, which ranks the top teams by their scores
+    against each other, reusing the results of the pairs that already met.
+    """
+
+    def __init__(self, teams, game, top_k=250, max_rounds=None, min_rounds=None, stable_rounds=3, k_factor=64,
+                 min_k_factor=16, cache=None, executor=None, finalists=None):
+        """Initializes the tournament.
+
+        Args:
+            teams (list): The teams to rank.
+            game (Game): The game the battles are played in.
+            top_k (int): The amount of top teams whose stability ends the tournament.
+            max_rounds (int): The maximum amount of rounds, defaults to 4 * log2 of the amount of teams.
+            min_rounds (int): The minimum amount of rounds, defaults to log2 of the amount of teams.
+            stable_rounds (int): The amount of rounds the top-K teams have to stay the same for to stop early.
+            k_factor (float): The K-factor of a team that hasn't played yet.
+            min_k_factor (float): The smallest K-factor a team decays to.
+            cache (BattleCache): The cache to play battles through, if no executor is given.
+            executor (BattleExecutor): An executor to play each round's battles in parallel, if any.
+            finalists (int): The amount of best rated teams in the final round robin, defaults to 2 * top_k. 0 skips
+                the final, ranking the teams by rating alone.
+        """
+        self.teams = teams
+        self.game = game
+        self.top_k = min(top_k, len(teams))
+        rounds = max(1, math.ceil(math.log2(max(len(teams), 2))))
+        self.max_rounds = max_rounds if max_rounds is not None else 4 * rounds
+        self.min_rounds = min_rounds if min_rounds is not None else rounds
+        self.stable_rounds = stable_rounds
+        self.k_factor = k_factor
+        self.min_k_factor = min_k_factor
+        self.cache = cache if cache is not None else BattleCache()
+        self.executor = executor
+        self.finalists = min(finalists if finalists is not None else 2 * self.top_k, len(teams))
+
+        self.ratings = [INITIAL_RATING] * len(teams)
+        self.games_played = [0] * len(teams)
+        self.opponents = [set() for _ in teams]
+        self.scores = {} # (i, j) pairs that battled, with i < j, to the score of team i
+        self.final_scores = None # Finalist index to its score in the final round robin, once it's played
+        self.rounds = 0
+        self.battles = 0
+
+    def get_k_factor(self, i):
+        """Returns the K-factor of a team, which shrinks as it plays more."""
+        return max(self.min_k_factor, self.k_factor / math.sqrt(1 + self.games_played[i] / 4))
+
+    def get_pairs(self):
+        """Returns pairs of team indices of similar rating that haven't battled yet. Unpairable teams sit the round out."""
+        order = sorted(range(len(self.teams)), key=lambda i: self.ratings[i], reverse=True)
+        paired = [False] * len(order)
+        pairs = []
+        for position, i in enumerate(order):
+            if paired[position]:
+                continue
+            for other_position in range(position + 1, len(order)):
+                j = order[other_position]
+                if not paired[other_position] and j not in self.opponents[i]:
+                    paired[position] = paired[other_position] = True
+                    pairs.append((i, j))
+                    break
+        return pairs
+
+    def _battle(self, pairs):
+        """Battles pairs of team indices, and returns the scores of the first teams, recording them."""
+        matchups = [(self.teams[i], self.teams[j]) for i, j in pairs]
+        if self.executor is not None:
+            results = self.executor.battle(matchups, self.game.pack)
+        else:
+            results = (BattleResult(int(result)) for result in self.cache.play_batch(matchups, self.game))
+        scores = []
+        for (i, j), result in zip(pairs, results):
+            score = RESULT_SCORES[result]
+            self.scores[(i, j) if i < j else (j, i)] = score if i < j else 1 - score
+            scores.append(score)
+        self.battles += len(pairs)
+        return scores
+
+    def get_score(self, i, j):
+        """Returns the score of team i in its battle with team j."""
+        return self.scores[(i, j)] if i < j else 1 - self.scores[(j, i)]
+
+    def play_round(self):
+        """Plays a round of the tournament and updates the ratings. Returns whether any battle was played."""
+        pairs = self.get_pairs()
+        if not pairs:
+            return False
+        for (i, j), score in zip(pairs, self._battle(pairs)):
+            expected = 1 / (1 + 10 ** ((self.ratings[j] - self.ratings[i]) / 400))
+            k_i, k_j = self.get_k_factor(i), self.get_k_factor(j)
+            self.ratings[i] += k_i * (score - expected)
+            self.ratings[j] -= k_j * (score - expected)
+            self.games_played[i] += 1
+            self.games_played[j] += 1
+            self.opponents[i].add(j)
+            self.opponents[j].add(i)
+        self.rounds += 1
+        return True
+
+    def play_final(self):
+        """Plays a round robin between the best rated teams, battling only the pairs that didn't meet yet."""
+        finalists = self.get_top_rated(self.finalists)
+        pairs = [(i, j) for position, i in enumerate(finalists) for j in finalists[position + 1:]
+                 if j not in self.opponents[i]]
+        self._battle(pairs)
+        for i, j in pairs:
+            self.opponents[i].add(j)
+            self.opponents[j].add(i)
+        # Finalists are ranked like the round robin of pickle_best_teams, by the battles they didn't lose
+        draw = RESULT_SCORES[BattleResult.DRAW]
+        self.final_scores = {i: sum(self.get_score(i, j) >= draw for j in finalists if j != i) for i in finalists}
+
+    def get_top_rated(self, k):
+        """Returns the indices of the k best rated teams, best first."""
+        return sorted(range(len(self.teams)), key=lambda i: self.ratings[i], reverse=True)[:k]
+
+    def get_top(self, k=None):
+        """Returns the indices of the k best teams, best first: the finalists by their final score, then the rest of the
+        teams by rating.
+        """
+        order = self.get_top_rated(len(self.teams))
+        if self.final_scores:
+            # Sorting is stable, so tied finalists keep their ratings' order
+            order.sort(key=lambda i: self.final_scores.get(i, -1), reverse=True)
+        return order[:k or self.top_k]
+
+    def play(self):
+        """Plays rounds until the top-K teams are stable or the maximum amount of rounds is reached, then the final.
+
+        Returns:
+            list: The teams, best first, see get_top.
+        """
+        top = None
+        stable = 0
+        while self.rounds < self.max_rounds and self.play_round():
+            new_top = set(self.get_top())
+            stable = stable + 1 if new_top == top else 0
+            top = new_top
+            if self.rounds >= self.min_rounds and stable >= self.stable_rounds:
+                break
+        if self.finalists > 1:
+            self.play_final()
+        return [self.teams[i] for i in self.get_top(len(self.teams))]
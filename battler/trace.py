@@ -0,0 +1,166 @@
+# The kinds of the events of a trace, each recorded as a tuple that starts with its kind:
+# ("start", team 1 pets, team 2 pets), with pets as (name, attack, health) tuples, back to front like Team.pets
+# ("attack", side, position, name, target side, target position, target name, damage, target health)
+# ("damage", ...), the same as an attack, for damage dealt by abilities
+# ("ability", side, position, name, effect kind)
+# ("faint", side, position, name)
+# ("summon", side, position, name, attack, health)
+# ("teams", team 1 pets, team 2 pets), after every attack
+# ("result", BattleResult)
+# Sides are 1 and 2, and positions count from the front of a team, which is 0.
+EVENT_KINDS = ("start", "attack", "damage", "ability", "faint", "summon", "teams", "result")
+
+
+def _get_pets(team):
+    return tuple((pet.pet_type.name, pet.attack, pet.health) for pet in team.pets)
+
+
+def _format_pets(pets):
+    return ", ".join(f"{name} [{attack}⚔|{health}❤]" for name, attack, health in pets)
+
+
+class BattleTrace:
+    """Records the events of battles as compact tuples, and renders them as text only when asked to.
+
+    While a battle is recorded, the trace replaces the methods it hooks with recording wrappers, and puts the originals
+    back after, so battles played without a trace don't run any tracing code. Only the battle being recorded is, events
+    of other battles and shop turns are ignored. Usage:
+        trace = BattleTrace()
+        BattleTurn(team_1, team_2, game).play(trace=trace)
+        print(trace.format())
+    """
+
+    def __init__(self):
+        self.events = []
+        self._sides = {} # The teams of the battle being recorded to their sides
+        self._patches = []
+
+    def __len__(self):
+        return len(self.events)
+
+    def clear(self):
+        """Forgets the recorded events."""
+        self.events.clear()
+
+    def get_events(self, kind=None):
+        """Returns the recorded events, or the ones of a kind."""
+        return [event for event in self.events if kind is None or event[0] == kind]
+
+    def record(self, battle):
+        """Plays a battle while recording its events, and returns its result."""
+        if self._patches:
+            raise RuntimeError("The trace is already recording a battle")
+        self._sides = {battle.team_1: 1, battle.team_2: 2}
+        self.events.append(("start", _get_pets(battle.team_1), _get_pets(battle.team_2)))
+        self._patch_hooks(battle)
+        try:
+            result = battle.play()
+        finally:
+            for owner, name, original in reversed(self._patches):
+                setattr(owner, name, original)
+            self._patches.clear()
+            self._sides = {}
+        self.events.append(("result", result))
+        return result
+
+    def _patch(self, owner, name, make_wrapper):
+        """Replaces a method of a class with a wrapper made from the original, remembering the original to restore."""
+        original = owner.__dict__[name]
+        self._patches.append((owner, name, original))
+        setattr(owner, name, make_wrapper(original))
+
+    def _get_pet(self, pet, team=None):
+        """Returns the (side, position, name) of a pet of the battle, or None for pets of other teams."""
+        team = team if team is not None else pet.team
+        side = self._sides.get(team)
+        if side is None:
+            return None
+        pets = team.pets
+        position = len(pets) - 1 - pets.index(pet) if pet in pets else -1
+        return side, position, pet.pet_type.name
+
+    def _patch_hooks(self, battle):
+        """Patches the methods that attack, cast abilities, faint and summon pets, and play attacks."""
+        from pet import Pet
+        from team import Team
+        from battler.battle_turn import BattleTurn
+
+        events = self.events
+        sides = self._sides
+        get_pet = self._get_pet
+
+        def wrap_attack_pet(attack_pet):
+            def wrapper(pet, target, attack_damage, is_main_attack=True):
+                attacker = get_pet(pet)
+                defender = get_pet(target)
+                damage = attack_pet(pet, target, attack_damage, is_main_attack)
+                if attacker is not None or defender is not None:
+                    events.append(("attack" if is_main_attack else "damage", *(attacker or (None, None, pet.pet_type.name)),
+                                   *(defender or (None, None, target.pet_type.name)), damage, target.health))
+                return damage
+            return wrapper
+
+        def wrap_perform_ability(perform_ability):
+            def wrapper(pet, ability_effect, event_data):
+                caster = get_pet(pet)
+                if caster is not None:
+                    events.append(("ability", *caster, ability_effect.kind))
+                return perform_ability(pet, ability_effect, event_data)
+            return wrapper
+
+        def wrap_remove_pet(remove_pet):
+            def wrapper(team, pet):
+                if team in sides:
+                    removed = team.pets[pet] if isinstance(pet, int) else pet
+                    if removed in team.pets and removed.health <= 0:
+                        events.append(("faint", *get_pet(removed, team)))
+                return remove_pet(team, pet)
+            return wrapper
+
+        def wrap_add_pet(add_pet):
+            def wrapper(team, pet, index=-1):
+                added = add_pet(team, pet, index)
+                if added and team in sides:
+                    events.append(("summon", *get_pet(pet, team), pet.attack, pet.health))
+                return added
+            return wrapper
+
+        def wrap_play_next_attack(play_next_attack):
+            def wrapper(turn):
+                play_next_attack(turn)
+                if turn is battle:
+                    events.append(("teams", _get_pets(turn.team_1), _get_pets(turn.team_2)))
+            return wrapper
+
+        self._patch(Pet, "attack_pet", wrap_attack_pet)
+        self._patch(Pet, "perform_ability", wrap_perform_ability)
+        self._patch(Team, "remove_pet", wrap_remove_pet)
+        self._patch(Team, "add_pet", wrap_add_pet)
+        self._patch(BattleTurn, "play_next_attack", wrap_play_next_attack)
+
+    def format(self, include_teams=True):
+        """Returns the recorded events as text, one line per event, with the teams after every attack if asked to."""
+        lines = []
+        for event in self.events:
+            kind = event[0]
+            if kind == "start":
+                lines.append(f"{'start':<8} team 1: {_format_pets(event[1])}")
+                lines.append(f"{'':<8} team 2: {_format_pets(event[2])}")
+            elif kind in ("attack", "damage"):
+                side, position, name, target_side, target_position, target_name, damage, health = event[1:]
+                lines.append(f"{kind:<8} team {side} {name}@{position} -> team {target_side} {target_name}@{target_position}"
+                             f", {damage} damage, {health}❤ left")
+            elif kind == "ability":
+                side, position, name, effect_kind = event[1:]
+                lines.append(f"{kind:<8} team {side} {name}@{position} casts {effect_kind}")
+            elif kind == "faint":
+                side, position, name = event[1:]
+                lines.append(f"{kind:<8} team {side} {name}@{position}")
+            elif kind == "summon":
+                side, position, name, attack, health = event[1:]
+                lines.append(f"{kind:<8} team {side} {name}@{position} [{attack}⚔|{health}❤]")
+            elif kind == "teams" and include_teams:
+                lines.append(f"{'teams':<8} {_format_pets(event[1])} | {_format_pets(event[2])}")
+            elif kind == "result":
+                lines.append(f"{'result':<8} {event[1].name}")
+        return "\n".join(lines)
@@ -0,0 +1,85 @@
+import math
+import random
+from dataclasses import dataclass, field
+from statistics import NormalDist
+
+from battler.battle_turn import BattleTurn, BattleResult
+from battler.battle_cache import battle_can_be_random
+
+
+@dataclass
+class WinProbability:
+    """A class that represents the estimated result probabilities of a battle, from the point of view of team 1."""
+
+    win: float
+    draw: float
+    loss: float
+    samples: int
+    deterministic: bool
+    margin: float = field(default=0) # The half width of the widest confidence interval of the probabilities
+
+    def expected_score(self, win_score=1, draw_score=0.5, loss_score=-1):
+        """Returns the expected score of team 1, scoring results the way mcts.simulate does by default."""
+        return self.win * win_score + self.draw * draw_score + self.loss * loss_score
+
+
+def wilson_interval(successes, samples, z):
+    """Returns the Wilson score interval of a proportion, as (low, high)."""
+    p = successes / samples
+    denominator = 1 + z * z / samples
+    center = (p + z * z / (2 * samples)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / samples + z * z / (4 * samples * samples)) / denominator
+    return center - half_width, center + half_width
+
+
+def estimate_win_probability(team_1, team_2, game, tolerance=0.05, confidence=0.95, min_samples=8, max_samples=400,
+                             stop_when_decided=True, seed=None) -> WinProbability:
+    """Estimates the result probabilities of a battle between the teams.
+
+    Battles that can't involve randomness are played once. Others are sampled until the confidence intervals of the
+    win, draw and loss probabilities are all narrower than the tolerance, until the winner is clear, or until
+    max_samples is reached.
+
+    Args:
+        team_1 (Team): The first team.
+        team_2 (Team): The second team.
+        game (Game): The game the battles are played in.
+        tolerance (float): The half width the confidence intervals have to shrink to.
+        confidence (float): The confidence level of the intervals.
+        min_samples (int): The amount of samples to play before stopping early.
+        max_samples (int): The maximum amount of samples to play.
+        stop_when_decided (bool): Whether to stop once the interval of team 1's score excludes an even battle.
+        seed: The seed of the samples' random stream, drawn from the game's stream by default, so estimates are as
+            reproducible as the game.
+
+    Returns:
+        WinProbability: The estimated probabilities.
+    """
+    if not battle_can_be_random(team_1, team_2, game):
+        result = BattleTurn(team_1, team_2, game).play()
+        return WinProbability(float(result == BattleResult.TEAM_1_WIN), float(result == BattleResult.DRAW),
+                              float(result == BattleResult.TEAM_2_WIN), 1, True)
+
+    rng = random.Random(seed if seed is not None else game.rng.getrandbits(64))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    counts = {BattleResult.TEAM_1_WIN: 0, BattleResult.DRAW: 0, BattleResult.TEAM_2_WIN: 0}
+    samples = 0
+    margin = 1
+    while samples < max_samples:
+        counts[BattleTurn(team_1, team_2, game, rng).play()] += 1
+        samples += 1
+        if samples < min_samples:
+            continue
+
+        intervals = [wilson_interval(count, samples, z) for count in counts.values()]
+        margin = max((high - low) / 2 for low, high in intervals)
+        if margin <= tolerance:
+            break
+        if stop_when_decided:
+            # Score team 1 as a proportion, with a draw being half a win
+            low, high = wilson_interval(counts[BattleResult.TEAM_1_WIN] + counts[BattleResult.DRAW] / 2, samples, z)
+            if low > 0.5 or high < 0.5:
+                break
+
+    return WinProbability(counts[BattleResult.TEAM_1_WIN] / samples, counts[BattleResult.DRAW] / samples,
+                          counts[BattleResult.TEAM_2_WIN] / samples, samples, False, margin)
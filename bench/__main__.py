@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+
+from catalog import CATALOG_PATH
+from bench.fixtures import TEAMS_PATH, load_fixtures
+from bench.benchmarks import (BENCHMARKS, run_benchmarks, profile_benchmarks, save_baseline, load_baseline,
+                              compare_baselines)
+
+
+def main(args=None):
+    """Runs the benchmarks, and writes them to a baseline or compares them to one.
+
+    Usage:
+        python -m bench --output baseline.json
+        python -m bench --compare baseline.json --threshold 0.1
+    """
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks the battler, offline.")
+    parser.add_argument("--output", help="Writes the results to a JSON baseline")
+    parser.add_argument("--compare", help="Compares the results to a JSON baseline, failing on regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="The fraction a rate can drop, or a peak memory grow, by before it's a regression")
+    parser.add_argument("--only", nargs="+", choices=[benchmark.name for benchmark in BENCHMARKS],
+                        help="The benchmarks to run, defaults to all of them")
+    parser.add_argument("--repeat", type=int, default=3, help="The amount of timed runs of every benchmark")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scales the amount of work of every benchmark")
+    parser.add_argument("--no-memory", action="store_true", help="Skips measuring the peak memory of every benchmark")
+    parser.add_argument("--profile", help="Profiles the benchmarks, printing a table and writing collapsed stacks here")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="The catalog written by build_catalog")
+    parser.add_argument("--teams", default=TEAMS_PATH, help="The stored teams, as written by save_teams")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the synthetic teams and the random streams")
+    args = parser.parse_args(args)
+
+    if not os.path.exists(args.catalog):
+        parser.error(f"No catalog at {args.catalog}, build one with catalog.py first")
+    fixtures = load_fixtures(args.catalog, args.teams, seed=args.seed)
+    results = run_benchmarks(fixtures, args.only, args.repeat, args.scale, not args.no_memory)
+    if results["max_rss_bytes"] is not None:
+        print(f"max rss {results['max_rss_bytes'] / 1024 / 1024:.1f} MiB")
+
+    if args.profile:
+        profiler = profile_benchmarks(fixtures, args.only, args.scale)
+        profiler.write_collapsed_stacks(args.profile)
+        print(profiler.format_table(limit=10))
+
+    if args.output:
+        save_baseline(results, args.output)
+    if args.compare:
+        changes, regressions = compare_baselines(load_baseline(args.compare), results, args.threshold)
+        print("\n".join(changes))
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.threshold:.0%}:")
+            print("\n".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
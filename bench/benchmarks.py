@@ -0,0 +1,269 @@
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable
+
+from battler.game import Game
+from battler.player import Player
+from battler.battle_turn import BattleTurn
+from battler.shop_turn import ShopTurn
+from battler.battle_cache import BattleCache
+from battler.batch_battle import score_results
+from mcts.search import MonteCarloTreeSearch
+
+# Bumped whenever the benchmarks change in a way that makes older baselines incomparable
+BASELINE_VERSION = 1
+
+
+@dataclass
+class Benchmark:
+    """A class that represents a benchmark, timed as a rate of work per second."""
+
+    name: str
+    unit: str # What the benchmark counts, like "battles"
+    # Returns a (run, count) pair from the fixtures and a scale, where run does count units of work. The setup isn't timed,
+    # and is done again before every run, so runs don't see each other's mutations.
+    setup: Callable
+    description: str = field(default="")
+
+
+def _setup_battles(fixtures, scale):
+    """Battles the stored teams against each other, and the synthetic teams against each other."""
+    teams = fixtures.teams[:int(40 * scale)]
+    synthetic_teams = fixtures.synthetic_teams[:int(40 * scale)]
+    matchups = [(team_1, team_2) for team_1 in teams for team_2 in teams[:25]]
+    matchups += [(team_1, team_2) for team_1 in synthetic_teams for team_2 in synthetic_teams[:25]]
+    game = Game(fixtures.pet_types, fixtures.food_types, fixtures.status_types, [Player("Dummy")],
+                rng=random.Random(fixtures.seed))
+
+    def run():
+        for team_1, team_2 in matchups:
+            BattleTurn(team_1, team_2, game).play()
+
+    return run, len(matchups)
+
+
+def _setup_clones(fixtures, scale):
+    """Clones every team, as every battle and search node does."""
+    teams = (fixtures.teams + fixtures.synthetic_teams) * max(1, int(50 * scale))
+
+    def run():
+        for team in teams:
+            team.clone()
+
+    return run, len(teams)
+
+
+def _setup_shop_turns(fixtures, scale):
+    """Plays shop turns with random moves, at every turn of the game, starting from the synthetic teams."""
+    turns = []
+    for i in range(int(1000 * scale)):
+        player = Player("Me")
+        player.team = fixtures.synthetic_teams[i % len(fixtures.synthetic_teams)].clone()
+        game = Game(fixtures.pet_types, fixtures.food_types, fixtures.status_types, [player],
+                    rng=random.Random(f"{fixtures.seed}:{i}"))
+        game.turn = 1 + i % 11
+        turns.append(ShopTurn(player, game))
+
+    def run():
+        for shop_turn in turns:
+            shop_turn.play()
+
+    return run, len(turns)
+
+
+def _setup_games(fixtures, scale):
+    """Plays whole games between two players that make random moves."""
+    games = []
+    for i in range(int(40 * scale)):
+        pack = "StandardPack" if i % 2 == 0 else "ExpansionPack1"
+        games.append(Game(fixtures.pet_types, fixtures.food_types, fixtures.status_types, [Player("Me"), Player("You")],
+                          pack, random.Random(f"{fixtures.seed}:{i}")))
+
+    def run():
+        for game in games:
+            game.play()
+
+    return run, len(games)
+
+
+def _setup_search(fixtures, scale):
+    """Searches a shop turn, battling every leaf against a few synthetic opponents."""
+    player = Player("Me")
+    player.team = fixtures.synthetic_teams[0].clone()
+    game = Game(fixtures.pet_types, fixtures.food_types, fixtures.status_types, [player],
+                rng=random.Random(fixtures.seed))
+    game.turn = 3
+    shop_turn = ShopTurn(player, game)
+    opponents = fixtures.synthetic_teams[1:9]
+    cache = BattleCache(rng=game.rng)
+    iterations = int(300 * scale)
+
+    def evaluate(leaf_turn):
+        return score_results(cache.play_batch([(leaf_turn.team, opponent) for opponent in opponents], game))
+
+    def run():
+        MonteCarloTreeSearch(shop_turn, evaluate).search(iterations)
+
+    return run, iterations
+
+
+BENCHMARKS = [
+    Benchmark("battle", "battles", _setup_battles, "BattleTurn.play"),
+    Benchmark("clone", "clones", _setup_clones, "Team.clone"),
+    Benchmark("shop_turn", "turns", _setup_shop_turns, "ShopTurn.play"),
+    Benchmark("game", "games", _setup_games, "Game.play"),
+    Benchmark("search", "iterations", _setup_search, "MonteCarloTreeSearch.search"),
+]
+
+
+def _reseed(fixtures):
+    """Seeds the global random stream, which code without a random stream of its own draws from."""
+    random.seed(fixtures.seed)
+
+
+def run_benchmark(benchmark, fixtures, repeat=3, scale=1.0, measure_memory=True):
+    """Runs a benchmark, returning the best of its timed runs and the peak memory of an untimed run.
+
+    Args:
+        benchmark (Benchmark): The benchmark to run.
+        fixtures (Fixtures): The fixtures the benchmark runs on.
+        repeat (int): The amount of timed runs.
+        scale (float): Scales the amount of work in a run.
+        measure_memory (bool): Whether to do an extra run under tracemalloc, which is too slow to be timed.
+
+    Returns:
+        dict: The result of the benchmark.
+    """
+    times = []
+    for _ in range(repeat):
+        _reseed(fixtures)
+        run, count = benchmark.setup(fixtures, scale)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    result = {
+        "unit": benchmark.unit,
+        "count": count,
+        "rate": count / best if best > 0 else float("inf"),
+        "best_seconds": best,
+        "median_seconds": sorted(times)[len(times) // 2],
+    }
+
+    if measure_memory:
+        _reseed(fixtures)
+        run, _ = benchmark.setup(fixtures, scale)
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def profile_benchmarks(fixtures, names=None, scale=1.0):
+    """Runs the benchmarks, or the ones with the given names, once under a Profiler, and returns the profiler."""
+    from profiling import Profiler
+
+    profiler = Profiler()
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+        _reseed(fixtures)
+        run, _ = benchmark.setup(fixtures, scale)
+        with profiler:
+            run()
+    return profiler
+
+
+def get_max_rss():
+    """Returns the high water mark of the resident memory of the process in bytes, or None where it's unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024 # Linux reports kilobytes
+
+
+def run_benchmarks(fixtures, names=None, repeat=3, scale=1.0, measure_memory=True, output=print):
+    """Runs the benchmarks, or the ones with the given names, and returns a baseline of their results."""
+    results = {}
+    for benchmark in BENCHMARKS:
+        if names and benchmark.name not in names:
+            continue
+        results[benchmark.name] = run_benchmark(benchmark, fixtures, repeat, scale, measure_memory)
+        if output:
+            output(format_result(benchmark.name, results[benchmark.name]))
+    return {
+        "version": BASELINE_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": fixtures.seed,
+        "scale": scale,
+        "max_rss_bytes": get_max_rss(),
+        "benchmarks": results,
+    }
+
+
+def format_result(name, result):
+    """Returns a line describing the result of a benchmark."""
+    line = f"{name:<10} {result['rate']:>12.1f} {result['unit']}/s"
+    if "peak_bytes" in result:
+        line += f"  peak {result['peak_bytes'] / 1024:.0f} KiB"
+    return line
+
+
+def save_baseline(baseline, path):
+    """Writes a baseline to a JSON file."""
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def load_baseline(path):
+    """Reads a baseline from a JSON file written by save_baseline."""
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"Baseline {path} has version {baseline.get('version')}, expected {BASELINE_VERSION}. "
+                         f"Record a new one.")
+    return baseline
+
+
+def compare_baselines(baseline, current, threshold=0.1):
+    """Compares the results of a run to a baseline.
+
+    Args:
+        baseline (dict): The baseline, as returned by run_benchmarks or load_baseline.
+        current (dict): The results of the run to compare.
+        threshold (float): The fraction a rate can drop, or a peak memory can grow, by before it's a regression.
+
+    Returns:
+        tuple: A list of lines describing the changes, and a list of lines describing the regressions.
+    """
+    if baseline.get("scale") != current.get("scale"):
+        raise ValueError(f"The baseline ran at scale {baseline.get('scale')}, but the run at scale {current.get('scale')}")
+    changes = []
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            changes.append(f"{name:<10} not in the baseline")
+            continue
+        rate_change = result["rate"] / baseline_result["rate"] - 1
+        line = f"{name:<10} {baseline_result['rate']:>12.1f} -> {result['rate']:>12.1f} {result['unit']}/s ({rate_change:+.1%})"
+        regressed = rate_change < -threshold
+        if "peak_bytes" in result and baseline_result.get("peak_bytes"):
+            memory_change = result["peak_bytes"] / baseline_result["peak_bytes"] - 1
+            line += f"  peak {memory_change:+.1%}"
+            regressed = regressed or memory_change > threshold
+        changes.append(line)
+        if regressed:
+            regressions.append(line)
+    return changes, regressions
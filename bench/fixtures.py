@@ -0,0 +1,59 @@
+import random
+from dataclasses import dataclass, field
+
+from pet import Pet, MAX_HEALTH, MAX_ATTACK
+from team import Team
+from battler.game_rules import GameRules
+from catalog import CATALOG_PATH, load_catalog
+from serialization import TEAMS_PATH, load_teams
+
+SYNTHETIC_PACK = "StandardPack"
+
+
+@dataclass
+class Fixtures:
+    """A class that represents the fixed inputs of the benchmarks, which are the same on every run."""
+
+    pet_types: dict
+    food_types: dict
+    status_types: dict
+    teams: list = field(default_factory=list) # The stored teams of teams.npz
+    synthetic_teams: list = field(default_factory=list) # Seeded random teams of the catalog
+    seed: int = field(default=0)
+
+
+def make_synthetic_team(rules, rng):
+    """Returns a random team of the pets of a pack, with the levels and stats of a random turn."""
+    turn = rng.randint(1, 11)
+    tiers = sorted(tier for tier in rules.pets_by_tier if tier <= (turn + 1) // 2)
+    team = Team()
+    for _ in range(rng.randint(1, Team.TEAM_SIZE)):
+        pet_type = rng.choice(rules.pets_by_tier[rng.choice(tiers)])
+        level = rng.choice((1, 1, 1, 2, 2, 3))
+        health = min(pet_type.health + rng.randrange(2 * turn), MAX_HEALTH)
+        attack = min(pet_type.attack + rng.randrange(2 * turn), MAX_ATTACK)
+        team.add_pet(Pet(pet_type, team, health, attack, level))
+    return team
+
+
+def load_fixtures(catalog_path=CATALOG_PATH, teams_path=TEAMS_PATH, synthetic_count=200, seed=0):
+    """Loads the benchmark fixtures, without any network access.
+
+    Args:
+        catalog_path (str): The path of a catalog written by build_catalog.
+        teams_path (str): The path of the stored teams, or None to only use synthetic teams.
+        synthetic_count (int): The amount of synthetic teams.
+        seed: The seed of the synthetic teams, and of the random streams of the benchmarks.
+
+    Returns:
+        Fixtures: The loaded fixtures.
+    """
+    pet_types, food_types, status_types = load_catalog(catalog_path)
+    teams = []
+    if teams_path is not None:
+        teams = load_teams(pet_types, status_types, teams_path)
+
+    rules = GameRules.get(pet_types, food_types, status_types, SYNTHETIC_PACK)
+    rng = random.Random(seed)
+    synthetic_teams = [make_synthetic_team(rules, rng) for _ in range(synthetic_count)]
+    return Fixtures(pet_types, food_types, status_types, teams, synthetic_teams, seed)
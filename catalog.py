@@ -0,0 +1,139 @@
+import json
+import sys
+
+from pet_type import PetType
+from food_type import FoodType
+from status_type import StatusType
+
+SOURCE_URL = "https://superauto.pet/api.json"
+CATALOG_PATH = "catalog.json"
+# Bumped whenever the catalog format, or the fixes applied to the source, change
+CATALOG_VERSION = 1
+
+# The keys of the source the simulation reads, anything else (like images) is left out of the catalog
+PET_KEYS = ("name", "id", "tier", "baseHealth", "baseAttack", "packs", "level1Ability", "level2Ability", "level3Ability",
+            "probabilities")
+FOOD_KEYS = ("name", "id", "tier", "packs", "ability", "cost", "probabilities")
+STATUS_KEYS = ("name", "id", "ability")
+
+
+def parse_pet_types(source: dict | str):
+    pet_types = {}
+    if isinstance(source, str):
+        source = json.loads(source)
+    pet_types_json = source['pets']
+    for pet_id, pet_type_json in pet_types_json.items():
+        pet_types[pet_id]= PetType(pet_type_json)
+
+    return pet_types
+
+def parse_food_types(source: dict | str):
+    food_types = {}
+    if isinstance(source, str):
+        source = json.loads(source)
+    food_types_json = source['foods']
+    for food_id, food_type_json in food_types_json.items():
+        food_types[food_id] = FoodType(food_type_json)
+
+    return food_types
+
+def parse_status_types(source: dict | str):
+    status_types = {}
+    if isinstance(source, str):
+        source = json.loads(source)
+    status_types_json = source['statuses']
+    for status_id, status_type_json in status_types_json.items():
+        status_types[status_id] = StatusType(status_type_json)
+    return status_types
+
+
+def fix_superauto_dot_pet_source(source: dict | str):
+    """Some fixes for the specific source used, which has a few errors/incosistencies."""
+    if isinstance(source, str):
+        source = json.loads(source)
+    pet_types_json = source['pets']
+    for pet_id, pet_type_json in pet_types_json.items():
+        if pet_id == 'pet-cow':
+            for key, value in pet_type_json.items():
+                if 'ability' in key:
+                    ability_json = pet_type_json[key]
+                    ability_json['effect']['food'] == 'food-milk'
+
+
+    food_types_json = source['foods']
+    for food_id, food_type_json in food_types_json.items():
+        if food_type_json['ability']['trigger'] == "Buy":
+            food_type_json['ability']['trigger'] = "BuyFood"
+        if food_id == "food-milk":
+            food_type_json['cost'] = 0
+        if food_id == "food-sleeping-pill":
+            food_type_json['cost'] = 1
+
+    status_types_json = source['statuses']
+    for status_id, status_type_json in status_types_json.items():
+        if status_id == "status-splash-attack":
+            status_type_json['ability']['trigger'] = "AfterAttack"
+    return source
+
+
+def _strip(items_json, keys):
+    """Returns the items with only the given keys, and only the shop probabilities."""
+    stripped = {}
+    for item_id, item_json in items_json.items():
+        item = {key: item_json[key] for key in keys if key in item_json}
+        if "probabilities" in item:
+            item["probabilities"] = [probability for probability in item["probabilities"] if probability["kind"] == "shop"]
+        stripped[item_id] = item
+    return stripped
+
+
+def build_catalog(source: dict | str, path=CATALOG_PATH):
+    """Writes a rules-only catalog of a superauto.pet source, with the source fixes applied and images left out.
+
+    Args:
+        source (dict | str): The source, as downloaded from SOURCE_URL.
+        path (str): The path to write the catalog to.
+
+    Returns:
+        dict: The catalog that was written.
+    """
+    source = fix_superauto_dot_pet_source(source)
+    catalog = {
+        "version": CATALOG_VERSION,
+        "pets": _strip(source["pets"], PET_KEYS),
+        "foods": _strip(source["foods"], FOOD_KEYS),
+        "statuses": _strip(source["statuses"], STATUS_KEYS),
+    }
+    with open(path, "w") as f:
+        json.dump(catalog, f, separators=(",", ":"))
+    return catalog
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Loads the pet, food and status types from a catalog written by build_catalog, without any network access.
+
+    Returns:
+        tuple: The pet types, food types and status types dictionaries.
+    """
+    with open(path) as f:
+        catalog = json.load(f)
+    if catalog.get("version") != CATALOG_VERSION:
+        raise ValueError(f"Catalog {path} has version {catalog.get('version')}, expected {CATALOG_VERSION}. "
+                         f"Rebuild it with build_catalog.")
+    return parse_pet_types(catalog), parse_food_types(catalog), parse_status_types(catalog)
+
+
+def download_source(url=SOURCE_URL):
+    """Downloads a superauto.pet source."""
+    import requests
+    return requests.get(url).json()
+
+
+if __name__ == '__main__':
+    # Usage: python catalog.py [source.json] [catalog path], downloading the source if no file is given
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            source = json.load(f)
+    else:
+        source = download_source()
+    build_catalog(source, sys.argv[2] if len(sys.argv) > 2 else CATALOG_PATH)
@@ -1,5 +1,6 @@
 import json
 import logging
+from ability import Ability
 from battler.get_targets import get_targets
 
 COST = 3
@@ -14,9 +15,9 @@ class FoodType:
         self.name = food_json['name']
         self.id = food_json['id']
         self.tier = food_json['tier']
-        self.image_data = food_json['image']
+        self.image_data = food_json.get('image')
         self.packs = food_json['packs']
-        self.ability = food_json['ability']
+        self.ability = Ability(food_json['ability'], FOOD_ABILITY_HANDLERS)
         self.cost = food_json.get('cost', COST)
         if "probabilities" in food_json:
             self._init_probabilities(food_json)
@@ -30,6 +31,12 @@ class FoodType:
                 turn = int(probability_json["turn"].split("-")[1])
                 self.probabilities[turn] = probability_json["perSlot"]
     
+    def __setstate__(self, state):
+        """Restores a pickled food type, compiling an ability that was pickled in its JSON form."""
+        self.__dict__.update(state)
+        if isinstance(self.ability, dict):
+            self.ability = Ability(self.ability, FOOD_ABILITY_HANDLERS)
+
     def __str__(self):
         """Returns a string representation of the food type."""
         return self.name
@@ -37,71 +44,67 @@ class FoodType:
 
     def trigger_event(self, event_type, event_data):
         """Triggers an event for the pet."""
-        # logging.debug(f"              {self} triggered {event_type} in {event_data['team']}")
+        # logging.debug(f"              {self} triggered {event_type} in {event_data.team}")
         ability = self.ability
             
         if not ability:
             return
 
-        pets = event_data.get("team_pets_snapshot")
-        if pets is None: # When abilities are out of battle, snapshots are not needed
-            pets = event_data["team"].pets
-        ability_trigger = ability["trigger"]
-        if event_type == ability_trigger:
-            ability_effect = ability["effect"]
-            self.perform_ability(ability_effect, event_data)
+        if event_type == ability.trigger:
+            self.perform_ability(ability.effect, event_data)
 
     def perform_ability(self, ability_effect, event_data):
         """Performs the ability of the pet."""
         # TODO: Return True if casted, otherwise false, in order to trigger CastsAbility trigger type
-        match ability_effect["kind"]:
-            case "ModifyStats":
-                affected_pets = self.perform_modify_stats_ability(ability_effect, event_data)
-            case "GainExperience":
-                affected_pets = self.perform_gain_experience_ability(ability_effect, event_data)
-            case "ApplyStatus":
-                affected_pets = self.perform_apply_status_ability(ability_effect, event_data)
-            case _:
-                return
+        if ability_effect.handler is None:
+            return
+        affected_pets = ability_effect.handler(self, ability_effect, event_data)
 
         for pet in affected_pets:
-            pet.trigger_event("EatsShopFood", {"food": self, "pet": pet} | event_data)
+            pet.trigger_event("EatsShopFood", event_data.copy(food=self, pet=pet))
 
     def perform_apply_status_ability(self, ability_effect, event_data):
         """Performs the apply status ability of the food."""
-        status_id = ability_effect["status"]
+        status_id = ability_effect.status
         targets = get_targets(ability_effect, event_data)
         for target in targets:
-            target.status = event_data["status_types"][status_id]
+            target.set_status(event_data.status_types[status_id])
         return targets
 
     def perform_gain_experience_ability(self, ability_effect, event_data):
         """Performs the gain experience ability of the food."""
-        experience_amount = ability_effect["amount"]
+        experience_amount = ability_effect.amount
         targets = get_targets(ability_effect, event_data)
         for target in targets:
-            target.add_experience(experience_amount, event_data["turn"])
+            target.add_experience(experience_amount, event_data.turn)
         return targets
 
     def perform_modify_stats_ability(self, ability_effect, event_data):
         """Performs the modify stats ability of the pet."""
-        health_amount = ability_effect.get("healthAmount", 0)
-        attack_amount = ability_effect.get("attackAmount", 0)
-        ability_target = ability_effect["target"]
+        health_amount = ability_effect.health_amount
+        attack_amount = ability_effect.attack_amount
+        ability_target = ability_effect.target
 
         until_end_of_battle = False
-        if event_data["turn_type"] == "shop":
-            team = event_data["original_team"]
-            until_end_of_battle = ability_effect["untilEndOfBattle"]
-        elif event_data["turn_type"] == "battle":
-            team = event_data["team"]
-
-        if ability_target["kind"] == "EachShopAnimal":
-            if ability_target["includingFuture"]:
-                shop = event_data["shop"]
+        if event_data.turn_type == "shop":
+            team = event_data.original_team
+            until_end_of_battle = ability_effect.until_end_of_battle
+        elif event_data.turn_type == "battle":
+            team = event_data.team
+
+        if ability_target.kind == "EachShopAnimal":
+            if ability_target.including_future:
+                shop = event_data.shop
                 shop.buff_shop(health_amount, attack_amount)
         else:
             target_pets = get_targets(ability_effect, event_data, team_pets=team.pets)
             for pet in target_pets:
                 pet.buff(health_amount, attack_amount, until_end_of_battle)
         return []
+
+
+FOOD_ABILITY_HANDLERS = {
+    "ModifyStats": FoodType.perform_modify_stats_ability,
+    "GainExperience": FoodType.perform_gain_experience_ability,
+    "ApplyStatus": FoodType.perform_apply_status_ability,
+}
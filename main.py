@@ -1,6 +1,5 @@
 import json
 from pickle import TRUE
-import requests
 import logging
 from battler.battle_turn import BattleTurn
 from mcts import mcts
@@ -22,71 +21,22 @@ from battler.player import Player
 from pet import Pet
 from battler.game import Game
 
-SOURCE_URL = "https://superauto.pet/api.json"
-
-def parse_pet_types(source: dict | str):
-    pet_types = {}
-    if isinstance(source, str):
-        source = json.loads(source)
-    pet_types_json = source['pets']
-    for pet_id, pet_type_json in pet_types_json.items():
-        pet_types[pet_id]= PetType(pet_type_json)
-
-    return pet_types
-
-def parse_food_types(source: dict | str):
-    food_types = {}
-    if isinstance(source, str):
-        source = json.loads(source)
-    food_types_json = source['foods']
-    for food_id, food_type_json in food_types_json.items():
-        food_types[food_id] = FoodType(food_type_json)
-
-    return food_types
-
-def parse_status_types(source: dict | str):
-    status_types = {}
-    if isinstance(source, str):
-        source = json.loads(source)
-    status_types_json = source['statuses']
-    for status_id, status_type_json in status_types_json.items():
-        status_types[status_id] = StatusType(status_type_json)
-    return status_types
-
-
-def fix_superauto_dot_pet_source(source: dict | str):
-    """Some fixes for the specific source used, which has a few errors/incosistencies."""
-    if isinstance(source, str):
-        source = json.loads(source)
-    pet_types_json = source['pets']
-    for pet_id, pet_type_json in pet_types_json.items():
-        if pet_id == 'pet-cow':
-            for key, value in pet_type_json.items():
-                if 'ability' in key:
-                    ability_json = pet_type_json[key]
-                    ability_json['effect']['food'] == 'food-milk'
-                
-
-    food_types_json = source['foods']
-    for food_id, food_type_json in food_types_json.items():
-        if food_type_json['ability']['trigger'] == "Buy":
-            food_type_json['ability']['trigger'] = "BuyFood"
-        if food_id == "food-milk":
-            food_type_json['cost'] = 0
-        if food_id == "food-sleeping-pill":
-            food_type_json['cost'] = 1
-
-    status_types_json = source['statuses']
-    for status_id, status_type_json in status_types_json.items():
-        if status_id == "status-splash-attack":
-            status_type_json['ability']['trigger'] = "AfterAttack"
-    return source
-        
-def pickle_best_teams(team_count=750):
+from catalog import (SOURCE_URL, CATALOG_PATH, parse_pet_types, parse_food_types, parse_status_types,
+                     fix_superauto_dot_pet_source, build_catalog, load_catalog, download_source)
+
+def pickle_best_teams(team_count=750, workers=None, mode="round_robin", top_k=250, rounds=None):
+    # The Swiss tournament finds most of the round robin's top teams in a fraction of its battles, once there are many
+    # more teams than top_k
+    if mode not in ("round_robin", "swiss"):
+        raise ValueError(f"Unknown mode {mode}, expected round_robin or swiss")
     from battler.shop_turn import ShopTurn
     from battler.battle_turn import BattleTurn
     from battler.battle_turn import BattleResult
+    from battler.battle_cache import BattleCache
+    from battler.executor import BattleExecutor
+    from battler.tournament import SwissTournament
 
+    cache = BattleCache()
     teams = []
     for i in range(team_count):
         player = Player("Me")
@@ -94,60 +44,75 @@ def pickle_best_teams(team_count=750):
         game = Game(pet_types, food_types, status_types, [player], "StandardPack")
         ShopTurn(player, game).play()
         teams.append(player.team.clone())
-
-    count = 0
-    wins = {}
-    for i in range(len(teams)):
-        team_1 = teams[i]
-        for team_2 in teams[i+1:]:
-            if team_1 != team_2:
-                game = Game(pet_types, food_types, status_types, [player], "StandardPack")
-                count += 1
-                result = BattleTurn(team_1, team_2, game).play()
-                if result == BattleResult.TEAM_1_WIN:
-                    wins[team_1] = wins.get(team_1, 0) + 1
-                elif result == BattleResult.TEAM_2_WIN:
-                    wins[team_2] = wins.get(team_2, 0) + 1
-                elif result == BattleResult.DRAW:
-                    wins[team_1] = wins.get(team_1, 0) + 1
-                    wins[team_2] = wins.get(team_2, 0) + 1
-
-        print(f"{i}")
-    
-    # Sort by wins
-    wins = sorted(wins.items(), key=lambda x: x[1], reverse=True)
-    winners = []
-    for winner, wins in wins:
-        winners.append(winner)
-        print(f"{winner}: {wins}")
+    # Identical teams would only battle each other to draws and split their ratings
+    unique_teams = {}
+    for team in teams:
+        unique_teams.setdefault(team.get_state_key(), team)
+    teams = list(unique_teams.values())
+
+    game = Game(pet_types, food_types, status_types, [player], "StandardPack")
+    executor = BattleExecutor(pet_types, food_types, status_types, max_workers=workers) if workers else None
+    if mode == "swiss":
+        tournament = SwissTournament(teams, game, top_k=top_k, max_rounds=rounds, cache=cache, executor=executor)
+        winners = tournament.play()
+        for i in tournament.get_top():
+            print(f"{teams[i]}: {tournament.ratings[i]:.0f}")
+        count = tournament.battles
+    else:
+        matchups = [(team_1, team_2) for i, team_1 in enumerate(teams) for team_2 in teams[i+1:]]
+        if executor:
+            results = executor.battle(matchups)
+        else:
+            results = (cache.play(team_1, team_2, game) for team_1, team_2 in matchups)
+
+        count = 0
+        wins = {}
+        for (team_1, team_2), result in zip(matchups, results):
+            count += 1
+            if result == BattleResult.TEAM_1_WIN:
+                wins[team_1] = wins.get(team_1, 0) + 1
+            elif result == BattleResult.TEAM_2_WIN:
+                wins[team_2] = wins.get(team_2, 0) + 1
+            elif result == BattleResult.DRAW:
+                wins[team_1] = wins.get(team_1, 0) + 1
+                wins[team_2] = wins.get(team_2, 0) + 1
+
+        # Sort by wins
+        wins = sorted(wins.items(), key=lambda x: x[1], reverse=True)
+        winners = []
+        for winner, wins in wins:
+            winners.append(winner)
+            print(f"{winner}: {wins}")
+    if executor:
+        executor.close()
 
     print(count)
-    # import pickle
+    # from serialization import save_teams
     # TEAMS_TO_SAVE = 250
-    # with open("teams.pickle", "wb") as f:
-    #     pickle.dump(winners[:TEAMS_TO_SAVE], f)
-
-def test_games(game_count=5000):
-    winners = {"Me": 0, "You": 0}
-    for i in range(game_count):
-        pack = "StandardPack"
-        if i > game_count/2:
-            pack = "ExpansionPack1"
-        game = Game(pet_types, food_types, status_types, [Player("Me"), Player("You")], pack)
-
-
-        winner = game.play()
-        winners[winner] += 1
-        print(i)
-    print(winners)
+    # save_teams("teams.npz", winners[:TEAMS_TO_SAVE], pet_types)
+
+def test_games(game_count=5000, workers=None, seed=None, path="games.jsonl", players=("Me", "You"), resume=True):
+    import time
+    from battler.executor import BattleExecutor, GameSpec
+    from battler.simulation import simulate_games
+
+    t = time.perf_counter()
+    # Each game gets its own seed, so any game can be replayed on its own
+    game_specs = (GameSpec("ExpansionPack1" if i > game_count / 2 else "StandardPack", players,
+                           None if seed is None else seed + i) for i in range(game_count))
+    if workers:
+        with BattleExecutor(pet_types, food_types, status_types, max_workers=workers) as executor:
+            stats = simulate_games(game_specs, path, executor=executor, resume=resume)
+    else:
+        stats = simulate_games(game_specs, path, pet_types, food_types, status_types, resume=resume)
+    print(stats.format())
     print(time.perf_counter() - t)
 
 if __name__ == '__main__':
-    source = requests.get(SOURCE_URL).json()
-    source = fix_superauto_dot_pet_source(source)
-    pet_types = parse_pet_types(source)
-    status_types = parse_status_types(source)
-    food_types = parse_food_types(source)
+    import os
+    if not os.path.exists(CATALOG_PATH):
+        build_catalog(download_source())
+    pet_types, food_types, status_types = load_catalog()
     import time 
     t = time.perf_counter()
 
@@ -0,0 +1,237 @@
+import math
+import random
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from battler.battle_cache import BattleCache
+from battler.batch_battle import RESULT_SCORES
+
+# The scores of BattleResult values, indexed by value
+SCORES = np.zeros(max(RESULT_SCORES) + 1)
+for result_value, result_score in RESULT_SCORES.items():
+    SCORES[result_value] = result_score
+# The variance assumed for strata with less than two battles, the largest a score between -1 and 1 can have
+MAX_VARIANCE = 1.0
+
+
+def team_strength(team):
+    """Returns a rough strength of a team, the total stats of its pets."""
+    return sum(pet.attack + pet.health for pet in team.pets)
+
+
+@dataclass
+class LeafScore:
+    """A class that represents the estimated score of a team against a weighted opponent pool."""
+
+    score: float # The estimated score against the whole pool, on the scale of score_results
+    uncertainty: float # The standard error of the score
+    battles: int
+    # The (battled count, weight sum, weighted score sum, weighted squared score sum) of each stratum, to continue from
+    strata: list = field(default=None, repr=False)
+
+    def get_bounds(self, confidence):
+        """Returns the (low, high) bounds of the score, confidence standard errors away from it."""
+        return self.score - confidence * self.uncertainty, self.score + confidence * self.uncertainty
+
+
+class AdaptiveEvaluator:
+    """Scores leaf teams against a sample of an opponent pool, battling more of it only while the score is uncertain.
+
+    The pool is split into strata by a strength key, and every stage battles opponents from each stratum in proportion
+    to its weight, so even small samples cover the whole pool. A team stops early once its score is precise enough,
+    or once it's clearly worse than the best team scored so far (racing). Batches of teams are evaluated with successive
+    halving, where only the better half of the teams goes on to the next stage.
+    """
+
+    def __init__(self, opponents, game, weights=None, strata=8, stage_size=16, tolerance=0.05, confidence=2.0,
+                 max_battles=None, key=team_strength, cache=None, play=None, seed=None):
+        """Initializes the evaluator.
+
+        Args:
+            opponents (list): The opponent pool.
+            game (Game): The game the battles are played in.
+            weights (list): The weight of each opponent, like the sizes of clusters from compress_opponents.
+            strata (int): The amount of strata to split the pool into.
+            stage_size (int): The amount of battles played per team in every stage.
+            tolerance (float): The uncertainty a score has to shrink to, on the scale of a single battle's score.
+            confidence (float): The amount of standard errors the bounds of racing are away from the scores.
+            max_battles (int): The maximum amount of battles per team, defaults to the whole pool.
+            key (Callable): Returns the strength of an opponent to stratify the pool by.
+            cache (BattleCache): The cache battles are played through.
+            play (Callable): Returns the BattleResult values of a list of matchups, defaults to playing them through
+                the cache. Can be used to play the battles in an executor.
+            seed: The seed of the order opponents are sampled in.
+        """
+        self.game = game
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.stage_size = stage_size
+        self.max_battles = max_battles
+        self.cache = cache if cache is not None else BattleCache(rng=game.rng)
+        self.play = play if play is not None else lambda matchups: self.cache.play_batch(matchups, game)
+        if weights is None:
+            weights = [1] * len(opponents)
+        self.total_weight = float(sum(weights))
+        self.best_low = -math.inf # The lower bound of the best score so far
+
+        # Each stratum is a shuffled list of (opponent, weight), battled in order
+        rng = random.Random(seed)
+        order = sorted(range(len(opponents)), key=lambda i: key(opponents[i]))
+        strata = max(1, min(strata, len(opponents)))
+        self.strata = []
+        for i in range(strata):
+            stratum = [(opponents[j], weights[j]) for j in order[i * len(order) // strata:(i + 1) * len(order) // strata]]
+            rng.shuffle(stratum)
+            self.strata.append(stratum)
+        self.stratum_weights = [sum(weight for _, weight in stratum) / self.total_weight for stratum in self.strata]
+
+    def get_tolerance(self):
+        """Returns the uncertainty scores are evaluated to, on the scale of the scores."""
+        return self.tolerance * self.total_weight
+
+    def evaluate(self, shop_turn, previous=None):
+        """Returns the LeafScore of a turn's team, continuing from a previous LeafScore of it if given."""
+        return self.evaluate_batch([shop_turn], [previous])[0]
+
+    def evaluate_batch(self, shop_turns, previous=None):
+        """Returns the LeafScores of the teams of turns, with successive halving over the turns.
+
+        Every stage battles all remaining teams, then keeps the better half of them for the next stage. Teams that are
+        precise enough, or clearly worse than the best team so far, leave early.
+        """
+        if previous is None:
+            previous = [None] * len(shop_turns)
+        leaf_scores = [self._get_start(leaf_score) for leaf_score in previous]
+        remaining = [i for i in range(len(shop_turns)) if not self._is_done(leaf_scores[i])]
+        while remaining:
+            self._play_stage([shop_turns[i].team for i in remaining], [leaf_scores[i] for i in remaining])
+            for i in remaining:
+                low, _ = leaf_scores[i].get_bounds(self.confidence)
+                self.best_low = max(self.best_low, low)
+            remaining = [i for i in remaining if not self._is_done(leaf_scores[i])]
+            if len(remaining) > 1:
+                remaining.sort(key=lambda i: leaf_scores[i].score, reverse=True)
+                remaining = remaining[:(len(remaining) + 1) // 2]
+        return leaf_scores
+
+    def _get_start(self, leaf_score):
+        """Returns a LeafScore to continue evaluating from, a copy of a previous one or an empty one."""
+        if leaf_score is None:
+            return LeafScore(0, math.inf, 0, [[0, 0.0, 0.0, 0.0] for _ in self.strata])
+        return LeafScore(leaf_score.score, leaf_score.uncertainty, leaf_score.battles,
+                         [stratum[:] for stratum in leaf_score.strata])
+
+    def _is_done(self, leaf_score):
+        """Returns whether a score is precise enough, or clearly worse than the best score so far."""
+        if leaf_score.uncertainty <= self.get_tolerance():
+            return True
+        if self.max_battles is not None and leaf_score.battles >= self.max_battles:
+            return True
+        if all(counts[0] >= len(stratum) for counts, stratum in zip(leaf_score.strata, self.strata)):
+            return True
+        _, high = leaf_score.get_bounds(self.confidence)
+        return high < self.best_low
+
+    def _play_stage(self, teams, leaf_scores):
+        """Battles every team against the next opponents of each stratum, and updates their scores."""
+        matchups = []
+        owners = []
+        for team_index, (team, leaf_score) in enumerate(zip(teams, leaf_scores)):
+            for stratum_index, (stratum, counts) in enumerate(zip(self.strata, leaf_score.strata)):
+                # Every stratum gets battles in proportion to its weight, and at least one
+                amount = max(1, round(self.stage_size * self.stratum_weights[stratum_index]))
+                for opponent, weight in stratum[counts[0]:counts[0] + amount]:
+                    matchups.append((team, opponent))
+                    owners.append((team_index, stratum_index, weight))
+        if not matchups:
+            return
+
+        scores = SCORES[np.asarray(self.play(matchups), dtype=np.int64)]
+        for (team_index, stratum_index, weight), score in zip(owners, scores):
+            leaf_score = leaf_scores[team_index]
+            leaf_score.battles += 1
+            counts = leaf_score.strata[stratum_index]
+            counts[0] += 1
+            counts[1] += weight
+            counts[2] += weight * score
+            counts[3] += weight * score * score
+        for leaf_score in leaf_scores:
+            self._update_score(leaf_score)
+
+    def _update_score(self, leaf_score):
+        """Updates the stratified estimate of a score and its standard error from the battles of its strata."""
+        mean = 0.0
+        variance = 0.0
+        for stratum, stratum_weight, (count, weight_sum, score_sum, squared_sum) in zip(
+                self.strata, self.stratum_weights, leaf_score.strata):
+            if count == 0:
+                variance += stratum_weight * stratum_weight * MAX_VARIANCE
+                continue
+            stratum_mean = score_sum / weight_sum
+            mean += stratum_weight * stratum_mean
+            if count >= len(stratum):
+                continue # The whole stratum was battled, so its mean is exact
+            stratum_variance = MAX_VARIANCE
+            if count > 1:
+                stratum_variance = max(squared_sum / weight_sum - stratum_mean * stratum_mean, 0) * count / (count - 1)
+            # The finite population correction shrinks the error as the stratum runs out
+            variance += stratum_weight * stratum_weight * stratum_variance / count * (1 - count / len(stratum))
+        leaf_score.score = mean * self.total_weight
+        leaf_score.uncertainty = math.sqrt(variance) * self.total_weight
+
+
+def compress_opponents(opponents, game, count=32, probes=None, probe_count=32, iterations=10, cache=None, seed=None):
+    """Compresses an opponent pool into weighted representative opponents.
+
+    Opponents are compared by their scores against a set of probe teams, clustered by those scores, and every cluster
+    is represented by its most central opponent, weighted by the cluster's size.
+
+    Args:
+        opponents (list): The opponent pool.
+        game (Game): The game the battles are played in.
+        count (int): The amount of representatives.
+        probes (list): The teams to compare the opponents by, defaults to a sample of the pool.
+        probe_count (int): The amount of probe teams sampled from the pool if none are given.
+        iterations (int): The amount of clustering iterations.
+        cache (BattleCache): The cache battles are played through.
+        seed: The seed of the probe sample and the clustering.
+
+    Returns:
+        tuple: The list of representative opponents, and the list of their weights.
+    """
+    if len(opponents) <= count:
+        return list(opponents), [1] * len(opponents)
+    rng = random.Random(seed)
+    if probes is None:
+        probes = rng.sample(opponents, min(probe_count, len(opponents)))
+    if cache is None:
+        cache = BattleCache(rng=game.rng)
+    results = cache.play_batch([(opponent, probe) for opponent in opponents for probe in probes], game)
+    profiles = SCORES[np.asarray(results, dtype=np.int64)].reshape(len(opponents), len(probes))
+
+    # k-medoids, starting from the farthest points
+    medoids = [rng.randrange(len(opponents))]
+    distances = np.abs(profiles - profiles[medoids[0]]).sum(axis=1)
+    while len(medoids) < count:
+        medoids.append(int(distances.argmax()))
+        distances = np.minimum(distances, np.abs(profiles - profiles[medoids[-1]]).sum(axis=1))
+    for _ in range(iterations):
+        medoid_distances = np.abs(profiles[:, None, :] - profiles[medoids][None, :, :]).sum(axis=2)
+        clusters = medoid_distances.argmin(axis=1)
+        new_medoids = []
+        for cluster in range(len(medoids)):
+            members = np.flatnonzero(clusters == cluster)
+            if len(members) == 0:
+                new_medoids.append(medoids[cluster])
+                continue
+            member_distances = np.abs(profiles[members][:, None, :] - profiles[members][None, :, :]).sum(axis=(1, 2))
+            new_medoids.append(int(members[member_distances.argmin()]))
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+
+    clusters = np.abs(profiles[:, None, :] - profiles[medoids][None, :, :]).sum(axis=2).argmin(axis=1)
+    weights = np.bincount(clusters, minlength=len(medoids))
+    return ([opponents[medoid] for medoid, weight in zip(medoids, weights) if weight],
+            [int(weight) for weight in weights if weight])
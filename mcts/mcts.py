@@ -2,75 +2,118 @@ import logging
 from battler.game import Game
 from battler.player import Player
 from battler.shop_turn import ShopTurn
-from team import Team
 from battler.battle_turn import BattleTurn, BattleResult
-from montecarlo.node import Node
-from montecarlo.montecarlo import MonteCarlo
+from battler.batch_battle import score_results
+from battler.battle_cache import BattleCache
+from battler.win_probability import estimate_win_probability
+from battler.executor import BattleExecutor
+from mcts.search import MonteCarloTreeSearch
+from mcts.parallel import root_parallel_search, make_batch_evaluator, make_executor_play
+from mcts.evaluation import AdaptiveEvaluator, compress_opponents
+from serialization import TEAMS_PATH, load_teams
+from opponent_pool import OpponentPool
 
 
 # Monte-Carlo Tree Search
 
-import pickle
-with open("teams.pickle", "rb") as f:
-    teams: list[Team] = pickle.load(f)
 
-class TurnState:
-    def __init__(self, shop_turn):
-        self.shop_turn = shop_turn
-        self.score = None
-
-    def clone(self):
-        return TurnState(self.shop_turn.clone())
-
-
-def simulate(pet_types, food_types, status_types, iterations=50):
+def simulate(pet_types, food_types, status_types, iterations=890, time_limit=None, estimate=False, workers=None,
+             parallel="root", batch_size=None, adaptive=False, representatives=None, teams_path=TEAMS_PATH,
+             pool_path=None):
     """
-    Simulate the game for a given number of iterations.
+    Simulate the game for a given number of iterations, or seconds, per move.
+    With estimate, leaves are scored by their estimated win probabilities instead of a single battle per opponent.
+    With adaptive, leaves are scored against a stratified sample of the opponents that grows only while the score is
+    uncertain, and representatives compresses the opponents into that many weighted representatives first.
+    With workers, the search runs in a process pool: "root" runs an independent search per worker and merges them by
+    visits, and "leaf" evaluates batch_size leaves at a time (one per worker by default) across the workers.
+    The opponents are the teams stored at teams_path, or with pool_path, the teams of an opponent pool, which are battled
+    straight from its memory-mapped columns, across the workers if there are any.
     """
+    if estimate and adaptive:
+        raise ValueError("Leaves can either be estimated or adaptively scored")
+    if pool_path is not None:
+        if estimate or adaptive or representatives:
+            raise ValueError("Leaves are scored against opponent pools by battling every opponent")
+        _simulate_pool(pet_types, food_types, status_types, pool_path, iterations, time_limit, workers)
+        return
+    teams = load_teams(pet_types, status_types, teams_path)
     game = Game(pet_types, food_types, status_types, players=[Player("Dummy")])
-
-    def child_finder(node, self):
-        # TODO: End turn events
-        move_options = node.state.shop_turn.get_move_options()[0]
-        if node.state.shop_turn.are_moves_left(move_options):
-            for move in move_options:
-                child = Node(node.state.clone())
-                child.state.shop_turn.play_move(move)
-                node.add_child(child)
+    shop_turn = ShopTurn(game.players[0], game) # TODO: Rework shop turn to not depend on player and game
+    cache = BattleCache()
+    opponents, weights = teams, None
+    if representatives:
+        adaptive = True
+        opponents, weights = compress_opponents(teams, game, representatives, cache=cache)
+
+    if workers is None:
+        if adaptive:
+            evaluator = AdaptiveEvaluator(opponents, game, weights, cache=cache)
+            search = MonteCarloTreeSearch(shop_turn, evaluator.evaluate, refine_uncertainty=evaluator.get_tolerance())
+            _play_moves(search, iterations, time_limit)
+            return
+
+        def evaluate(shop_turn):
+            # TODO: End turn events
+            team = shop_turn.team
+            if estimate:
+                return sum(estimate_win_probability(team, opponent, game).expected_score() for opponent in teams)
+            results = cache.play_batch([(team, opponent) for opponent in teams], game) # Rework battle turn to not depend on game
+            return score_results(results)
+
+        _play_moves(MonteCarloTreeSearch(shop_turn, evaluate), iterations, time_limit)
+        return
+
+    with BattleExecutor(pet_types, food_types, status_types, max_workers=workers) as executor:
+        if parallel == "root":
+            for i in range(5):
+                print(shop_turn.get_move_options()[0])
+                move, _ = root_parallel_search(shop_turn, opponents, executor, iterations, time_limit, estimate,
+                                               adaptive=adaptive, weights=weights)
+                if move is None:
+                    break
+                shop_turn.play_move(move)
+                print(str(shop_turn.team))
+        elif parallel == "leaf":
+            if estimate:
+                raise ValueError("Leaf parallel searches score leaves by battles, and can't estimate")
+            if adaptive:
+                evaluator = AdaptiveEvaluator(opponents, game, weights, play=make_executor_play(executor, game.pack))
+                search = MonteCarloTreeSearch(shop_turn, evaluate_batch=evaluator.evaluate_batch,
+                                              refine_uncertainty=evaluator.get_tolerance())
+            else:
+                search = MonteCarloTreeSearch(shop_turn, evaluate_batch=make_batch_evaluator(executor, teams, game.pack))
+            _play_moves(search, iterations, time_limit, batch_size or executor.max_workers)
         else:
-            child = Node(node.state.clone())
-            team = child.state.shop_turn.team
-            score = 0
-            for opponent in teams:
-                result = BattleTurn(team, opponent, game).play() # Rework battle turn to not depend on game
-                if result == BattleResult.TEAM_1_WIN:
-                    score += 1
-                elif result == BattleResult.TEAM_2_WIN:
-                    score -= 1
-                elif result == BattleResult.DRAW:
-                    score += 0.5
-            child.state.score = score
-            node.add_child(child)
-
-
-    def node_evaluator(node, self):
-        return node.state.score
-
-    root = Node(TurnState(ShopTurn(game.players[0], game))) # TODO: Rework shop turn to not depend on player and game
-    mc = MonteCarlo(root)
-    mc.child_finder = child_finder
-    mc.node_evaluator = node_evaluator
-
-    mc.simulate(890)
-    for i in range(5):
-        print(mc.root_node.state.shop_turn.get_move_options()[0])
-        root_node = mc.make_choice()
-        print(str(root_node.state.shop_turn.team))
-        mc.root_node = root_node
+            raise ValueError(f"Unknown parallel mode {parallel}")
 
 
+def _simulate_pool(pet_types, food_types, status_types, pool_path, iterations, time_limit, workers):
+    """Simulates the game against the teams of an opponent pool, see simulate."""
+    game = Game(pet_types, food_types, status_types, players=[Player("Dummy")])
+    shop_turn = ShopTurn(game.players[0], game)
+    pool = OpponentPool(pool_path, pet_types, status_types)
+    if workers is None:
+        def evaluate(leaf_turn):
+            return score_results(pool.battle(leaf_turn.team, game))
 
+        _play_moves(MonteCarloTreeSearch(shop_turn, evaluate), iterations, time_limit)
+        return
 
+    with BattleExecutor(pet_types, food_types, status_types, max_workers=workers) as executor:
+        def evaluate(leaf_turn):
+            return score_results(executor.battle_pool(leaf_turn.team, pool, pack=game.pack))
 
+        _play_moves(MonteCarloTreeSearch(shop_turn, evaluate), iterations, time_limit)
 
 
+def _play_moves(search, iterations, time_limit, batch_size=1):
+    """Searches and plays the best moves of a search."""
+    for i in range(5):
+        search.search(iterations, time_limit, batch_size)
+        print(search.root.shop_turn.get_move_options()[0])
+        move = search.best_move()
+        if move is None:
+            break
+        search.advance(move)
+        print(str(search.root.shop_turn.team))
@@ -0,0 +1,137 @@
+import numpy as np
+
+from battler.game import Game
+from battler.player import Player
+from battler.shop_turn import ShopTurn
+from battler.battle_turn import BattleResult
+from battler.battle_cache import BattleCache, team_fingerprint
+from battler.batch_battle import score_results
+from battler.executor import get_worker_catalogs, team_from_fingerprint
+from battler.rng import make_rng
+from mcts.search import MonteCarloTreeSearch
+
+
+def get_turn_state(shop_turn):
+    """Returns a picklable state of a shop turn, which workers rebuild the turn from with build_shop_turn."""
+    game = shop_turn.game
+    team = shop_turn.team
+    shop = shop_turn.shop
+    lost_last_battle = game.lost_last_battle(shop_turn.player)
+    return (game.pack, game.turn, team_fingerprint(team), tuple((buff["health"], buff["attack"]) for buff in team.buffs),
+            shop.gold, tuple(shop.pet_slots), tuple(food.id for food in shop.foods), lost_last_battle)
+
+
+def build_shop_turn(turn_state, pet_types, food_types, status_types, seed=None):
+    """Returns a shop turn rebuilt from a state returned by get_turn_state, in a game of its own."""
+    pack, turn, fingerprint, buffs, gold, pet_slots, food_ids, lost_last_battle = turn_state
+    player = Player("Dummy")
+    game = Game(pet_types, food_types, status_types, [player], pack, make_rng(seed))
+    game.turn = turn
+    if lost_last_battle:
+        game.battle_results.append({"result": BattleResult.TEAM_2_WIN, "winner": None, "loser": player})
+    player.team = team_from_fingerprint(fingerprint, pet_types, status_types)
+    for health_amount, attack_amount in buffs:
+        player.team.add_buff(health_amount, attack_amount)
+
+    shop_turn = ShopTurn(player, game)
+    shop = shop_turn.shop
+    shop.gold = gold
+    shop.pet_slots = list(pet_slots)
+    shop.foods = [game.food_types[food_id] for food_id in food_ids]
+    shop.rehash()
+    return shop_turn
+
+
+def _search_root(turn_state, opponent_fingerprints, weights, iterations, time_limit, estimate, adaptive, seed):
+    """Searches a turn in a worker and returns the (move index, move, visits, total score) of the root's children.
+
+    Moves are indexed in the root's move options, which are the same in every worker, since they rebuild the same turn.
+    """
+    from battler.win_probability import estimate_win_probability
+    from mcts.evaluation import AdaptiveEvaluator
+
+    pet_types, food_types, status_types = get_worker_catalogs()
+    shop_turn = build_shop_turn(turn_state, pet_types, food_types, status_types, seed)
+    game = shop_turn.game
+    opponents = [team_from_fingerprint(fingerprint, pet_types, status_types) for fingerprint in opponent_fingerprints]
+    cache = BattleCache(rng=game.rng)
+    if adaptive:
+        evaluator = AdaptiveEvaluator(opponents, game, weights, cache=cache, seed=seed)
+        search = MonteCarloTreeSearch(shop_turn, evaluator.evaluate, refine_uncertainty=evaluator.get_tolerance())
+    else:
+        def evaluate(leaf_turn):
+            team = leaf_turn.team
+            if estimate:
+                return sum(estimate_win_probability(team, opponent, game).expected_score() for opponent in opponents)
+            return score_results(cache.play_batch([(team, opponent) for opponent in opponents], game))
+
+        search = MonteCarloTreeSearch(shop_turn, evaluate)
+    moves = shop_turn.get_move_options()[0]
+    search.search(iterations, time_limit)
+    return [(moves.index(move), move, child.visits, child.total_score) for move, child in search.root.children]
+
+
+def root_parallel_search(shop_turn, opponents, executor, iterations=None, time_limit=None, estimate=False, seed=None,
+                         adaptive=False, weights=None):
+    """Searches a turn with an independent tree in every worker of an executor, and merges the trees' root children.
+
+    Children are merged by the index of their move, not by their state, since moves like rerolls lead to different
+    states in every tree. Every worker runs the whole budget.
+
+    Args:
+        shop_turn (ShopTurn): The turn to search the moves of.
+        opponents (list): The teams leaves are battled against.
+        executor (BattleExecutor): The executor whose workers run the searches.
+        iterations (int): The maximum amount of iterations each worker runs.
+        time_limit (float): The maximum amount of seconds each worker runs for.
+        estimate (bool): Whether to score leaves by their estimated win probabilities instead of a single battle.
+        seed: The seed the workers' random streams are derived from.
+        adaptive (bool): Whether to score leaves with an AdaptiveEvaluator, battling only part of the opponents.
+        weights (list): The weights of the opponents for adaptive scoring, like the ones of compress_opponents.
+
+    Returns:
+        tuple: The most visited move, or None if no moves were searched, and a dictionary of the merged children's
+            move indices to their [move, visits, total score].
+    """
+    turn_state = get_turn_state(shop_turn)
+    opponent_fingerprints = [team_fingerprint(opponent) for opponent in opponents]
+    futures = [executor.pool.submit(_search_root, turn_state, opponent_fingerprints, weights, iterations, time_limit,
+                                    estimate, adaptive, None if seed is None else f"{seed}:{i}")
+               for i in range(executor.max_workers)]
+
+    children = {}
+    for future in futures:
+        for index, move, visits, total_score in future.result():
+            child = children.setdefault(index, [move, 0, 0])
+            child[1] += visits
+            child[2] += total_score
+    if not children:
+        return None, children
+    best_move = max(children.values(), key=lambda child: child[1])[0]
+    return best_move, children
+
+
+def make_executor_play(executor, pack="StandardPack"):
+    """Returns a play function for AdaptiveEvaluator, which plays the battles across the workers of an executor."""
+    def play(matchups):
+        return [result.value for result in executor.battle(matchups, pack)]
+
+    return play
+
+
+def make_batch_evaluator(executor, opponents, pack="StandardPack", seed=None):
+    """Returns an evaluate_batch function for MonteCarloTreeSearch, which battles the leaves' teams against the
+    opponents across the workers of an executor.
+    """
+    batch_count = 0
+
+    def evaluate_batch(shop_turns):
+        nonlocal batch_count
+        matchups = [(shop_turn.team, opponent) for shop_turn in shop_turns for opponent in opponents]
+        batch_seed = None if seed is None else f"{seed}:{batch_count}"
+        batch_count += 1
+        results = np.fromiter((result.value for result in executor.battle(matchups, pack, seed=batch_seed)),
+                              dtype=np.int8, count=len(matchups))
+        return [score_results(results[i * len(opponents):(i + 1) * len(opponents)]) for i in range(len(shop_turns))]
+
+    return evaluate_batch
@@ -0,0 +1,314 @@
+import math
+import time
+
+
+class SearchNode:
+    """A shop turn state in the search, shared by every move order that reaches it."""
+    __slots__ = ("shop_turn", "untried_moves", "children", "visits", "total_score", "terminal", "score", "evaluation",
+                 "state_key")
+
+    def __init__(self, shop_turn, state_key=None):
+        self.shop_turn = shop_turn
+        moves = shop_turn.get_move_options()[0]
+        self.terminal = not shop_turn.are_moves_left(moves)
+        self.untried_moves = [] if self.terminal else moves
+        self.children = [] # (move, node) pairs of the expanded moves
+        self.visits = 0
+        self.total_score = 0
+        self.score = None # The evaluated score of a terminal node
+        self.evaluation = None # What evaluate returned for a terminal node, which can carry an uncertainty
+        # The key of the state when the node was created, since moves are played on its turn while it's searched
+        self.state_key = state_key
+
+    def get_mean_score(self):
+        """Returns the mean score of the searches that went through the node."""
+        return self.total_score / self.visits
+
+
+class MonteCarloTreeSearch:
+    """A Monte Carlo tree search over the moves of a shop turn, with UCT selection and a transposition table.
+
+    States reached by different move orders, like buying pet A and then B or B and then A, are merged into one node
+    through ShopTurn.get_state_hash, so their searches are shared. Hashes are only 64 bits, so a state is only merged
+    into a node with an equal state key, and states whose hashes collide with others' are kept by their keys.
+    """
+
+    def __init__(self, shop_turn, evaluate=None, exploration=math.sqrt(2), use_transpositions=True, evaluate_batch=None,
+                 refine_uncertainty=None):
+        """Initializes the search.
+
+        Args:
+            shop_turn (ShopTurn): The turn to search the moves of.
+            evaluate (Callable): Returns the score of a turn with no moves left, higher being better.
+            exploration (float): The exploration constant of UCT, applied to scores normalized to [0, 1].
+            use_transpositions (bool): Whether to merge states reached by different move orders.
+            evaluate_batch (Callable): Returns the scores of a list of turns, evaluating them together. Used instead
+                of evaluate when given.
+            refine_uncertainty (float): Evaluations can be scores or objects with a score and an uncertainty, like
+                LeafScores. Terminal nodes evaluated with a higher uncertainty than this are evaluated again whenever
+                they're visited, passing their previous evaluation to evaluate(turn, previous) or
+                evaluate_batch(turns, previous) to continue from.
+        """
+        if evaluate is None and evaluate_batch is None:
+            raise ValueError("The search needs evaluate or evaluate_batch")
+        self.evaluate = evaluate
+        self.evaluate_batch = evaluate_batch
+        self.refine_uncertainty = refine_uncertainty
+        self.exploration = exploration
+        self.use_transpositions = use_transpositions
+        self.rng = shop_turn.rng
+        self.nodes = {}
+        self.colliding_nodes = {} # State keys to the nodes of states whose hashes were taken by other states
+        self.min_score = math.inf
+        self.max_score = -math.inf
+        self.root = self._get_node(shop_turn)
+
+    def _find_node(self, shop_turn):
+        """Returns the node of a turn's state if the state was reached before, or None."""
+        if not self.use_transpositions:
+            return None
+        node = self.nodes.get(shop_turn.get_state_hash())
+        if node is None:
+            return None
+        key = shop_turn.get_state_key()
+        if node.state_key == key:
+            return node
+        return self.colliding_nodes.get(key)
+
+    def _add_node(self, shop_turn):
+        """Returns a new node of a turn's state, adding it to the transposition table."""
+        if not self.use_transpositions:
+            return SearchNode(shop_turn)
+        node = SearchNode(shop_turn, shop_turn.get_state_key())
+        state_hash = shop_turn.get_state_hash()
+        if state_hash in self.nodes:
+            self.colliding_nodes[node.state_key] = node
+        else:
+            self.nodes[state_hash] = node
+        return node
+
+    def _get_node(self, shop_turn):
+        """Returns the node of a state, creating it if the state wasn't reached before."""
+        return self._find_node(shop_turn) or self._add_node(shop_turn)
+
+    def _get_child_node(self, shop_turn, move):
+        """Returns the node of the state a move leads to, only cloning the turn if the state wasn't reached before."""
+        shop_turn.make_move(move)
+        node = self._find_node(shop_turn) or self._add_node(shop_turn.clone())
+        shop_turn.unmake_move()
+        return node
+
+    def get_node_count(self):
+        """Returns the amount of nodes in the search."""
+        if self.use_transpositions:
+            return len(self.nodes) + len(self.colliding_nodes)
+        count = 0
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            count += 1
+            nodes.extend(child for _, child in node.children)
+        return count
+
+    def search(self, iterations=None, time_limit=None, batch_size=1):
+        """Runs the search until a budget runs out.
+
+        Args:
+            iterations (int): The maximum amount of iterations to run.
+            time_limit (float): The maximum amount of seconds to run for.
+            batch_size (int): The amount of leaves to select and evaluate together. Selected leaves get a virtual
+                loss until they're evaluated, so a batch spreads over different leaves.
+
+        Returns:
+            int: The amount of iterations that ran.
+        """
+        if iterations is None and time_limit is None:
+            raise ValueError("The search needs an iteration or a time budget")
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.root.terminal and not self._needs_evaluation(self.root): # Nothing is left to search
+                break
+            count = batch_size if iterations is None else min(batch_size, iterations - iteration)
+            if count == 1:
+                path = self._select_path()
+                self._backpropagate(path, self._rollout(path[-1]))
+            else:
+                self._iterate_batch(count)
+            iteration += count
+        return iteration
+
+    def _iterate_batch(self, count):
+        """Selects leaves with virtual loss, evaluates them together and backpropagates their scores."""
+        paths = []
+        for _ in range(count):
+            path = self._select_path()
+            # Count the leaf as visited with the worst score so far, until it's evaluated
+            virtual_loss = self.min_score if self.min_score != math.inf else 0
+            for node in path:
+                node.visits += 1
+                node.total_score += virtual_loss
+            paths.append((path, virtual_loss))
+
+        scores = [None] * count
+        pending = []
+        shop_turns = []
+        previous = []
+        for i, (path, _) in enumerate(paths):
+            leaf = path[-1]
+            if not self._needs_evaluation(leaf):
+                scores[i] = leaf.score
+            else:
+                pending.append(i)
+                shop_turns.append(self._play_out(leaf))
+                previous.append(leaf.evaluation)
+        for i, evaluation in zip(pending, self._evaluate(shop_turns, previous)):
+            scores[i] = self._record(paths[i][0][-1], evaluation)
+
+        for (path, virtual_loss), score in zip(paths, scores):
+            for node in path:
+                node.visits -= 1
+                node.total_score -= virtual_loss
+            self._backpropagate(path, score)
+
+    def _select_path(self):
+        """Returns the path of nodes from the root to a leaf to evaluate, expanding a node on the way."""
+        node = self.root
+        path = [node]
+        on_path = {id(node)}
+        while not node.terminal:
+            if node.untried_moves:
+                node = self._expand(node)
+                if id(node) in on_path: # A move that led back to a state on the path
+                    break
+                path.append(node)
+                on_path.add(id(node))
+                if node.visits == 0:
+                    break
+                continue
+
+            node = self._select(node, on_path)
+            if node is None:
+                break
+            path.append(node)
+            on_path.add(id(node))
+        return path
+
+    def _backpropagate(self, path, score):
+        """Adds the score of a leaf to the nodes on its path."""
+        self.min_score = min(self.min_score, score)
+        self.max_score = max(self.max_score, score)
+        for node in path:
+            node.visits += 1
+            node.total_score += score
+
+    def _expand(self, node):
+        """Plays a random untried move of the node, returning the node of the state it leads to."""
+        moves = node.untried_moves
+        index = self.rng.randrange(len(moves))
+        moves[index], moves[-1] = moves[-1], moves[index]
+        move = moves.pop()
+        child = self._get_child_node(node.shop_turn, move)
+        # Moves leading to the same state, like buying a pet into an empty team at any index, share a single edge
+        if not any(existing_child is child for _, existing_child in node.children):
+            node.children.append((move, child))
+        return child
+
+    def _select(self, node, on_path):
+        """Returns the child with the highest UCT value, skipping children on the path, or None if there are none."""
+        score_range = self.max_score - self.min_score
+        log_visits = math.log(node.visits)
+        best_child = None
+        best_value = -math.inf
+        for _, child in node.children:
+            if id(child) in on_path:
+                continue
+            if child.visits == 0:
+                return child
+            exploitation = 0.5
+            if score_range > 0:
+                exploitation = (child.get_mean_score() - self.min_score) / score_range
+            value = exploitation + self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best_child = child
+                best_value = value
+        return best_child
+
+    def _evaluate(self, shop_turns, previous):
+        """Returns the evaluations of turns with no moves left, continuing from their previous evaluations if any."""
+        if not any(evaluation is not None for evaluation in previous):
+            if self.evaluate_batch is not None:
+                return self.evaluate_batch(shop_turns)
+            return [self.evaluate(shop_turn) for shop_turn in shop_turns]
+        if self.evaluate_batch is not None:
+            return self.evaluate_batch(shop_turns, previous)
+        return [self.evaluate(shop_turn, evaluation) for shop_turn, evaluation in zip(shop_turns, previous)]
+
+    def _needs_evaluation(self, node):
+        """Returns whether a node has to be evaluated, because it isn't terminal, wasn't evaluated or is uncertain."""
+        if node.score is None:
+            return True
+        return (self.refine_uncertainty is not None
+                and getattr(node.evaluation, "uncertainty", 0) > self.refine_uncertainty)
+
+    @staticmethod
+    def _record(node, evaluation):
+        """Returns the score of an evaluation, keeping it in the node if it's terminal."""
+        score = getattr(evaluation, "score", evaluation)
+        if node.terminal:
+            node.evaluation = evaluation
+            node.score = score
+        return score
+
+    def _play_out(self, node):
+        """Returns the turn of a node if it has no moves left, or a clone of it after random moves until none are left."""
+        if node.terminal:
+            return node.shop_turn
+        shop_turn = node.shop_turn.clone()
+        while True:
+            move = shop_turn.choose_move()
+            if not move:
+                break
+            shop_turn.play_move(move)
+        return shop_turn
+
+    def _rollout(self, node):
+        """Returns the score of a node, playing random moves from it until no moves are left."""
+        if not self._needs_evaluation(node):
+            return node.score
+        if node.terminal:
+            return self._record(node, self._evaluate([node.shop_turn], [node.evaluation])[0])
+
+        # Plays the rollout on the node's own turn and reverts it, instead of playing it on a clone
+        shop_turn = node.shop_turn
+        depth = 0
+        while True:
+            move = shop_turn.choose_move()
+            if not move:
+                break
+            shop_turn.make_move(move)
+            depth += 1
+        score = self._record(node, self._evaluate([shop_turn], [None])[0])
+        for _ in range(depth):
+            shop_turn.unmake_move()
+        return score
+
+    def best_move(self):
+        """Returns the most visited move of the root, or None if no moves were searched."""
+        best_move = None
+        best_visits = -1
+        for move, child in self.root.children:
+            if child.visits > best_visits:
+                best_move = move
+                best_visits = child.visits
+        return best_move
+
+    def advance(self, move):
+        """Makes a searched move the root of the search, keeping the searches under it."""
+        for child_move, child in self.root.children:
+            if child_move == move:
+                self.root = child
+                return child
+        raise ValueError(f"Move {move} wasn't searched")
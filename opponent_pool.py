@@ -0,0 +1,244 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from pet import Pet
+from team import Team
+from serialization import FORMAT_VERSION, PET_DTYPE, BUFF_DTYPE, PET_BUFF_DTYPE, IdTable, TeamEncoder, TeamDecoder
+
+# Bumped whenever the layout changes, pools of other versions are rejected
+POOL_VERSION = 1
+POOL_PATH = "pool"
+SLOTS = Team.TEAM_SIZE
+# The amount of opponents encoded and battled at a time, which bounds the memory of a battle against a whole pool
+BATTLE_CHUNK_SIZE = 16384
+
+
+def _get_slot_columns(pets, pet_offsets):
+    """Returns the (team, slot) columns of the flat pets and offsets of a TeamEncoder, and the pet count of each team."""
+    pet_offsets = pet_offsets.astype(np.int64)
+    counts = np.diff(pet_offsets)
+    if len(counts) and counts.max() > SLOTS:
+        raise ValueError(f"Pools hold teams of up to {SLOTS} pets")
+    filled = np.arange(SLOTS) < counts[:, None]
+    columns = {}
+    for name in PET_DTYPE.names:
+        column = np.zeros((len(counts), SLOTS), dtype=PET_DTYPE[name])
+        column[filled] = pets[name]
+        columns[name] = column
+    return columns, counts.astype(np.uint8)
+
+
+def _write_pool(path, columns, counts, pet_ids, status_ids):
+    """Writes the columns of a pool to a directory, one .npy file per column."""
+    os.makedirs(path, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), column)
+    np.save(os.path.join(path, "count.npy"), counts)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"version": POOL_VERSION, "pet_ids": pet_ids, "status_ids": status_ids}, f)
+
+
+def save_pool(path, teams, pet_types=None, chunk_size=BATTLE_CHUNK_SIZE):
+    """Writes teams to a pool directory, encoding them a chunk at a time.
+
+    Pools keep what battles use, so the buffs of the teams, which only matter in shops, aren't stored, and the
+    temporary buffs of the pets stay in their stats.
+
+    Args:
+        path (str): The directory to write the pool to.
+        teams (iterable): The teams, which can be generated, so they never have to all be in memory at once.
+        pet_types (dict): The pet types of the catalog, see TeamEncoder.
+        chunk_size (int): The amount of teams encoded at a time.
+    """
+    encoder = TeamEncoder(pet_types)
+    chunks = []
+    teams = iter(teams)
+    while True:
+        encoder.clear_teams()
+        for team in teams:
+            encoder.add_teams([team])
+            if len(encoder.pet_offsets) > chunk_size:
+                break
+        if len(encoder.pet_offsets) == 1:
+            break
+        chunks.append(_get_slot_columns(np.array(encoder.pets, dtype=PET_DTYPE),
+                                        np.array(encoder.pet_offsets, dtype=np.int64)))
+    columns = {name: np.concatenate([chunk[0][name] for chunk in chunks]) if chunks
+               else np.zeros((0, SLOTS), dtype=PET_DTYPE[name]) for name in PET_DTYPE.names}
+    counts = np.concatenate([chunk[1] for chunk in chunks]) if chunks else np.zeros(0, dtype=np.uint8)
+    _write_pool(path, columns, counts, encoder.pet_ids.ids, encoder.status_ids.ids)
+
+
+def convert_teams(teams_path, path):
+    """Writes the teams of a file written by serialization.save_teams to a pool directory, without building them."""
+    with np.load(teams_path, allow_pickle=False) as arrays:
+        meta = json.loads(bytes(arrays["meta"]))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"The file has format version {meta.get('version')}, expected {FORMAT_VERSION}")
+        columns, counts = _get_slot_columns(arrays["pets"], arrays["pet_offsets"])
+    _write_pool(path, columns, counts, meta["pet_ids"], meta["status_ids"])
+
+
+class OpponentPool:
+    """A pool of opponent teams, memory-mapped from a directory of (team, slot) columns.
+
+    Opening a pool reads nothing but its ids, pages of the columns are read as battles and teams need them, and are
+    shared through the page cache by every process that opens the same pool. Teams are only built on demand, battles
+    the kernel of BatchBattle can play are fed to it straight from the columns.
+    """
+
+    def __init__(self, path, pet_types, status_types):
+        """Opens a pool written by save_pool or convert_teams, resolving the ids against the catalog."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != POOL_VERSION:
+            raise ValueError(f"The pool has version {meta.get('version')}, expected {POOL_VERSION}")
+        self.path = path
+        self.pet_types = IdTable(meta["pet_ids"]).resolve(pet_types, "pets")
+        self.status_types = [None] + IdTable(meta["status_ids"]).resolve(status_types, "statuses")
+        self.catalog_pet_types = pet_types
+        self.catalog_status_types = status_types
+        self.columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in PET_DTYPE.names}
+        self.counts = np.load(os.path.join(path, "count.npy"), mmap_mode="r")
+        # Built teams are decoded with the id tables of the pool
+        decoder_meta = {"version": FORMAT_VERSION, "pet_ids": meta["pet_ids"], "status_ids": meta["status_ids"],
+                        "food_ids": [], "shops": [], "games": []}
+        self._decoder_meta = np.frombuffer(json.dumps(decoder_meta).encode(), dtype=np.uint8)
+        self._encoded_pets = {} # (type, level, abilities, status) to the kernel encoding of such pets, None if unplayable
+
+    def __len__(self):
+        return len(self.counts)
+
+    def sample(self, count, rng=None):
+        """Returns the sorted indices of a sample of distinct teams of the pool, all of them if it's smaller."""
+        if count >= len(self):
+            return np.arange(len(self))
+        rng = rng if rng is not None else np.random.default_rng()
+        return np.sort(rng.choice(len(self), count, replace=False))
+
+    def get_teams(self, indices=None):
+        """Returns the teams at the indices, or all of them, built from the columns."""
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        counts = self.counts[indices]
+        filled = np.arange(SLOTS) < counts[:, None]
+        pets = np.zeros(int(counts.sum()), dtype=PET_DTYPE)
+        for name, column in self.columns.items():
+            pets[name] = column[indices][filled]
+        arrays = {
+            "meta": self._decoder_meta,
+            "pets": pets,
+            "pet_offsets": np.concatenate(([0], np.cumsum(counts, dtype=np.uint32))).astype(np.uint32),
+            "buffs": np.zeros(0, dtype=BUFF_DTYPE),
+            "buff_offsets": np.zeros(len(indices) + 1, dtype=np.uint32),
+            "pet_buffs": np.zeros(0, dtype=PET_BUFF_DTYPE),
+        }
+        return TeamDecoder(arrays, self.catalog_pet_types, status_types=self.catalog_status_types).get_teams()
+
+    def get_team(self, index):
+        """Returns the team at an index."""
+        return self.get_teams([index])[0]
+
+    def encode(self, indices):
+        """Encodes the teams at the indices for the kernel of BatchBattle.
+
+        Returns:
+            tuple: The (team, slot, PET_FIELDS) array of the pets, the (team, slot) array of which slots hold pets, and
+                an array of whether the kernel can play each team.
+        """
+        from battler.batch_battle import PET_FIELDS
+
+        columns = {name: column[indices] for name, column in self.columns.items()}
+        alive = np.arange(SLOTS) < self.counts[indices][:, None]
+        table = np.zeros((len(alive), SLOTS, len(PET_FIELDS)), dtype=np.float64)
+        playable = np.ones(len(alive), dtype=bool)
+        if not alive.any():
+            return table, alive, playable
+
+        # Pets of the same type, level, abilities and status are encoded the same but for their stats, so each
+        # combination is encoded once, from a pet built for it
+        keys = np.stack([columns[name][alive].astype(np.int64) for name in ("type", "level", "abilities", "status")], axis=1)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        encoded = np.zeros((len(unique_keys), len(PET_FIELDS)), dtype=np.float64)
+        valid = np.ones(len(unique_keys), dtype=bool)
+        for i, key in enumerate(map(tuple, unique_keys.tolist())):
+            encoded_pet = self._encode_pet(key)
+            if encoded_pet is None:
+                valid[i] = False
+            else:
+                encoded[i] = encoded_pet
+        inverse = inverse.reshape(-1)
+
+        pets = encoded[inverse]
+        pets[:, PET_FIELDS.index("attack")] = columns["attack"][alive]
+        pets[:, PET_FIELDS.index("health")] = columns["health"][alive]
+        table[alive] = pets
+        unplayable = np.zeros(alive.shape, dtype=bool)
+        unplayable[alive] = ~valid[inverse]
+        playable &= ~unplayable.any(axis=1)
+        return table, alive, playable
+
+    def _encode_pet(self, key):
+        """Returns the kernel encoding of the pets of a (type, level, abilities, status) key, or None if it can't play them."""
+        from battler.batch_battle import encode_pet
+
+        if key not in self._encoded_pets:
+            type_index, level, abilities_index, status_index = key
+            pet_type = self.pet_types[type_index]
+            abilities = self.pet_types[abilities_index - 1].abilities if abilities_index else None
+            pet = Pet(pet_type, level=level, status=self.status_types[status_index], abilities=abilities)
+            self._encoded_pets[key] = encode_pet(pet)
+        return self._encoded_pets[key]
+
+    def battle(self, team, game, indices=None, chunk_size=BATTLE_CHUNK_SIZE):
+        """Battles a team against teams of the pool, and returns an array of the BattleResult values of the battles.
+
+        The results are the same as BatchBattle's for the built teams. Opponents the kernel can play are battled from
+        the columns, a chunk at a time, and the others are built and played by BattleTurn.
+
+        Args:
+            team (Team): The team to battle, as team 1.
+            game (Game): The game to battle in.
+            indices (np.ndarray): The indices of the opponents, defaults to the whole pool.
+            chunk_size (int): The amount of opponents encoded and battled at a time.
+        """
+        from battler.batch_battle import BatchBattle, encode_team
+        from battler.battle_turn import BattleTurn
+
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        results = np.zeros(len(indices), dtype=np.int8)
+        batch = BatchBattle([], game)
+        encoded_team = encode_team(team)
+        played_kernel = False
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start:start + chunk_size]
+            table, alive, playable = self.encode(chunk)
+            if encoded_team is None:
+                playable[:] = False
+
+            fallback = np.flatnonzero(~playable)
+            for i, opponent in zip(fallback, self.get_teams(chunk[fallback]) if len(fallback) else ()):
+                results[start + i] = BattleTurn(team, opponent, game).play().value
+
+            kernel = np.flatnonzero(playable)
+            if len(kernel):
+                matchups = np.zeros((len(kernel), 2) + table.shape[1:], dtype=np.float64)
+                matchup_alive = np.zeros((len(kernel), 2, SLOTS), dtype=bool)
+                if encoded_team:
+                    matchups[:, 0, :len(encoded_team)] = encoded_team
+                    matchup_alive[:, 0, :len(encoded_team)] = True
+                matchups[:, 1] = table[kernel]
+                matchup_alive[:, 1] = alive[kernel]
+                results[start + kernel] = batch.play_table(matchups, matchup_alive)
+                played_kernel = True
+        if played_kernel:
+            for pet in team.pets:
+                pet.trigger_end_of_battle()
+        return results
+
+
+if __name__ == '__main__':
+    # Usage: python opponent_pool.py teams.npz [pool], converts stored teams to a pool
+    convert_teams(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else POOL_PATH)
@@ -1,8 +1,8 @@
 from __future__ import annotations
 import logging
 from pet_type import PetType
+from ability import compile_abilities
 from battler.get_targets import get_targets
-import random
 
 MAX_HEALTH = 50
 MAX_ATTACK = 50
@@ -24,9 +24,14 @@ EXPERIENCE_TO_LEVEL = {
 
 class Pet:
     """Represents a playable pet in super auto pets."""
+    # Pets are cloned for every battle, so they are kept slotted and their buffs and state are only allocated when used
+    __slots__ = ("pet_type", "team", "health", "attack", "level", "experience", "status", "abilities", "buffs", "state", "old_level",
+                 "state_hash")
+
     def __init__(self, pet_type, team=None, health=-1, attack=-1, level=1, experience=-1, status=None, abilities=None):
-        self.buffs = []
-        self.state = {}
+        self.buffs = ()
+        self.state = None
+        self.state_hash = None # The hash of the pet's state its team last saw, see Team.update_pet_hash
         self.pet_type = pet_type
         self.team = team
         if health == -1:
@@ -45,6 +50,17 @@ class Pet:
         if abilities is not None:
             self.abilities = abilities
 
+    def __setstate__(self, state):
+        """Restores a pickled pet, compiling abilities that were pickled in their JSON form."""
+        if isinstance(state, tuple): # Slotted pets pickle their state as (None, slots)
+            state = state[1]
+        self.state_hash = None
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.buffs = tuple(self.buffs)
+        if self.abilities is not None:
+            self.abilities = compile_abilities(self.abilities, ABILITY_HANDLERS)
+
     def add_experience(self, experience_amount, shop_turn):
         """Adds experience to the pet."""
         if self.level == 3:
@@ -55,30 +71,28 @@ class Pet:
             self.buff(1, 1, False)
             new_level = EXPERIENCE_TO_LEVEL.get(self.experience, 3)
             if new_level > self.level:
-                shop_turn.trigger_event("LevelUp", {"pet": self, "team": self.team, "original_team": self.team, "turn": shop_turn, "turn_type": "shop"})
+                shop_turn.trigger_event("LevelUp", shop_turn.event_data.copy(pet=self, team=self.team, original_team=self.team, turn_type="shop"))
                 self.level = new_level
                 if self.level == 3:
+                    self.rehash()
                     return i
+        self.rehash()
         return experience_amount
 
     def attack_pet(self, target: Pet, attack_damage, is_main_attack=True):
         """Attacks the target."""
         damage_modifier = 0
         target_damage_modifier = 0
-        if is_main_attack and self.status:
-            status_ability = self.status.ability
-            status_ability_effect = status_ability["effect"]
-            if status_ability["trigger"] == "WhenAttacking" and status_ability_effect["kind"] == "ModifyDamage":
-                damage_modifier = status_ability_effect.get("damageModifier")
-                if status_ability_effect["appliesOnce"]:
-                    self.status = None
-        if target.status:
-            status_ability = target.status.ability
-            status_ability_effect = status_ability["effect"]
-            if status_ability["trigger"] == "WhenDamaged" and status_ability_effect["kind"] == "ModifyDamage":
-                target_damage_modifier = status_ability_effect.get("damageModifier")
-                if status_ability_effect["appliesOnce"]:
-                    target.status = None
+        if is_main_attack and self.status and self.status.modifies_damage_dealt:
+            status_ability_effect = self.status.ability.effect
+            damage_modifier = status_ability_effect.damage_modifier
+            if status_ability_effect.applies_once:
+                self.set_status(None)
+        if target.status and target.status.modifies_damage_taken:
+            status_ability_effect = target.status.ability.effect
+            target_damage_modifier = status_ability_effect.damage_modifier
+            if status_ability_effect.applies_once:
+                target.set_status(None)
 
         if damage_modifier != 0:
             if damage_modifier is None:
@@ -111,7 +125,37 @@ class Pet:
 
     def clone(self):
         """Returns a clone of the pet."""
-        return Pet(self.pet_type, self.team, self.health, self.attack, self.level, self.experience, self.status, self.abilities)
+        # Copies the slots directly instead of going through __init__ and its defaults
+        pet = Pet.__new__(Pet)
+        pet.pet_type = self.pet_type
+        pet.team = self.team
+        pet.health = self.health
+        pet.attack = self.attack
+        pet.level = self.level
+        pet.experience = self.experience
+        pet.status = self.status
+        pet.abilities = self.abilities
+        pet.buffs = ()
+        pet.state = None
+        pet.state_hash = self.state_hash
+        return pet
+
+    def set_status(self, status):
+        """Sets the status of the pet, keeping the listener index of its team up to date."""
+        team = self.team
+        if team is not None and self in team.pets:
+            if self.status:
+                team.index_status(self.status, -1)
+            if status:
+                team.index_status(status, 1)
+        self.status = status
+        self.rehash()
+
+    def rehash(self):
+        """Updates the state hash of the pet's team after the pet changed."""
+        team = self.team
+        if team is not None and team.state_hash is not None:
+            team.update_pet_hash(self)
 
     def get_ability(self):
         """Returns the ability of the pet."""
@@ -121,6 +165,8 @@ class Pet:
 
     def get_state(self):
         """Gets the state of the pet. A state persists until end of battle."""
+        if self.state is None:
+            self.state = {}
         return self.state
 
     def set_state(self, state):
@@ -129,12 +175,16 @@ class Pet:
 
     def trigger_end_of_battle(self):
         # Remove temporary buffs (given when until_end_of_battle is true)
+        if not self.buffs:
+            self.state = None
+            return
         for buff in self.buffs:
             health, attack = buff
             self.health -= health
             self.attack -= attack
-        self.buffs = []
-        self.state = {}
+        self.buffs = ()
+        self.state = None
+        self.rehash()
 
     def buff(self, health_amount, attack_amount, until_end_of_battle=False):
         """Adds attack to the pet."""
@@ -145,7 +195,8 @@ class Pet:
         self.attack = min(self.attack, MAX_ATTACK)
         
         if until_end_of_battle:
-            self.buffs.append((health_amount, attack_amount))
+            self.buffs += ((health_amount, attack_amount),)
+        self.rehash()
 
     def trigger_event(self, event_type, event_data):
         """Triggers an event for the pet."""
@@ -155,84 +206,52 @@ class Pet:
         if self.status:
             abilities.append(self.status.ability)
         for ability in abilities:
-            # logging.debug(f"              {self} triggered by {event_type} of {event_data.get('pet')} in {event_data['team']}")
-            
-            pets = event_data.get("team_pets_snapshot")
-            if pets is None: # When abilities are out of battle, snapshots are not needed
-                pets = event_data["team"].pets
-            ability_trigger = ability["trigger"]
-            ability_trigger_kind = ability["triggeredBy"]["kind"]
-            if ((event_type == ability_trigger) and 
-                    ((ability_trigger_kind == "Player")
-                    or (ability_trigger_kind == "Self" and self == event_data["pet"]) 
-                    or (ability_trigger_kind == "EachFriend" and self != event_data["pet"])
-                    or (ability_trigger_kind == "FriendAhead" and self == pets[pets.index(event_data["pet"]) - 1]))):
-                ability_effect = ability["effect"]
-                self.perform_ability(ability_effect, event_data)
+            # logging.debug(f"              {self} triggered by {event_type} of {event_data.pet} in {event_data.team}")
+            if event_type != ability.trigger:
+                continue
+
+            ability_trigger_kind = ability.triggered_by
+            if ability_trigger_kind == "FriendAhead":
+                pets = event_data.team_pets_snapshot
+                if pets is None: # When abilities are out of battle, snapshots are not needed
+                    pets = event_data.team.pets
+            if ((ability_trigger_kind == "Player")
+                    or (ability_trigger_kind == "Self" and self == event_data.pet)
+                    or (ability_trigger_kind == "EachFriend" and self != event_data.pet)
+                    or (ability_trigger_kind == "FriendAhead" and self == pets[pets.index(event_data.pet) - 1])):
+                self.perform_ability(ability.effect, event_data)
 
     def perform_ability(self, ability_effect, event_data):
         """Performs the ability of the pet."""
         # TODO: Return True if casted, otherwise false, in order to trigger CastsAbility trigger type
-        match ability_effect["kind"]:
-            case "OneOf":
-                effect = random.choice(ability_effect["effects"])
-                self.perform_ability(effect, event_data)
-            case "AllOf":
-                for effect in ability_effect["effects"]:
-                    self.perform_ability(effect, event_data)
-            case "ModifyStats":
-                self.perform_modify_stats_ability(ability_effect, event_data)
-            case "SummonPet":
-                self.perform_summon_pet_ability(ability_effect, event_data)
-            case "SummonRandomPet": 
-                self.perform_summon_random_pet_ability(ability_effect, event_data)
-            case "RespawnPet":
-                self.perform_respawn_pet_ability(ability_effect, event_data)
-            case "GainGold":
-                self.perform_gain_gold_ability(ability_effect, event_data)
-            case "DealDamage":
-                self.perform_deal_damage_ability(ability_effect, event_data, self.get_ability()["trigger"])
-            case "TransferStats":
-                self.perform_transfer_stats_ability(ability_effect, event_data)
-            case "ReduceHealth":
-                self.perform_reduce_health_ability(ability_effect, event_data)
-            case "Evolve":
-                self.perform_evolve_ability(ability_effect, event_data)
-            case "GainExperience":
-                self.perform_gain_experience_ability(ability_effect, event_data)
-            case "ApplyStatus":
-                self.perform_apply_status_ability(ability_effect, event_data)
-            case "SplashDamage":
-                self.perform_splash_damage_ability(ability_effect, event_data)
-            case "TransferAbility":
-                self.perform_transfer_ability_ability(ability_effect, event_data)
-            case "RepeatAbility":
-                self.perform_repeat_ability_ability(ability_effect, event_data)
-            case _:
-                return
-
-        if (event_data["turn_type"] == "battle" and not event_data.get("repeated") and ability_effect["kind"] != "RepeatAbility"
-            and self.get_ability()["effect"] == ability_effect):
-            cloned_event_data = event_data.copy()
-            cloned_event_data["pet"] = self
-            event_data["turn"].trigger_event("CastsAbility", {"ability_event_data": event_data | {"repeated": True}} | cloned_event_data)
+        if ability_effect.handler is None:
+            return
+        ability_effect.handler(self, ability_effect, event_data)
+
+        if (event_data.turn_type == "battle" and not event_data.repeated and ability_effect.kind != "RepeatAbility"
+            and self.get_ability() and self.get_ability().effect is ability_effect
+            and event_data.team.has_listeners("CastsAbility")):
+            ability_context = event_data.ability_context
+            if ability_context is None:
+                ability_context = event_data.copy(repeated=True)
+            event_data.turn.trigger_event("CastsAbility", event_data.copy(pet=self, ability_context=ability_context))
 
 
     def perform_repeat_ability_ability(self, ability_effect, event_data):
         """Performs the repeat ability ability of the pet."""
         targets = get_targets(ability_effect, event_data, pet=self, team_pets=self.team.pets)
         for target in targets:
-            target.perform_ability(event_data["pet"].get_ability()["effect"], event_data["ability_event_data"])
+            target.perform_ability(event_data.pet.get_ability().effect, event_data.ability_context)
 
 
     def perform_transfer_ability_ability(self, ability_effect, event_data):
         """Performs the transfer ability ability of the pet."""
         team =  self.team
 
-        ability_from = ability_effect["from"]
+        ability_from = ability_effect.source
         pet_from = None
         pets_to = []
-        match ability_from["kind"]:
+        match ability_from.kind:
             case "FriendAhead":
                 if self != team.pets[-1]:
                     pet_from = team.pets[team.pets.index(self) + 1]
@@ -241,16 +260,17 @@ class Pet:
         if pet_from and targets:       
             for pet_to in pets_to:
                 pet_to.abilities = pet_from.abilities  
+                pet_to.rehash()
 
     def perform_splash_damage_ability(self, ability_effect, event_data):
         """Performs the splash damage ability of the pet."""
-        enemy_team = event_data["enemy_team"]
-        damage = ability_effect["amount"]
+        enemy_team = event_data.enemy_team
+        damage = ability_effect.amount
 
         from battler.battle_turn import BattleTurn
         from battler.attack import Attack
 
-        turn: BattleTurn = event_data["turn"]
+        turn: BattleTurn = event_data.turn
 
         if len(enemy_team.pets) > 1:
             target = enemy_team.pets[-2]
@@ -259,56 +279,57 @@ class Pet:
 
     def perform_apply_status_ability(self, ability_effect, event_data):
         """Performs the apply status ability of the food."""
-        status_id = ability_effect["status"]
-        targets = get_targets(ability_effect, event_data, pet=self, team_pets=self.team.pets, enemy_pets=event_data["enemy_team"].pets)
+        status_id = ability_effect.status
+        targets = get_targets(ability_effect, event_data, pet=self, team_pets=self.team.pets, enemy_pets=event_data.enemy_team.pets)
         for target in targets:
-            target.status = event_data["status_types"][status_id]
+            target.set_status(event_data.status_types[status_id])
         return targets
 
     def perform_gain_experience_ability(self, ability_effect, event_data):
         """Performs the gain experience ability of the pet."""
-        experience_amount = ability_effect["amount"]
+        experience_amount = ability_effect.amount
         targets = get_targets(ability_effect, event_data, pet=self, team_pets=self.team)
         for target in targets:
-            target.add_experience(experience_amount, event_data["turn"])
+            target.add_experience(experience_amount, event_data.turn)
 
 
     def perform_evolve_ability(self, ability_effect, event_data):
         """Performs an evolve ability."""
         team = self.team
-        evolve_into_id = ability_effect["into"]
-        evovle_into_pet_type = event_data["pet_types"][evolve_into_id]
+        evolve_into_id = ability_effect.into
+        evovle_into_pet_type = event_data.pet_types[evolve_into_id]
         team.remove_pet(self)
         team.add_pet(Pet(evovle_into_pet_type, team))
 
     def perform_reduce_health_ability(self, ability_effect, event_data):
         """Performs a reduce health ability."""
-        percentage = ability_effect["percentage"]
-        targets = get_targets(ability_effect, event_data, enemy_pets=event_data["enemy_team"].pets)
+        percentage = ability_effect.percentage
+        targets = get_targets(ability_effect, event_data, enemy_pets=event_data.enemy_team.pets)
         from battler.attack import Attack
         from battler.battle_turn import BattleTurn
-        turn: BattleTurn = event_data["turn"]
+        turn: BattleTurn = event_data.turn
 
         for target in targets:
             damage_amount = min(int(target.health * percentage), target.health - 1) # Reduce health can't currently kill
             # TODO: Test this
             target.health -= damage_amount
+            target.rehash()
 
     def perform_transfer_stats_ability(self, ability_effect, event_data):
         """Performs the transfer stats ability of the pet."""
         team = self.team
 
-        ability_from = ability_effect["from"]
+        ability_from = ability_effect.source
         pet_from = None
         pets_to = []
-        match ability_from["kind"]:
+        match ability_from.kind:
             case "FriendAhead":
                 if self != team.pets[-1]:
                     pet_from = team.pets[team.pets.index(self) + 1]
             case "StrongestFriend":
-                team_clone = team.clone()
+                team_clone = team.clone(track_hash=False)
                 if self in team_clone.pets:
-                    team_clone.pets.remove(self)
+                    team_clone.remove_pet(self)
                 pet_from = max(team_clone.pets, key=lambda pet: pet.health + pet.attack)
             case "Self":
                 pet_from = self
@@ -318,27 +339,28 @@ class Pet:
 
         if pet_from and targets:       
             for pet_to in pets_to:
-                if ability_effect["copyHealth"]:
+                if ability_effect.copy_health:
                     pet_to.health = pet_from.health
-                if ability_effect["copyAttack"]:
+                if ability_effect.copy_attack:
                     pet_to.attack = pet_from.attack
+                pet_to.rehash()
 
     def perform_modify_stats_ability(self, ability_effect, event_data):
         """Performs the modify stats ability of the pet."""
-        health_amount = ability_effect.get("healthAmount", 0)
-        attack_amount = ability_effect.get("attackAmount", 0)
-        ability_target = ability_effect["target"]
+        health_amount = ability_effect.health_amount
+        attack_amount = ability_effect.attack_amount
+        ability_target = ability_effect.target
 
         until_end_of_battle = False
-        if event_data["turn_type"] == "shop":
-            team = event_data["original_team"]
-            until_end_of_battle = ability_effect["untilEndOfBattle"]
-        elif event_data["turn_type"] == "battle":
-            team = event_data["team"]
-
-        if ability_target["kind"] == "EachShopAnimal":
-            if ability_target["includingFuture"]:
-                shop = event_data["shop"]
+        if event_data.turn_type == "shop":
+            team = event_data.original_team
+            until_end_of_battle = ability_effect.until_end_of_battle
+        elif event_data.turn_type == "battle":
+            team = event_data.team
+
+        if ability_target.kind == "EachShopAnimal":
+            if ability_target.including_future:
+                shop = event_data.shop
                 shop.buff_shop(health_amount, attack_amount)
         else:
             target_pets = get_targets(ability_effect, event_data, pet=self, team_pets=team.pets)
@@ -347,121 +369,142 @@ class Pet:
 
     def perform_summon_random_pet_ability(self, ability_effect, event_data):
         """Performs a summon random pet ability."""
-        pet_types = event_data["pet_types"]
-        cloned_event_data = event_data.copy()
-
-        tier = ability_effect["tier"]
-        health_amount = ability_effect.get("baseHealth", -1) 
-        attack_amount = ability_effect.get("baseAttack", -1)
-        level = ability_effect.get("level", 1)
+        tier = ability_effect.tier
+        health_amount = ability_effect.base_health
+        attack_amount = ability_effect.base_attack
+        level = ability_effect.level
 
-        pet_types_in_tier = PetType.by_tier(pet_types, tier)
-        pet_type = random.choice(pet_types_in_tier)
+        pet_type = event_data.turn.rng.choice(event_data.turn.game.rules.pets_by_tier[tier])
         pet = Pet(pet_type, self.team, health_amount, attack_amount, level)
-        cloned_event_data["pet"] = pet
-        event_data["team"].add_pet(pet)
-        event_data["turn"].trigger_event("Summoned", cloned_event_data)
+        cloned_event_data = event_data.copy(pet=pet)
+        event_data.team.add_pet(pet)
+        event_data.turn.trigger_event("Summoned", cloned_event_data)
     
     def perform_summon_pet_ability(self, ability_effect, event_data):
         """Performs a summon pet ability."""
-        pet_types = event_data["pet_types"]
+        pet_types = event_data.pet_types
 
-        health_amount = ability_effect.get("withHealth", -1)
-        attack_amount = ability_effect.get("withAttack", -1)
-        summoned_pet_type = pet_types[ability_effect["pet"]]
-        turn = event_data["turn"]
+        health_amount = ability_effect.with_health
+        attack_amount = ability_effect.with_attack
+        summoned_pet_type = pet_types[ability_effect.pet]
+        turn = event_data.turn
 
         # TODO: Summon pet in-place of the triggering pet, and not at the front of the team
-        match ability_effect["team"]:
+        match ability_effect.team:
             case "Friendly":
-                cloned_event_data = event_data.copy()
                 pet = Pet(summoned_pet_type, self.team, health_amount, attack_amount)
-                cloned_event_data["pet"] = pet
+                cloned_event_data = event_data.copy(pet=pet)
 
                 # EDGE CASE: MISSING INFORMATION [SHEEP]
                 if self.pet_type.id == "pet-sheep":
-                    event_data["team"].add_pet(pet)
+                    event_data.team.add_pet(pet)
 
                     pet_clone = pet.clone()
-                    event_data["team"].add_pet(pet_clone)
-                    cloned_event_data_clone = cloned_event_data.copy()
-                    cloned_event_data_clone["pet"] = pet_clone
+                    event_data.team.add_pet(pet_clone)
+                    cloned_event_data_clone = cloned_event_data.copy(pet=pet_clone)
                     turn.trigger_event("Summoned", cloned_event_data_clone)
                 # EDGE CASE: MISSING INFORMATION [ROOSTER]
                 elif pet.pet_type.id == "pet-chick":
                     pet.attack = self.attack
-                    event_data["team"].add_pet(pet)
+                    event_data.team.add_pet(pet)
                 # EDGE CASE: MISSING INFORMATION [FLY]
                 elif pet.pet_type.id == "pet-zombie-fly":
-                    if event_data["pet"].pet_type.id != "pet-zombie-fly":
-                        event_data["team"].add_pet(pet)
+                    if event_data.pet.pet_type.id != "pet-zombie-fly":
+                        event_data.team.add_pet(pet)
                 else:    
-                    event_data["team"].add_pet(pet)
+                    event_data.team.add_pet(pet)
                 turn.trigger_event("Summoned", cloned_event_data)
 
             case "Enemy":
-                cloned_event_data = event_data.copy()
-                pet = Pet(summoned_pet_type, cloned_event_data["enemy_team"], health_amount, attack_amount)
-                cloned_event_data["pet"] = pet
-
-                cloned_event_data["team"], cloned_event_data["enemy_team"] = cloned_event_data["enemy_team"], cloned_event_data["team"]
-                if cloned_event_data["original_team"] == cloned_event_data["enemy_team"]:  
-                    cloned_event_data["original_team"] = cloned_event_data["team"]
-                else:
-                    cloned_event_data.pop("original_team")
-                cloned_event_data.pop("team_pets_snapshot")
+                pet = Pet(summoned_pet_type, event_data.enemy_team, health_amount, attack_amount)
+                original_team = None
+                if event_data.original_team == event_data.team:
+                    original_team = event_data.enemy_team
+                # The pet is summoned into the enemy team, so the teams swap and the snapshot no longer applies
+                cloned_event_data = event_data.copy(pet=pet, team=event_data.enemy_team, enemy_team=event_data.team,
+                                                    original_team=original_team, snapshot=None)
 
                 # EDGE CASE: MISSING INFORMATION [RAT]
                 if self.pet_type.id == "pet-rat":
-                    event_data["enemy_team"].add_pet(pet, 0)
+                    event_data.enemy_team.add_pet(pet, 0)
                 else:
-                    event_data["enemy_team"].add_pet(pet)
+                    event_data.enemy_team.add_pet(pet)
                 turn.trigger_event("Summoned", cloned_event_data)
 
 
     def perform_respawn_pet_ability(self, ability_effect, event_data):
-        turn = event_data["turn"]
+        turn = event_data.turn
 
-        health_amount = ability_effect.get("baseAttack")
-        attack_amount = ability_effect.get("baseHealth")
+        health_amount = ability_effect.base_attack
+        attack_amount = ability_effect.base_health
         summoned_pet_type = self.pet_type
 
-        cloned_event_data = event_data.copy()
         pet = Pet(summoned_pet_type, self.team, health_amount, attack_amount, self.level)
-        cloned_event_data["pet"] = pet
+        cloned_event_data = event_data.copy(pet=pet)
 
-        event_data["team"].add_pet(pet)
+        event_data.team.add_pet(pet)
         turn.trigger_event("Summoned", cloned_event_data)
 
 
 
     def perform_gain_gold_ability(self, ability_effect, event_data):
         """Performs the gain gold ability of the pet."""
-        shop = event_data["shop"]
-        gold_amount = ability_effect["amount"]
+        shop = event_data.shop
+        gold_amount = ability_effect.amount
         shop.gold += gold_amount
 
-    def perform_deal_damage_ability(self, ability_effect, event_data, ability_trigger):
+    def perform_deal_damage_ability(self, ability_effect, event_data):
         """Performs the deal damage ability of the pet."""
         from battler.attack import Attack
 
         # TODO: Currently ignoring attacking while in a shop turn (using sleeping pills).
-        if event_data["turn_type"] == "battle":
+        if event_data.turn_type == "battle":
+            ability_trigger = self.get_ability().trigger
             deal_damage_now = ability_trigger == "BeforeAttack" or ability_trigger == "StartOfBattle"
             team = self.team
             pets = team.pets
-            enemy_pets = event_data["enemy_team"].pets
+            enemy_pets = event_data.enemy_team.pets
 
             from battler.battle_turn import BattleTurn
-            turn: BattleTurn = event_data["turn"]
+            turn: BattleTurn = event_data.turn
 
-            if "amount" in ability_effect:
-                damage_amount = ability_effect["amount"]
-            elif "attackDamagePercent" in ability_effect:
-                damage_amount = int(self.attack * ability_effect["attackDamagePercent"]/100)
+            if ability_effect.amount is not None:
+                damage_amount = ability_effect.amount
+            elif ability_effect.attack_damage_percent is not None:
+                damage_amount = int(self.attack * ability_effect.attack_damage_percent/100)
             
             targets = get_targets(ability_effect, event_data, pet=self, team_pets=pets, enemy_pets=enemy_pets)
             turn.queue_attack(Attack(self, team, targets, damage_amount, False), deal_damage_now)
                         
 
 
+def perform_one_of_ability(pet, ability_effect, event_data):
+    """Performs one of the effects of the ability, chosen randomly."""
+    effect = event_data.turn.rng.choice(ability_effect.effects)
+    pet.perform_ability(effect, event_data)
+
+
+def perform_all_of_ability(pet, ability_effect, event_data):
+    """Performs all of the effects of the ability."""
+    for effect in ability_effect.effects:
+        pet.perform_ability(effect, event_data)
+
+
+ABILITY_HANDLERS = {
+    "OneOf": perform_one_of_ability,
+    "AllOf": perform_all_of_ability,
+    "ModifyStats": Pet.perform_modify_stats_ability,
+    "SummonPet": Pet.perform_summon_pet_ability,
+    "SummonRandomPet": Pet.perform_summon_random_pet_ability,
+    "RespawnPet": Pet.perform_respawn_pet_ability,
+    "GainGold": Pet.perform_gain_gold_ability,
+    "DealDamage": Pet.perform_deal_damage_ability,
+    "TransferStats": Pet.perform_transfer_stats_ability,
+    "ReduceHealth": Pet.perform_reduce_health_ability,
+    "Evolve": Pet.perform_evolve_ability,
+    "GainExperience": Pet.perform_gain_experience_ability,
+    "ApplyStatus": Pet.perform_apply_status_ability,
+    "SplashDamage": Pet.perform_splash_damage_ability,
+    "TransferAbility": Pet.perform_transfer_ability_ability,
+    "RepeatAbility": Pet.perform_repeat_ability_ability,
+}
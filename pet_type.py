@@ -1,4 +1,5 @@
 import json
+from ability import Ability, compile_abilities
 
 
 class PetType:
@@ -11,7 +12,7 @@ class PetType:
         self.name = pet_json['name']
         self.id = pet_json['id']
         self.tier = pet_json['tier']
-        self.image_data = pet_json['image']
+        self.image_data = pet_json.get('image')
         self.health = pet_json['baseHealth']
         self.attack = pet_json['baseAttack']
         self.packs = pet_json['packs']
@@ -20,12 +21,27 @@ class PetType:
             self._init_probabilities(pet_json)
 
     def _init_abilities(self, pet_json):
-        """Initializes the abilities of the pet type."""
+        """Initializes the abilities of the pet type, compiling them so they're ready to be performed."""
+        from pet import ABILITY_HANDLERS
         self.abilities = {}
         for level in range(1, 4):
             ability = pet_json.get(f"level{level}Ability")
             if ability:
-                self.abilities[level] = ability
+                self.abilities[level] = Ability(ability, ABILITY_HANDLERS, self.id)
+        self._init_triggers()
+
+    def _init_triggers(self):
+        """Initializes the events the pet type listens to, at any level."""
+        self.triggers = frozenset(ability.trigger for ability in self.abilities.values())
+        # A transfered ability can become any type of ability
+        self.listens_to_all = any(ability.effect.kind == "TransferAbility" for ability in self.abilities.values())
+
+    def __setstate__(self, state):
+        """Restores a pickled pet type, compiling abilities that were pickled in their JSON form."""
+        from pet import ABILITY_HANDLERS
+        self.__dict__.update(state)
+        self.abilities = compile_abilities(self.abilities, ABILITY_HANDLERS, self.id)
+        self._init_triggers()
 
     def _init_probabilities(self, pet_json):
         """Initializes the probabilities of the pet type."""
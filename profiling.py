@@ -0,0 +1,210 @@
+import time
+
+# The profiler that's enabled, only one can be at a time since they patch the same functions
+_active_profiler = None
+
+
+def _get_event_labels(turn, event_type, *args, **kwargs):
+    return (("event", event_type),)
+
+
+def _get_pet_ability_labels(pet, ability_effect, *args, **kwargs):
+    return ("ability", ability_effect.kind), ("pet", pet.pet_type.id)
+
+
+def _get_food_ability_labels(food_type, ability_effect, *args, **kwargs):
+    return ("ability", ability_effect.kind), ("food", food_type.id)
+
+
+def _get_targets_labels(ability_effect, *args, **kwargs):
+    target = getattr(ability_effect, "target", None)
+    return (("target", target.kind if target else None),)
+
+
+def _get_instrumented():
+    """Returns the (owner, name, get_labels) of the timed functions, and the (owner, name, category, label)
+    of the counted ones. get_labels returns (category, name) labels of a call from its arguments, the first of which
+    names the call's frame in the collapsed stacks.
+    """
+    from pet import Pet
+    from team import Team
+    from shop import Shop
+    from food_type import FoodType
+    from battler.battle_turn import BattleTurn
+    from battler.shop_turn import ShopTurn
+    from battler.event_context import EventContext, PetsSnapshot
+    import battler.get_targets
+    import pet
+    import food_type
+
+    timed = [
+        (BattleTurn, "trigger_event", _get_event_labels),
+        (ShopTurn, "trigger_event", _get_event_labels),
+        (Pet, "perform_ability", _get_pet_ability_labels),
+        (FoodType, "perform_ability", _get_food_ability_labels),
+        # get_targets is imported by name, so it's patched in every module that calls it
+        (battler.get_targets, "get_targets", _get_targets_labels),
+        (pet, "get_targets", _get_targets_labels),
+        (food_type, "get_targets", _get_targets_labels),
+    ]
+    for owner, label in ((Pet, "Pet"), (Team, "Team"), (Shop, "Shop"), (ShopTurn, "ShopTurn")):
+        timed.append((owner, "clone", lambda *args, label=label, **kwargs: (("clone", label),)))
+    counted = [
+        (Pet, "__init__", "allocation", "Pet"),
+        (Team, "__init__", "allocation", "Team"),
+        (EventContext, "__init__", "allocation", "EventContext"),
+        (EventContext, "copy", "allocation", "EventContext"),
+        (PetsSnapshot, "__init__", "allocation", "PetsSnapshot"),
+    ]
+    return timed, counted
+
+
+class Profiler:
+    """Records the counts and times of the events, abilities, target selections, clones and allocations of a simulation.
+
+    While enabled, the profiler replaces the functions it instruments with recording wrappers, and puts the originals
+    back once disabled, so simulations run without any instrumentation cost when it's off. Only the current process is
+    profiled, battles played by executor workers aren't.
+
+    Times are cumulative, including nested calls, and self times exclude the nested instrumented calls. Abilities are
+    recorded both per ability kind and per pet or food type.
+    """
+
+    def __init__(self):
+        self.stats = {} # (category, name) to [count, total seconds, self seconds]
+        self.counts = {} # (category, name) to a count, for calls that aren't timed
+        self.stacks = {} # Tuples of the frames of nested calls to the self seconds spent in them
+        self._frames = [] # The frames of the calls in progress
+        self._child_times = [] # The time spent in the nested calls of each call in progress
+        self._patches = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def is_enabled(self):
+        """Returns True if the profiler is recording."""
+        return _active_profiler is self
+
+    def enable(self):
+        """Starts recording, patching the instrumented functions."""
+        global _active_profiler
+        if _active_profiler is self:
+            return
+        if _active_profiler is not None:
+            raise RuntimeError("Another profiler is already enabled")
+        timed, counted = _get_instrumented()
+        for owner, name, get_labels in timed:
+            self._patch(owner, name, self._make_timed(getattr(owner, name), get_labels))
+        for owner, name, category, label in counted:
+            self._patch(owner, name, self._make_counted(getattr(owner, name), (category, label)))
+        _active_profiler = self
+
+    def disable(self):
+        """Stops recording, restoring the instrumented functions."""
+        global _active_profiler
+        if _active_profiler is not self:
+            return
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+        _active_profiler = None
+
+    def reset(self):
+        """Clears everything recorded so far."""
+        self.stats.clear()
+        self.counts.clear()
+        self.stacks.clear()
+
+    def _patch(self, owner, name, wrapper):
+        """Replaces an attribute of a class or a module, remembering the original to restore."""
+        original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+        self._patches.append((owner, name, original))
+        setattr(owner, name, wrapper)
+
+    def _make_timed(self, function, get_labels):
+        """Returns a wrapper of a function that records its calls under the labels of their arguments."""
+        stats = self.stats
+        stacks = self.stacks
+        frames = self._frames
+        child_times = self._child_times
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            labels = get_labels(*args, **kwargs)
+            frames.append(labels[0])
+            child_times.append(0.0)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self_time = elapsed - child_times.pop()
+                stack = tuple(frames)
+                frames.pop()
+                if child_times:
+                    child_times[-1] += elapsed
+                stacks[stack] = stacks.get(stack, 0.0) + self_time
+                for label in labels:
+                    stat = stats.get(label)
+                    if stat is None:
+                        stat = stats[label] = [0, 0.0, 0.0]
+                    stat[0] += 1
+                    stat[1] += elapsed
+                    stat[2] += self_time
+
+        wrapper.__wrapped__ = function
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def _make_counted(self, function, label):
+        """Returns a wrapper of a function that counts its calls under a label."""
+        counts = self.counts
+
+        def wrapper(*args, **kwargs):
+            counts[label] = counts.get(label, 0) + 1
+            return function(*args, **kwargs)
+
+        wrapper.__wrapped__ = function
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def get_rows(self, category=None):
+        """Returns the (category, name, count, total seconds, self seconds) of the recorded calls, most total time first."""
+        rows = [(label[0], label[1], count, total, self_time) for label, (count, total, self_time) in self.stats.items()
+                if category is None or label[0] == category]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+
+    def format_table(self, category=None, limit=None):
+        """Returns a table of the recorded calls, grouped by category, and of the counted allocations."""
+        lines = []
+        categories = [category] if category else sorted({label[0] for label in self.stats})
+        for row_category in categories:
+            rows = self.get_rows(row_category)[:limit]
+            lines.append(f"{row_category:<32} {'count':>10} {'total ms':>10} {'self ms':>10} {'us/call':>8}")
+            for _, name, count, total, self_time in rows:
+                lines.append(f"  {str(name):<30} {count:>10} {total * 1000:>10.1f} {self_time * 1000:>10.1f} "
+                             f"{total / count * 1e6:>8.1f}")
+            lines.append("")
+        if self.counts and category is None:
+            lines.append(f"{'allocation':<32} {'count':>10}")
+            for (_, name), count in sorted(self.counts.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"  {name:<30} {count:>10}")
+        return "\n".join(lines)
+
+    def get_collapsed_stacks(self):
+        """Returns the recorded stacks in the collapsed format of flame graph tools, one "a;b;c microseconds" per line."""
+        lines = []
+        for stack, self_time in sorted(self.stacks.items()):
+            frames = ";".join(f"{category}:{name}".replace(";", ",").replace(" ", "_") for category, name in stack)
+            lines.append(f"{frames} {round(self_time * 1e6)}")
+        return "\n".join(lines)
+
+    def write_collapsed_stacks(self, path):
+        """Writes the recorded stacks to a file in the collapsed format, for flamegraph.pl or speedscope."""
+        with open(path, "w") as f:
+            f.write(self.get_collapsed_stacks() + "\n")
@@ -0,0 +1,380 @@
+import gc
+import json
+import sys
+
+import numpy as np
+
+from pet import Pet, MAX_HEALTH, MAX_ATTACK
+from team import Team
+from state_hash import zobrist_key, position_hash, multiset_hash, abilities_key
+
+# Bumped whenever the format changes, files of other versions are rejected
+FORMAT_VERSION = 1
+TEAMS_PATH = "teams.npz"
+
+# A pet of a stored team. Types and statuses are indices into the id tables of the file, status 0 is no status and
+# abilities 0 are the pet's own, otherwise they're the abilities of the pet type at abilities - 1 (after a transfer).
+PET_DTYPE = np.dtype([("type", "<u2"), ("health", "u1"), ("attack", "u1"), ("level", "u1"), ("experience", "u1"),
+                      ("status", "<u2"), ("abilities", "<u2")])
+BUFF_DTYPE = np.dtype([("health", "<i2"), ("attack", "<i2")])
+# A buff until the end of battle of the pet at an index of the pets array, given to it during a shop turn
+PET_BUFF_DTYPE = np.dtype([("pet", "<u4"), ("health", "<i2"), ("attack", "<i2")])
+
+assert MAX_HEALTH <= 255 and MAX_ATTACK <= 255, "Pet stats are stored in a byte"
+
+
+class IdTable:
+    """Maps the catalog ids stored in a file to the small integers that stand for them, in order of appearance."""
+
+    def __init__(self, ids=()):
+        self.ids = list(ids)
+        self.indices = {item_id: i for i, item_id in enumerate(self.ids)}
+
+    def get_index(self, item_id):
+        """Returns the index of an id, adding it to the table if it's new."""
+        index = self.indices.get(item_id)
+        if index is None:
+            index = self.indices[item_id] = len(self.ids)
+            self.ids.append(item_id)
+        return index
+
+    def resolve(self, types, kind):
+        """Returns the types of the ids of the table, in order, raising a KeyError for ids the catalog doesn't have."""
+        missing = [item_id for item_id in self.ids if item_id not in types]
+        if missing:
+            raise KeyError(f"The catalog has no {kind} {', '.join(missing)}, it's older than the file")
+        return [types[item_id] for item_id in self.ids]
+
+
+class TeamEncoder:
+    """Encodes teams, shops and games into arrays and lists of small integers, with tables of the ids they use."""
+
+    def __init__(self, pet_types=None):
+        """Initializes the encoder.
+
+        Args:
+            pet_types (dict): The pet types of the catalog, to find the owners of abilities pets carry after a transfer
+                from pets that left their team. Teammates are searched either way.
+        """
+        self.catalog_pet_types = list(pet_types.values()) if pet_types else []
+        self.pet_ids = IdTable()
+        self.status_ids = IdTable()
+        self.food_ids = IdTable()
+        self.pets = []
+        self.pet_offsets = [0]
+        self.buffs = []
+        self.buff_offsets = [0]
+        self.pet_buffs = []
+        self.shops = []
+        self.games = []
+
+    def add_teams(self, teams):
+        """Encodes teams, returning the index of the first one."""
+        first = len(self.pet_offsets) - 1
+        pets = self.pets
+        buffs = self.buffs
+        get_pet_index = self.pet_ids.get_index
+        get_status_index = self.status_ids.get_index
+        for team in teams:
+            for pet in team.pets:
+                pet_type = pet.pet_type
+                abilities = 0
+                if pet.abilities is not pet_type.abilities:
+                    abilities = self._get_abilities_index(pet, team)
+                if pet.buffs:
+                    self.pet_buffs.extend((len(pets), health, attack) for health, attack in pet.buffs)
+                pets.append((get_pet_index(pet_type.id), pet.health, pet.attack, pet.level, pet.experience,
+                             get_status_index(pet.status.id) + 1 if pet.status else 0, abilities))
+            self.pet_offsets.append(len(pets))
+            buffs.extend((buff["health"], buff["attack"]) for buff in team.buffs)
+            self.buff_offsets.append(len(buffs))
+        return first
+
+    def clear_teams(self):
+        """Forgets the encoded teams but keeps the id tables, to encode teams a chunk at a time."""
+        self.pets = []
+        self.pet_offsets = [0]
+        self.buffs = []
+        self.buff_offsets = [0]
+        self.pet_buffs = []
+
+    def _get_abilities_index(self, pet, team):
+        """Returns the abilities field of a pet that doesn't share its type's abilities, 0 if they're equal to them."""
+        candidates = [pet.pet_type] + [team_pet.pet_type for team_pet in team.pets] + self.catalog_pet_types
+        for candidate in candidates:
+            if candidate.abilities is pet.abilities:
+                return 0 if candidate is pet.pet_type else self.pet_ids.get_index(candidate.id) + 1
+        # Abilities that were copied, like the ones of unpickled pets, are matched by their JSON
+        abilities_json = _get_abilities_json(pet.abilities)
+        for candidate in candidates:
+            if _get_abilities_json(candidate.abilities) == abilities_json:
+                return 0 if candidate.id == pet.pet_type.id else self.pet_ids.get_index(candidate.id) + 1
+        raise ValueError(f"The abilities of {pet} don't belong to a known pet type, so they can't be stored by id")
+
+    def add_shop(self, shop):
+        """Encodes a shop, returning its index."""
+        self.shops.append([shop.turn, shop.gold,
+                           [[self.pet_ids.get_index(pet_id), health, attack] for pet_id, health, attack in shop.pet_slots],
+                           [self.food_ids.get_index(food.id) for food in shop.foods]])
+        return len(self.shops) - 1
+
+    def add_game(self, game):
+        """Encodes a snapshot of a game between its turns, returning its index."""
+        players = [[player.name, player.health, self.add_teams([player.team])] for player in game.players]
+        player_indices = {id(player): i for i, player in enumerate(game.players)}
+        results = [[result["result"].value, player_indices.get(id(result["winner"]), -1),
+                    player_indices.get(id(result["loser"]), -1), result.get("turn", -1)] for result in game.battle_results]
+        eliminated = [player_indices[id(player)] for player in game.eliminated]
+        last_opponents = [[player_indices[id(player)], player_indices[id(opponent)]]
+                          for player, opponent in game.last_opponents.items()]
+        self.games.append([game.pack, game.turn, players, results, eliminated, last_opponents])
+        return len(self.games) - 1
+
+    def get_arrays(self):
+        """Returns the encoded arrays, as written by save."""
+        meta = {
+            "version": FORMAT_VERSION,
+            "pet_ids": self.pet_ids.ids,
+            "status_ids": self.status_ids.ids,
+            "food_ids": self.food_ids.ids,
+            "shops": self.shops,
+            "games": self.games,
+        }
+        return {
+            "meta": np.frombuffer(json.dumps(meta, separators=(",", ":")).encode(), dtype=np.uint8),
+            "pets": np.array(self.pets, dtype=PET_DTYPE),
+            "pet_offsets": np.array(self.pet_offsets, dtype=np.uint32),
+            "buffs": np.array(self.buffs, dtype=BUFF_DTYPE),
+            "buff_offsets": np.array(self.buff_offsets, dtype=np.uint32),
+            "pet_buffs": np.array(self.pet_buffs, dtype=PET_BUFF_DTYPE),
+        }
+
+
+class TeamDecoder:
+    """Decodes the arrays of a TeamEncoder, resolving the ids against the current catalog."""
+
+    def __init__(self, arrays, pet_types, food_types=None, status_types=None):
+        meta = json.loads(bytes(arrays["meta"]))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"The file has format version {meta.get('version')}, expected {FORMAT_VERSION}")
+        self.meta = meta
+        self.arrays = arrays
+        self.pet_types = IdTable(meta["pet_ids"]).resolve(pet_types, "pets")
+        self.status_types = [None] + IdTable(meta["status_ids"]).resolve(status_types or {}, "statuses")
+        self.food_types = IdTable(meta["food_ids"]).resolve(food_types or {}, "foods")
+        self._columns = None
+
+    def get_team_count(self):
+        """Returns the amount of encoded teams."""
+        return len(self.arrays["pet_offsets"]) - 1
+
+    def get_teams(self, start=0, stop=None):
+        """Returns the encoded teams, or a range of them."""
+        # The collector would otherwise run over and over while the pets are allocated, and find nothing to collect
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._get_teams(start, stop)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _get_teams(self, start, stop):
+        """Returns a range of the encoded teams."""
+        if self._columns is None:
+            self._columns = self._get_columns()
+        columns, pet_hashes, team_hashes, buffs_hashes, pet_offsets, buffs, buff_offsets, pet_buffs = self._columns
+        if stop is None:
+            stop = self.get_team_count()
+        first_pet, last_pet = pet_offsets[start], pet_offsets[stop]
+
+        # The pets are built in a single pass, and split between the teams after
+        pet_types = self.pet_types
+        status_types = self.status_types
+        new_pet = Pet.__new__
+        pets = []
+        for type_index, health, attack, level, experience, status_index, abilities_index, state_hash in zip(
+                *(column[first_pet:last_pet] for column in columns), pet_hashes[first_pet:last_pet]):
+            pet = new_pet(Pet)
+            pet.pet_type = pet_type = pet_types[type_index]
+            pet.health = health
+            pet.attack = attack
+            pet.level = level
+            pet.experience = experience
+            pet.status = status_types[status_index]
+            pet.abilities = pet_types[abilities_index - 1].abilities if abilities_index else pet_type.abilities
+            pet.buffs = ()
+            pet.state = None
+            pet.state_hash = state_hash
+            pets.append(pet)
+        for pet_index, pet_buff in pet_buffs.items():
+            if first_pet <= pet_index < last_pet:
+                pets[pet_index - first_pet].buffs = pet_buff
+
+        # The listener index of every team is summed from the triggers of its pets' types and statuses
+        type_triggers = [tuple(pet_type.triggers) + ((None,) if pet_type.listens_to_all else ()) for pet_type in pet_types]
+        status_triggers = [None] + [status.ability.trigger for status in status_types[1:]]
+        types, statuses = columns[0], columns[5]
+        new_team = Team.__new__
+        teams = []
+        for i in range(start, stop):
+            team = new_team(Team)
+            team.pets = team_pets = pets[pet_offsets[i] - first_pet:pet_offsets[i + 1] - first_pet]
+            for pet in team_pets:
+                pet.team = team
+            listeners = {}
+            status_listeners = {}
+            for j in range(pet_offsets[i], pet_offsets[i + 1]):
+                for trigger in type_triggers[types[j]]:
+                    listeners[trigger] = listeners.get(trigger, 0) + 1
+                if statuses[j]:
+                    trigger = status_triggers[statuses[j]]
+                    status_listeners[trigger] = status_listeners.get(trigger, 0) + 1
+            team.listeners = listeners
+            team.status_listeners = status_listeners
+            team.buffs = [{"health": health, "attack": attack} for health, attack in buffs[buff_offsets[i]:buff_offsets[i + 1]]]
+            team.pending_snapshots = None
+            team.state_hash = team_hashes[i]
+            team.buffs_hash = buffs_hashes[i]
+            teams.append(team)
+        return teams
+
+    def _get_columns(self):
+        """Returns the columns of the pets and teams as lists of python ints, which are much faster to build teams from
+        than numpy scalars, along with the state hashes of the pets and teams, computed for all of them at once.
+        """
+        pets = self.arrays["pets"]
+        pet_offsets = self.arrays["pet_offsets"].astype(np.int64)
+        buffs = self.arrays["buffs"].tolist()
+        buff_offsets = self.arrays["buff_offsets"].tolist()
+        pet_buffs = {}
+        for pet_index, health, attack in self.arrays["pet_buffs"].tolist():
+            pet_buffs[pet_index] = pet_buffs.get(pet_index, ()) + ((health, attack),)
+
+        # The state hash of a pet XORs a key per feature (see state_hash.pet_hash), so it's looked up per column
+        def get_keys(feature, values):
+            return np.array([zobrist_key(feature, value) for value in values], dtype=np.uint64)
+
+        values = range(256)
+        abilities_keys = get_keys("abilities", [None] + [abilities_key(pet_type.abilities) for pet_type in self.pet_types])
+        pet_hashes = (get_keys("type", [pet_type.id for pet_type in self.pet_types])[pets["type"]]
+                      ^ get_keys("health", values)[pets["health"]] ^ get_keys("attack", values)[pets["attack"]]
+                      ^ get_keys("level", values)[pets["level"]] ^ get_keys("experience", values)[pets["experience"]]
+                      ^ get_keys("status", [None] + [status.id for status in self.status_types[1:]])[pets["status"]]
+                      ^ abilities_keys[pets["abilities"]]
+                      ^ np.uint64(zobrist_key("buffs", ())))
+        for pet_index, pet_buff in pet_buffs.items():
+            pet_hashes[pet_index] ^= np.uint64(zobrist_key("buffs", ()) ^ zobrist_key("buffs", pet_buff))
+
+        # A team XORs the hashes of its pets, mixed with their positions
+        counts = np.diff(pet_offsets)
+        positions = np.arange(len(pets)) - np.repeat(pet_offsets[:-1], counts)
+        multipliers = np.array([position_hash(1, position) for position in range(int(counts.max(initial=0)))],
+                               dtype=np.uint64)
+        positioned = pet_hashes * multipliers[positions] # Wraps around at 64 bits, like position_hash
+        team_hashes = np.zeros(len(counts), dtype=np.uint64)
+        filled = counts > 0
+        if filled.any():
+            team_hashes[filled] = np.bitwise_xor.reduceat(positioned, pet_offsets[:-1][filled])
+        team_hashes = team_hashes.tolist()
+        buffs_hashes = [0] * len(team_hashes)
+        for i in range(len(team_hashes)):
+            if buff_offsets[i] != buff_offsets[i + 1]:
+                buffs_hashes[i] = multiset_hash(zobrist_key("team buff", health, attack)
+                                                for health, attack in buffs[buff_offsets[i]:buff_offsets[i + 1]])
+                team_hashes[i] ^= buffs_hashes[i]
+        columns = [pets[name].tolist() for name in PET_DTYPE.names]
+        return (columns, pet_hashes.tolist(), team_hashes, buffs_hashes, pet_offsets.tolist(), buffs, buff_offsets,
+                pet_buffs)
+
+    def get_shops(self, game):
+        """Returns the encoded shops, in the rules and the random stream of a game."""
+        from shop import Shop
+
+        shops = []
+        for turn, gold, pet_slots, food_indices in self.meta["shops"]:
+            shop = Shop(game.rules, turn, rng=game.rng)
+            shop.gold = gold
+            shop.pet_slots = [(self.pet_types[pet_index].id, health, attack) for pet_index, health, attack in pet_slots]
+            shop.foods = [self.food_types[food_index] for food_index in food_indices]
+            shop.rehash()
+            shops.append(shop)
+        return shops
+
+    def get_games(self, pet_types, food_types, status_types, rng=None):
+        """Returns the encoded game snapshots, as games that continue from their turn."""
+        from battler.game import Game
+        from battler.player import Player
+        from battler.battle_turn import BattleResult
+
+        games = []
+        # Snapshots written before lobbies had more than 2 players lack their order and the turns of their results
+        for pack, turn, players_data, results, *lobby in self.meta["games"]:
+            eliminated, last_opponents = lobby or ([], [])
+            players = []
+            for name, health, team_index in players_data:
+                player = Player(name)
+                player.health = health
+                player.team = self.get_teams(team_index, team_index + 1)[0]
+                players.append(player)
+            game = Game(pet_types, food_types, status_types, players, pack, rng)
+            game.turn = turn
+            for result, winner, loser, *result_turn in results:
+                battle_result = {"result": BattleResult(result), "winner": players[winner] if winner >= 0 else None,
+                                 "loser": players[loser] if loser >= 0 else None}
+                if result_turn and result_turn[0] >= 0:
+                    battle_result["turn"] = result_turn[0]
+                game.battle_results.append(battle_result)
+            game.eliminated = [players[i] for i in eliminated]
+            game.last_opponents = {players[i]: players[j] for i, j in last_opponents}
+            games.append(game)
+        return games
+
+
+def _get_abilities_json(abilities):
+    """Returns the JSON of the abilities of a pet, by level."""
+    return {level: getattr(ability, "json", ability) for level, ability in abilities.items()}
+
+
+def encode_teams(teams, pet_types=None):
+    """Returns the arrays of a list of teams, as written by save_teams."""
+    encoder = TeamEncoder(pet_types)
+    encoder.add_teams(teams)
+    return encoder.get_arrays()
+
+
+def decode_teams(arrays, pet_types, status_types):
+    """Returns the teams of arrays returned by encode_teams, resolving the ids against the catalog."""
+    return TeamDecoder(arrays, pet_types, status_types=status_types).get_teams()
+
+
+def save(path, encoder, compressed=False):
+    """Writes the arrays of an encoder to a file, compressed if asked to, which is smaller but slower to load."""
+    with open(path, "wb") as f:
+        (np.savez_compressed if compressed else np.savez)(f, **encoder.get_arrays())
+
+
+def load(path, pet_types, food_types=None, status_types=None):
+    """Returns a TeamDecoder of a file written by save, resolving the ids against the catalog."""
+    with np.load(path, allow_pickle=False) as arrays:
+        return TeamDecoder({name: arrays[name] for name in arrays.files}, pet_types, food_types, status_types)
+
+
+def save_teams(path, teams, pet_types=None, compressed=False):
+    """Writes a list of teams to a file, by catalog ids."""
+    encoder = TeamEncoder(pet_types)
+    encoder.add_teams(teams)
+    save(path, encoder, compressed)
+
+
+def load_teams(pet_types, status_types, path=TEAMS_PATH):
+    """Returns the teams of a file written by save_teams, resolving the ids against the catalog."""
+    return load(path, pet_types, status_types=status_types).get_teams()
+
+
+if __name__ == '__main__':
+    # Usage: python serialization.py teams.pickle [teams.npz], converts a pickled list of teams
+    import pickle
+    with open(sys.argv[1], "rb") as f:
+        pickled_teams = pickle.load(f)
+    save_teams(sys.argv[2] if len(sys.argv) > 2 else TEAMS_PATH, pickled_teams)
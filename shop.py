@@ -3,7 +3,8 @@ import random
 from food_type import FoodType
 
 from pet_type import PetType
-from pet import Pet
+from pet import Pet, MAX_HEALTH, MAX_ATTACK
+from state_hash import zobrist_key, position_hash, multiset_hash, MASK
 
 TURNS_TO_TIERS = {
     1: 1,
@@ -35,27 +36,48 @@ STARTING_GOLD_AMOUNT = 10
 class Shop:
     """Represents a shop that appears in a turn of super auto pets and lasts for a turn."""
 
-    def __init__(self, pet_types: dict[str, PetType], food_types: dict[str, FoodType], turn: int, pack, buffs: list[tuple] = []):
+    def __init__(self, rules, turn: int, buffs: list[tuple] = [], rng=random):
         """Initializes the shop.
 
         Args:
-            pet_types (dict): The dictionary of pet types in the game.
-            food_types (dict): The dictionary of food types in the game.
+            rules (GameRules): The rules of the pack of the game.
             turn_number (int): The turn number of the shop.
             buffs (list): The list of buffs to apply to the shop.
+            rng (random.Random): The random stream the shop rolls with.
         """
-        self.pet_types = pet_types
-        self.food_types = food_types
+        self.rng = rng
+        self.rules = rules
+        self.pet_types = rules.pet_types
+        self.food_types = rules.food_types
         self.turn = min(turn, 11)
         self.tier = TURNS_TO_TIERS.get(turn, 6)
         size = TIERS_TO_SIZE[self.tier]
         self.pet_max_count = size[0]
         self.food_max_count = size[1]
-        self.pack = pack
+        self.pack = rules.pack
         self.buffs = buffs
         self.gold = STARTING_GOLD_AMOUNT
         self._roll()
 
+    def rehash(self):
+        """Computes the hashes of the pet slots and foods from scratch, after they were replaced."""
+        self.slots_hash = multiset_hash(zobrist_key("slot", *slot) for slot in self.pet_slots)
+        self.foods_hash = multiset_hash(zobrist_key("food", food.id) for food in self.foods)
+
+    def get_state_hash(self):
+        """Returns a hash of the shop's state, equal for shops with equal state keys."""
+        return (zobrist_key("turn", self.turn) ^ zobrist_key("gold", self.gold) ^ position_hash(self.slots_hash, 1)
+                ^ position_hash(self.foods_hash, 2))
+
+    def state_equals(self, other):
+        """Returns True if the shops have the same state, comparing their canonical state keys."""
+        return self.get_state_key() == other.get_state_key()
+
+    def _make_pet(self, slot):
+        """Returns a new pet of a shop slot."""
+        pet_id, health, attack = slot
+        return Pet(self.pet_types[pet_id], health=health, attack=attack)
+
     def add_gold(self, amount):
         """Adds gold to the shop.
 
@@ -68,41 +90,24 @@ class Shop:
     def _roll(self):
         """Rolls the shop."""
 
-        pet_possibilities = []
-        pet_weights = []
-        for pet_type in self.pet_types.values():
-            if hasattr(pet_type, 'probabilities') and self.turn in pet_type.probabilities:
-                    pet_possibilities.append(pet_type)
-                    pet_weights.append(pet_type.probabilities[self.turn][self.pack])
-
-        rolled_pet_types = random.choices(
-            population=pet_possibilities,
-            weights=pet_weights,
+        # The pet slots are (pet id, health, attack), the pets are only instantiated when bought
+        pet_slots, pet_cum_weights = self.rules.shop_pet_tables[self.turn]
+        self.pet_slots = self.rng.choices(
+            population=pet_slots,
+            cum_weights=pet_cum_weights,
             k=self.pet_max_count
         )
-        self.pets = []
-        for pet_type in rolled_pet_types: 
-            self.pets.append(Pet(pet_type))
 
         for buff in self.buffs:
             self.buff_shop(buff["health"], buff["attack"])
 
-        food_possibilites = []
-        food_weights = []
-        for food_type in self.food_types.values():
-            if hasattr(food_type, 'probabilities') and self.turn in food_type.probabilities:
-                    food_possibilites.append(food_type)
-                    food_weights.append(food_type.probabilities[self.turn][self.pack])
-                
-        self.foods = random.choices(
+        food_possibilites, food_cum_weights = self.rules.shop_food_tables[self.turn]
+        self.foods = self.rng.choices(
             population=food_possibilites,
-            weights=food_weights,
+            cum_weights=food_cum_weights,
             k=self.food_max_count
         )
-
-        
-
-        
+        self.rehash()
 
     def can_reroll(self):
         """Returns whether the shop can reroll."""
@@ -126,8 +131,9 @@ class Shop:
             health_amount (int): The amount to add to the health of the pets.
             attack_amount (int): The amount to add to the attack of the pets.
         """
-        for pet in self.pets:
-            pet.buff(health_amount, attack_amount)
+        self.pet_slots = [(pet_id, min(health + health_amount, MAX_HEALTH), min(attack + attack_amount, MAX_ATTACK))
+                          for pet_id, health, attack in self.pet_slots]
+        self.slots_hash = multiset_hash(zobrist_key("slot", *slot) for slot in self.pet_slots)
 
     def can_buy_food(self, food: FoodType | int):
         """Returns whether the shop can buy a food."""
@@ -139,24 +145,27 @@ class Shop:
         """Returns whether the shop can buy a pet."""
         return self.gold >= PET_COST
 
-    def buy_pet(self, pet: Pet | int):
-        """Buys a pet from the shop."""
+    def buy_pet(self, pet: int):
+        """Buys the pet in a slot of the shop, returning a new pet."""
         if self.can_buy_pet():
-            if isinstance(pet, int):
-                pet = self.pets[pet]
-            self.pets.remove(pet)
             self.gold -= PET_COST
-            return pet
+            slot = self.pet_slots.pop(pet)
+            self.slots_hash = (self.slots_hash - zobrist_key("slot", *slot)) & MASK
+            return self._make_pet(slot)
         else:
             return None
 
     def get_pets(self):
-        """Returns the pets in the shop."""
-        return self.pets
+        """Returns new pets of the slots in the shop, which don't change the shop."""
+        return [self._make_pet(slot) for slot in self.pet_slots]
+
+    def get_pet_id(self, pet: int):
+        """Returns the pet type id of a slot in the shop."""
+        return self.pet_slots[pet][0]
 
     def get_pet_count(self):
         """Returns the amount of pets in the shop."""
-        return len(self.pets)
+        return len(self.pet_slots)
 
     def buy_food(self, food: FoodType | int):
         """Buys a food from the shop."""
@@ -164,6 +173,7 @@ class Shop:
             food = self.foods[food]
         if self.can_buy_food(food):
             self.foods.remove(food)
+            self.foods_hash = (self.foods_hash - zobrist_key("food", food.id)) & MASK
             self.gold -= food.cost
             return food
         return None
@@ -178,17 +188,33 @@ class Shop:
 
     def add_pet_by_tier(self, tier):
         """Adds a pet to the shop."""
-        if len(self.pets) < self.pet_size:
-            pet_types_in_tier = PetType.by_tier(self.pet_types, tier)
-            pet_type = random.choice(pet_types_in_tier)
-            self.pets.append(Pet(pet_type))
+        if len(self.pet_slots) < self.pet_max_count:
+            pet_type = self.rng.choice(self.rules.pets_by_tier[tier])
+            slot = (pet_type.id, pet_type.health, pet_type.attack)
+            self.pet_slots.append(slot)
+            self.slots_hash = (self.slots_hash + zobrist_key("slot", *slot)) & MASK
+
+    def get_state_key(self):
+        """Returns a hashable key of the shop, ignoring the order of the slots, which only changes the indices of moves."""
+        return self.turn, self.gold, tuple(sorted(self.pet_slots)), tuple(sorted(food.id for food in self.foods))
 
     def clone(self):
-        new_shop = Shop(self.pet_types, self.food_types, self.turn, self.pack, self.buffs)
+        """Returns a clone of the shop, without rolling."""
+        # Slots are immutable tuples, so copying the lists is enough
+        new_shop = Shop.__new__(Shop)
+        new_shop.rng = self.rng
+        new_shop.rules = self.rules
+        new_shop.pet_types = self.pet_types
+        new_shop.food_types = self.food_types
+        new_shop.turn = self.turn
+        new_shop.tier = self.tier
+        new_shop.pet_max_count = self.pet_max_count
+        new_shop.food_max_count = self.food_max_count
+        new_shop.pack = self.pack
+        new_shop.buffs = self.buffs
         new_shop.gold = self.gold
-        new_shop.pets = []
-        for pet in self.pets:
-            pet_clone = pet.clone()
-            new_shop.pets.append(pet_clone)
+        new_shop.pet_slots = self.pet_slots[:]
         new_shop.foods = self.foods[:]
+        new_shop.slots_hash = self.slots_hash
+        new_shop.foods_hash = self.foods_hash
         return new_shop
\ No newline at end of file
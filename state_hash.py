@@ -0,0 +1,58 @@
+import hashlib
+import json
+
+# Zobrist-style hashing of game states: every (feature, value) gets a random 64-bit key, and a state hashes to the XOR
+# of the keys of its features, so changing a feature only XORs its old key out and its new key in. The keys are derived
+# from the features themselves, so hashes are stable across processes.
+MASK = (1 << 64) - 1
+
+_keys = {}
+_multipliers = []
+
+
+def zobrist_key(*feature):
+    """Returns the random 64-bit key of a feature."""
+    key = _keys.get(feature)
+    if key is None:
+        key = _keys[feature] = int.from_bytes(hashlib.blake2b(repr(feature).encode(), digest_size=8).digest(), "little")
+    return key
+
+
+def position_hash(value_hash, position):
+    """Returns a hash mixed with a position, so equal hashes at different positions don't cancel out when XORed."""
+    while len(_multipliers) <= position:
+        _multipliers.append(zobrist_key("position", len(_multipliers)) | 1) # Odd, so the mix can't lose bits
+    return (value_hash * _multipliers[position]) & MASK
+
+
+def abilities_key(abilities):
+    """Returns a stable identity of the abilities of a pet type: the ids of the pet types they belong to, by level.
+
+    Abilities that belong to no pet type, like ones unpickled in their JSON form, are identified by their JSON.
+    """
+    return tuple(ability.owner if ability.owner is not None else json.dumps(ability.json, sort_keys=True)
+                 for ability in abilities.values())
+
+
+def pet_abilities_key(pet):
+    """Returns None for a pet with its own abilities, or the abilities_key of the ones it carries after a transfer."""
+    if pet.abilities is pet.pet_type.abilities:
+        return None
+    # Unpickled pets carry copies of their own abilities
+    key = abilities_key(pet.abilities)
+    return None if key == abilities_key(pet.pet_type.abilities) else key
+
+
+def pet_hash(pet):
+    """Returns the hash of a pet's state."""
+    pet_type = pet.pet_type
+    abilities = pet_abilities_key(pet)
+    return (zobrist_key("type", pet_type.id) ^ zobrist_key("health", pet.health) ^ zobrist_key("attack", pet.attack)
+            ^ zobrist_key("level", pet.level) ^ zobrist_key("experience", pet.experience)
+            ^ zobrist_key("status", pet.status.id if pet.status else None) ^ zobrist_key("buffs", pet.buffs)
+            ^ zobrist_key("abilities", abilities))
+
+
+def multiset_hash(item_hashes):
+    """Returns the hash of an unordered collection, which adds the hashes so repeated items don't cancel out."""
+    return sum(item_hashes) & MASK
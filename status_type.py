@@ -1,4 +1,5 @@
 import json
+from ability import Ability
 
 class StatusType:
     """Represents a status type from Super Auto Pets"""
@@ -9,9 +10,24 @@ class StatusType:
             food_json = json.loads(food_json)
         self.name = food_json['name']
         self.id = food_json['id']
-        self.image_data = food_json['image']
-        self.ability = food_json['ability']
-        
+        self.image_data = food_json.get('image')
+        self._init_ability(food_json['ability'])
+
+    def _init_ability(self, ability):
+        """Initializes the ability of the status type, and which damage it modifies."""
+        from pet import ABILITY_HANDLERS
+        if isinstance(ability, dict):
+            ability = Ability(ability, ABILITY_HANDLERS)
+        self.ability = ability
+        modifies_damage = ability.effect.kind == "ModifyDamage"
+        self.modifies_damage_dealt = modifies_damage and ability.trigger == "WhenAttacking"
+        self.modifies_damage_taken = modifies_damage and ability.trigger == "WhenDamaged"
+
+    def __setstate__(self, state):
+        """Restores a pickled status type, compiling an ability that was pickled in its JSON form."""
+        self.__dict__.update(state)
+        self._init_ability(self.ability)
+
     def __str__(self):
         """Returns a string representation of the status type."""
         return self.name
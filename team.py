@@ -1,9 +1,15 @@
 from pet import Pet
+from state_hash import zobrist_key, position_hash, pet_hash, pet_abilities_key, multiset_hash, MASK
 
 
 class Team:
     """Represents a team of pets in super auto pets."""
     TEAM_SIZE = 5
+    # listeners and status_listeners count the pets listening to each event through their type or their status, so
+    # events nobody listens to can be skipped without walking the pets. Pets listening to every event count under None.
+    # state_hash is kept up to date as the team changes, as the XOR of the position mixed state_hash of every pet and
+    # of buffs_hash. It's None for teams that don't track it, like the clones battles are played on.
+    __slots__ = ("pets", "buffs", "listeners", "status_listeners", "pending_snapshots", "state_hash", "buffs_hash")
 
     def __init__(self, pets=None, buffs=None):
         self.pets = pets
@@ -12,6 +18,87 @@ class Team:
         self.buffs = buffs
         if buffs is None:
             self.buffs = []
+        self.pending_snapshots = None # PetsSnapshots to copy the pets into before they change
+        self.index_pets()
+        self.rehash()
+
+    def __setstate__(self, state):
+        """Restores a pickled team."""
+        if isinstance(state, tuple): # Slotted teams pickle their state as (None, slots)
+            state = state[1]
+        self.pets = state["pets"]
+        self.buffs = state["buffs"]
+        self.pending_snapshots = None
+        self.index_pets()
+        self.rehash()
+
+    def rehash(self):
+        """Computes the state hash of the team from scratch, and starts keeping it up to date."""
+        state_hash = 0
+        for position, pet in enumerate(self.pets):
+            pet.state_hash = pet_hash(pet)
+            state_hash ^= position_hash(pet.state_hash, position)
+        self.buffs_hash = multiset_hash(zobrist_key("team buff", buff["health"], buff["attack"]) for buff in self.buffs)
+        self.state_hash = state_hash ^ self.buffs_hash
+
+    def get_state_hash(self):
+        """Returns a hash of the team's state, equal for teams with equal state keys."""
+        if self.state_hash is not None:
+            return self.state_hash
+        state_hash = multiset_hash(zobrist_key("team buff", buff["health"], buff["attack"]) for buff in self.buffs)
+        for position, pet in enumerate(self.pets):
+            state_hash ^= position_hash(pet_hash(pet), position)
+        return state_hash
+
+    def state_equals(self, other):
+        """Returns True if the teams have the same state, comparing their canonical state keys."""
+        return self.get_state_key() == other.get_state_key()
+
+    def update_pet_hash(self, pet):
+        """Updates the state hash after a pet of the team changed."""
+        if self.state_hash is None:
+            return
+        new_hash = pet_hash(pet)
+        if new_hash == pet.state_hash:
+            return
+        for position, team_pet in enumerate(self.pets):
+            if team_pet is pet:
+                self.state_hash ^= position_hash(pet.state_hash, position) ^ position_hash(new_hash, position)
+                pet.state_hash = new_hash
+                return
+
+    def _toggle_pet_hashes(self, start, offset=0):
+        """XORs the hashes of the pets from start, at their position plus the offset, in or out of the state hash."""
+        pets = self.pets
+        for position in range(start, len(pets)):
+            self.state_hash ^= position_hash(pets[position].state_hash, position + offset)
+
+    def index_pets(self):
+        """Rebuilds the listener index from the pets of the team."""
+        self.listeners = {}
+        self.status_listeners = {}
+        for pet in self.pets:
+            self.index_pet(pet, 1)
+
+    def index_pet(self, pet, count):
+        """Adds a pet to the listener index, or removes it with a count of -1."""
+        pet_type = pet.pet_type
+        for trigger in pet_type.triggers:
+            self.listeners[trigger] = self.listeners.get(trigger, 0) + count
+        if pet_type.listens_to_all:
+            self.listeners[None] = self.listeners.get(None, 0) + count
+        if pet.status:
+            self.index_status(pet.status, count)
+
+    def index_status(self, status, count):
+        """Adds a status of a pet in the team to the listener index, or removes it with a count of -1."""
+        trigger = status.ability.trigger
+        self.status_listeners[trigger] = self.status_listeners.get(trigger, 0) + count
+
+    def has_listeners(self, event_type, include_status=True):
+        """Returns True if any pet in the team listens to the event, through its type or optionally its status."""
+        return bool(self.listeners.get(event_type) or self.listeners.get(None)
+                    or (include_status and self.status_listeners.get(event_type)))
 
     def can_add_pet(self):
         """Returns True if the team has room for another pet."""
@@ -25,10 +112,20 @@ class Team:
     def add_pet(self, pet, index=-1):
         """Add a pet to the team."""
         if self.can_add_pet():
+            if self.pending_snapshots:
+                self.take_snapshots()
             if index == -1:
                 self.pets.append(pet)
             else:
                 self.pets.insert(index, pet)
+            self.index_pet(pet, 1)
+            if self.state_hash is not None:
+                # The pets behind the new pet move up a position
+                position = self.pets.index(pet)
+                self._toggle_pet_hashes(position + 1, -1)
+                self._toggle_pet_hashes(position + 1)
+                pet.state_hash = pet_hash(pet)
+                self.state_hash ^= position_hash(pet.state_hash, position)
             return True
         else:
             return False
@@ -39,26 +136,66 @@ class Team:
         if isinstance(pet, int):
             pet = self.pets[pet]
         if pet in self.pets:
-            self.pets.remove(pet)
+            if self.pending_snapshots:
+                self.take_snapshots()
+            if self.state_hash is not None:
+                # The pets behind the removed pet move down a position
+                position = self.pets.index(pet)
+                self._toggle_pet_hashes(position)
+                self.pets.pop(position)
+                self._toggle_pet_hashes(position)
+            else:
+                self.pets.remove(pet)
+            self.index_pet(pet, -1)
             return True
         else:
             return False
 
+    def take_snapshots(self):
+        """Copies the pets into the pending snapshots, before the pets change."""
+        pets = self.pets[:]
+        for snapshot in self.pending_snapshots:
+            snapshot.pets = pets
+        self.pending_snapshots.clear()
+
     def add_buff(self, health_amount, attack_amount):
         """Add a buff to the team."""
         self.buffs.append({"health": health_amount, "attack": attack_amount})
+        if self.state_hash is not None:
+            buffs_hash = (self.buffs_hash + zobrist_key("team buff", health_amount, attack_amount)) & MASK
+            self.state_hash ^= self.buffs_hash ^ buffs_hash
+            self.buffs_hash = buffs_hash
+
+    def get_state_key(self):
+        """Returns a hashable key of the team, equal for teams with the same pets and buffs."""
+        pets = []
+        for pet in self.pets:
+            pets.append((pet.pet_type.id, pet.level, pet.experience, pet.health, pet.attack,
+                         pet.status.id if pet.status else None, pet.buffs, pet_abilities_key(pet)))
+        return tuple(pets), tuple((buff["health"], buff["attack"]) for buff in self.buffs)
 
     def __str__(self) -> str:
         """Returns a string representation of the team."""
         return f"Team: {list(map(str, self.pets))}"
 
-    def clone(self):
-        """Returns a copy of the team."""
-        new_team = Team(buffs=self.buffs[:])
-        for pet in self.pets:
-            pet_clone = pet.clone()
-            pet_clone.team = new_team
-            new_team.add_pet(pet_clone)
+    def clone(self, track_hash=True):
+        """Returns a copy of the team, which keeps its state hash up to date unless track_hash is False."""
+        new_team = Team.__new__(Team)
+        new_team.buffs = self.buffs[:]
+        new_team.listeners = self.listeners.copy()
+        new_team.status_listeners = self.status_listeners.copy()
+        new_team.pending_snapshots = None
+        new_team.pets = pets = [pet.clone() for pet in self.pets]
+        for pet in pets:
+            pet.team = new_team
+        new_team.state_hash = None
+        new_team.buffs_hash = None
+        if track_hash:
+            if self.state_hash is None or any(pet.buffs for pet in self.pets):
+                new_team.rehash() # Clones don't keep buffs until the end of battle, which changes their hashes
+            else:
+                new_team.state_hash = self.state_hash
+                new_team.buffs_hash = self.buffs_hash
         return new_team
 
 
@@ -0,0 +1,32 @@
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import CATALOG_PATH, load_catalog
+from battler.game import Game
+from battler.player import Player
+
+# The catalog the tests run on, written by build_catalog. Tests are skipped without one, since building it downloads the
+# game's data.
+TEST_CATALOG_PATH = os.environ.get("SAP_CATALOG", os.path.join(ROOT, CATALOG_PATH))
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """The (pet types, food types, status types) of the test catalog."""
+    if not os.path.exists(TEST_CATALOG_PATH):
+        pytest.skip(f"No catalog at {TEST_CATALOG_PATH}, build one with catalog.py or set SAP_CATALOG")
+    return load_catalog(TEST_CATALOG_PATH)
+
+
+@pytest.fixture
+def make_game(catalog):
+    """Returns a function that creates a seeded game of players with the given names."""
+    def make(seed=0, players=("Me",), pack="StandardPack"):
+        return Game(*catalog, [Player(name) for name in players], pack, random.Random(seed))
+    return make
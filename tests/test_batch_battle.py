@@ -0,0 +1,30 @@
+import random
+
+import numpy as np
+
+from battler.battle_turn import BattleTurn
+from battler.batch_battle import BatchBattle, encode_team
+from battler.battle_cache import battle_can_be_random
+from bench.fixtures import make_synthetic_team
+
+
+def make_kernel_matchups(game, count, seed):
+    """Returns random matchups of the game's pack that the kernel plays, and that don't involve any randomness."""
+    rng = random.Random(seed)
+    matchups = []
+    while len(matchups) < count:
+        team_1, team_2 = make_synthetic_team(game.rules, rng), make_synthetic_team(game.rules, rng)
+        if encode_team(team_1) is not None and encode_team(team_2) is not None and \
+                not battle_can_be_random(team_1, team_2, game):
+            matchups.append((team_1, team_2))
+    return matchups
+
+
+def test_kernel_matches_battle_turn(make_game):
+    """The kernel plays deterministic battles exactly like BattleTurn."""
+    game = make_game()
+    matchups = make_kernel_matchups(game, 400, seed=3)
+    expected = np.array([BattleTurn(team_1, team_2, game).play().value for team_1, team_2 in matchups])
+    assert len(set(expected.tolist())) == 3
+    results = BatchBattle(matchups, make_game(1)).play()
+    assert results.tolist() == expected.tolist()
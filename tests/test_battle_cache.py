@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from pet import Pet
+from team import Team
+from battler.battle_turn import BattleTurn
+from battler.battle_cache import DEFAULT_SAMPLES, BattleCache, team_fingerprint
+
+
+def make_parrot_team(pet_types, abilities=None):
+    return Team([Pet(pet_types["pet-parrot"], abilities=abilities)])
+
+
+def test_transferred_abilities_are_cached_apart(catalog, make_game):
+    """A parrot that copied an ability battles differently than a plain one, so they don't share outcomes."""
+    pet_types = catalog[0]
+    game = make_game()
+    copied = make_parrot_team(pet_types, pet_types["pet-sheep"].abilities)
+    plain = make_parrot_team(pet_types)
+    assert team_fingerprint(copied) != team_fingerprint(plain)
+
+    def make_opponent():
+        return Team([Pet(pet_types["pet-fish"]), Pet(pet_types["pet-fish"])])
+
+    expected = [BattleTurn(team.clone(), make_opponent(), game).play() for team in (copied, plain)]
+    assert expected[0] != expected[1]
+    cache = BattleCache()
+    assert [cache.play(team, make_opponent(), game) for team in (copied, plain)] == expected
+
+
+def test_rejects_other_versions(tmp_path):
+    path = tmp_path / "cache.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE outcomes (key TEXT PRIMARY KEY, team_1_wins INTEGER, team_2_wins INTEGER, "
+                       "draws INTEGER)")
+    connection.commit()
+    connection.close()
+    with pytest.raises(ValueError):
+        BattleCache(path=path)
+    path.unlink()
+    BattleCache(path=path).close()
+    BattleCache(path=path).close()
+
+
+def test_random_battles_are_sampled(catalog, make_game):
+    """Battles that can be random are played until the cache recorded enough outcomes to sample them from."""
+    pet_types = catalog[0]
+    game = make_game()
+    team_1 = Team([Pet(pet_types["pet-mosquito"]), Pet(pet_types["pet-fish"])])
+    team_2 = Team([Pet(pet_types["pet-ant"]), Pet(pet_types["pet-ant"])])
+    cache = BattleCache()
+    for _ in range(DEFAULT_SAMPLES + 2):
+        cache.play(team_1.clone(), team_2.clone(), game)
+    assert (cache.misses, cache.hits) == (DEFAULT_SAMPLES, 2)
+    assert sum(cache.get_outcomes(cache.get_key(team_1, team_2, game))) == DEFAULT_SAMPLES > 1
@@ -0,0 +1,29 @@
+from pet import Pet
+from team import Team
+from battler.battle_cache import team_fingerprint
+from battler.battle_turn import BattleTurn
+from battler.executor import BattleExecutor, team_from_fingerprint
+
+
+def test_fingerprint_keeps_transferred_abilities(catalog):
+    pet_types, _, status_types = catalog
+    team = Team([Pet(pet_types["pet-ant"]), Pet(pet_types["pet-parrot"], abilities=pet_types["pet-sheep"].abilities,
+                                                level=2, status=status_types["status-melon-armor"])])
+    rebuilt = team_from_fingerprint(team_fingerprint(team), pet_types, status_types)
+    assert rebuilt.pets[1].abilities is pet_types["pet-sheep"].abilities
+    assert rebuilt.pets[0].abilities is pet_types["pet-ant"].abilities
+    assert rebuilt.get_state_key() == team.get_state_key()
+
+
+def test_executor_battles_transferred_abilities(catalog, make_game):
+    pet_types = catalog[0]
+    game = make_game()
+    teams = [Team([Pet(pet_types["pet-parrot"], abilities=abilities)])
+             for abilities in (pet_types["pet-sheep"].abilities, None)]
+
+    def make_opponent():
+        return Team([Pet(pet_types["pet-fish"]), Pet(pet_types["pet-fish"])])
+
+    expected = [BattleTurn(team.clone(), make_opponent(), game).play() for team in teams]
+    with BattleExecutor(*catalog, max_workers=1) as executor:
+        assert list(executor.battle([(team, make_opponent()) for team in teams], game.pack, seed=0)) == expected
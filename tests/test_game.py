@@ -0,0 +1,32 @@
+from battler.battle_cache import battle_can_be_random
+from battler.battle_turn import BattleTurn
+from battler.executor import BattleExecutor
+from battler.shop_turn import ShopTurn
+from serialization import encode_teams, decode_teams
+
+
+def test_executor_battles_end_like_serial(catalog, make_game):
+    pet_types, _, status_types = catalog
+    buffed = 0
+    with BattleExecutor(*catalog, max_workers=1) as executor:
+        for seed in range(6):
+            game = make_game(seed, players=("A", "B", "C", "D"))
+            for _ in range(8):
+                for player in game.players:
+                    ShopTurn(player, game).play()
+                matchups = [(game.players[i].team, game.players[i + 1].team) for i in (0, 2)]
+                buffed += sum(bool(pet.buffs) for team_1, team_2 in matchups for pet in team_1.pets + team_2.pets)
+
+                # Clones drop the buffs that last until the end of battle, serialized copies keep them
+                serial = [tuple(decode_teams(encode_teams(teams), pet_types, status_types)) for teams in matchups]
+                expected = [BattleTurn(team_1, team_2, game).play() for team_1, team_2 in serial]
+                results = game.play_battles(matchups, executor)
+                for (team_1, team_2), (serial_1, serial_2), result, expected_result in zip(matchups, serial, results,
+                                                                                          expected):
+                    assert team_1.get_state_key() == serial_1.get_state_key()
+                    assert team_2.get_state_key() == serial_2.get_state_key()
+                    if not battle_can_be_random(team_1, team_2, game):
+                        assert result == expected_result
+                game.turn += 1
+    # Shop turns give buffs until the end of battle, so the battles have some to remove
+    assert buffed
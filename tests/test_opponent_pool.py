@@ -0,0 +1,33 @@
+import random
+
+import numpy as np
+
+from battler.battle_turn import BattleTurn
+from battler.batch_battle import encode_team
+from battler.battle_cache import battle_can_be_random
+from bench.fixtures import make_synthetic_team
+from opponent_pool import OpponentPool, save_pool
+
+
+def test_pool_battles_match_battle_turn(catalog, make_game, tmp_path):
+    """Battles against stored opponents have the results of BattleTurn on the original teams."""
+    pet_types, _, status_types = catalog
+    game = make_game()
+    rng = random.Random(5)
+    opponents = [make_synthetic_team(game.rules, rng) for _ in range(200)]
+    save_pool(tmp_path, opponents, pet_types, chunk_size=64)
+    pool = OpponentPool(tmp_path, pet_types, status_types)
+    assert len(pool) == len(opponents)
+
+    kernel_battles = battles = 0
+    for _ in range(10):
+        team = make_synthetic_team(game.rules, rng)
+        indices = np.array([i for i, opponent in enumerate(opponents)
+                            if not battle_can_be_random(team, opponent, game)], dtype=np.int64)
+        expected = [BattleTurn(team, opponents[i], game).play().value for i in indices]
+        assert pool.battle(team, game, indices, chunk_size=32).tolist() == expected
+        battles += len(indices)
+        if encode_team(team) is not None:
+            kernel_battles += int(pool.encode(indices)[2].sum())
+    # Both the kernel and BattleTurn played some of the battles
+    assert 0 < kernel_battles < battles
@@ -0,0 +1,16 @@
+from battler.shop_turn import ShopTurn
+from mcts.search import MonteCarloTreeSearch
+
+
+def test_colliding_hashes_keep_states_apart(make_game, monkeypatch):
+    game = make_game(1)
+    game.turn = 3
+    shop_turn = ShopTurn(game.players[0], game)
+    # Every state hashes the same, so only the state keys can tell them apart
+    monkeypatch.setattr(ShopTurn, "get_state_hash", lambda self: 0)
+    search = MonteCarloTreeSearch(shop_turn, lambda leaf_turn: len(leaf_turn.team.pets))
+    search.search(iterations=200)
+    keys = [child.state_key for _, child in search.root.children]
+    assert len(keys) > 1
+    assert len(set(keys)) == len(keys)
+    assert search.root.state_key not in keys
@@ -0,0 +1,51 @@
+from battler.shop_turn import ShopTurn
+from pet import Pet
+from team import Team
+from serialization import TeamEncoder, save, load, save_teams, load_teams
+
+
+def play_game(make_game, seed):
+    """Returns a seeded game of two players after some shop turns, and the shop of a turn after them."""
+    game = make_game(seed, players=("A", "B"), pack="StandardPack" if seed % 2 else "ExpansionPack1")
+    for turn in range(1, 2 + seed % 8):
+        game.turn = turn
+        for player in game.players:
+            ShopTurn(player, game).play()
+    return game, ShopTurn(game.players[0], game).shop
+
+
+def test_teams_round_trip(catalog, make_game, tmp_path):
+    pet_types, _, status_types = catalog
+    teams = [player.team for seed in range(20) for player in play_game(make_game, seed)[0].players]
+    # A pet carrying another type's abilities, like after a transfer
+    teams.append(Team([Pet(pet_types["pet-ant"], abilities=pet_types["pet-whale"].abilities, level=2)]))
+    path = tmp_path / "teams.npz"
+    save_teams(path, teams, pet_types)
+    loaded = load_teams(pet_types, status_types, path)
+    assert [team.get_state_key() for team in loaded] == [team.get_state_key() for team in teams]
+    assert [team.get_state_hash() for team in loaded] == [team.get_state_hash() for team in teams]
+
+
+def test_games_and_shops_round_trip(catalog, make_game, tmp_path):
+    pet_types, food_types, status_types = catalog
+    encoder = TeamEncoder(pet_types)
+    games, shops = [], []
+    for seed in range(20):
+        game, shop = play_game(make_game, seed)
+        encoder.add_game(game)
+        encoder.add_shop(shop)
+        games.append(game)
+        shops.append(shop)
+    path = tmp_path / "snapshots.npz"
+    save(path, encoder)
+    decoder = load(path, pet_types, food_types, status_types)
+
+    loaded_games = decoder.get_games(pet_types, food_types, status_types)
+    for game, loaded_game in zip(games, loaded_games, strict=True):
+        assert (loaded_game.pack, loaded_game.turn) == (game.pack, game.turn)
+        for player, loaded_player in zip(game.players, loaded_game.players, strict=True):
+            assert (loaded_player.name, loaded_player.health) == (player.name, player.health)
+            assert loaded_player.team.get_state_key() == player.team.get_state_key()
+    loaded_shops = decoder.get_shops(loaded_games[0])
+    assert [shop.get_state_key() for shop in loaded_shops] == [shop.get_state_key() for shop in shops]
+    assert [shop.get_state_hash() for shop in loaded_shops] == [shop.get_state_hash() for shop in shops]
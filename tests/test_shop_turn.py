@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+from battler.shop_turn import ShopTurn
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_unmake_move_restores_state(make_game, seed):
+    rng = random.Random(seed)
+    game = make_game(seed, pack="StandardPack" if seed % 2 else "ExpansionPack1")
+    game.turn = 1 + seed % 11
+    shop_turn = ShopTurn(game.players[0], game)
+    keys = []
+    for _ in range(12):
+        moves = shop_turn.get_move_options()[0]
+        if not moves:
+            break
+        keys.append(shop_turn.get_state_key())
+        shop_turn.make_move(moves[rng.randrange(len(moves))])
+        if rng.random() < 0.4:
+            shop_turn.unmake_move()
+            assert shop_turn.get_state_key() == keys.pop()
+    while keys:
+        shop_turn.unmake_move()
+        assert shop_turn.get_state_key() == keys.pop()
+    assert not shop_turn.undo_log
@@ -0,0 +1,33 @@
+import pytest
+
+from battler.executor import GameSpec
+from battler.simulation import simulate_games, read_records
+
+
+class Interrupted(Exception):
+    pass
+
+
+def make_specs(count, interrupt_at=None):
+    """Yields the specs of seeded games, raising Interrupted at an index if given, like a stopped campaign."""
+    for i in range(count):
+        if i == interrupt_at:
+            raise Interrupted
+        players = ("A", "B", "C") if i % 3 == 0 else ("Me", "You")
+        yield GameSpec("StandardPack" if i % 2 else "ExpansionPack1", players, i)
+
+
+def test_resumed_run_matches_uninterrupted(catalog, tmp_path):
+    path, resumed_path = str(tmp_path / "games.jsonl"), str(tmp_path / "resumed.jsonl")
+    stats = simulate_games(make_specs(40), path, *catalog, checkpoint_every=10)
+
+    # Interrupted between checkpoints, so records were written after the last one
+    with pytest.raises(Interrupted):
+        simulate_games(make_specs(40, interrupt_at=27), resumed_path, *catalog, checkpoint_every=10)
+    assert sum(1 for _ in read_records(resumed_path)) == 27
+    resumed_stats = simulate_games(make_specs(40), resumed_path, *catalog, checkpoint_every=10)
+
+    assert resumed_stats == stats
+    with open(path, "rb") as f, open(resumed_path, "rb") as resumed_f:
+        assert resumed_f.read() == f.read()
+    assert [record["index"] for record in read_records(resumed_path)] == list(range(40))
@@ -0,0 +1,49 @@
+import pickle
+
+import pytest
+
+from battler.shop_turn import ShopTurn
+from pet import Pet
+from team import Team
+from state_hash import zobrist_key, position_hash, pet_hash, multiset_hash
+
+
+def get_scratch_hash(shop_turn):
+    """Returns the state hash of a turn computed from scratch, instead of kept up to date."""
+    team = shop_turn.team
+    team_hash = multiset_hash(zobrist_key("team buff", buff["health"], buff["attack"]) for buff in team.buffs)
+    for position, pet in enumerate(team.pets):
+        team_hash ^= position_hash(pet_hash(pet), position)
+    shop = shop_turn.shop.clone()
+    shop.rehash()
+    return team_hash ^ position_hash(shop.get_state_hash(), 1)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_hash_matches_scratch(make_game, seed):
+    game = make_game(seed, pack="StandardPack" if seed % 2 else "ExpansionPack1")
+    player = game.players[0]
+    for turn in range(1, 8):
+        game.turn = turn
+        shop_turn = ShopTurn(player, game)
+        shop_turn.trigger_event("StartOfTurn", shop_turn.event_data)
+        assert shop_turn.get_state_hash() == get_scratch_hash(shop_turn)
+        for _ in range(30):
+            move = shop_turn.choose_move()
+            if not move or not shop_turn.play_move(move):
+                break
+            assert shop_turn.get_state_hash() == get_scratch_hash(shop_turn)
+        shop_turn.end_turn()
+        assert shop_turn.get_state_hash() == get_scratch_hash(shop_turn)
+
+
+def test_transferred_abilities_hash_by_owner(catalog):
+    pet_types = catalog[0]
+    team = Team([Pet(pet_types["pet-ant"]), Pet(pet_types["pet-ant"], abilities=pet_types["pet-whale"].abilities)])
+    state_hash = team.get_state_hash()
+    assert state_hash != Team([Pet(pet_types["pet-ant"]), Pet(pet_types["pet-ant"])]).get_state_hash()
+    # Unpickled abilities are copies, but they still belong to the same pet type
+    copy = pickle.loads(pickle.dumps(team))
+    assert copy.pets[1].abilities is not team.pets[1].abilities
+    assert copy.get_state_key() == team.get_state_key()
+    assert copy.get_state_hash() == state_hash
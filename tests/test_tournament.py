@@ -0,0 +1,37 @@
+import random
+
+from battler.battle_cache import BattleCache
+from battler.battle_turn import BattleResult
+from battler.game import Game
+from battler.player import Player
+from battler.shop_turn import ShopTurn
+from battler.tournament import SwissTournament
+
+
+def test_swiss_finds_round_robin_top(catalog):
+    # Teams made like pickle_best_teams makes them
+    teams = {}
+    for seed in range(400):
+        player = Player("Me")
+        ShopTurn(player, Game(*catalog, [player], "StandardPack", random.Random(seed))).play()
+        teams.setdefault(player.team.get_state_key(), player.team.clone())
+    teams = list(teams.values())
+    game = Game(*catalog, [Player("Me")], "StandardPack", random.Random(0))
+
+    # A single sample per battle makes the cache answer the tournament with the round robin's results
+    cache = BattleCache(samples=1)
+    pairs = [(i, j) for i in range(len(teams)) for j in range(i + 1, len(teams))]
+    non_losses = [0] * len(teams)
+    for (i, j), result in zip(pairs, cache.play_batch([(teams[i], teams[j]) for i, j in pairs], game)):
+        result = BattleResult(int(result))
+        non_losses[i] += result != BattleResult.TEAM_2_WIN
+        non_losses[j] += result != BattleResult.TEAM_1_WIN
+
+    top_k = 25
+    tournament = SwissTournament(teams, game, top_k=top_k, cache=cache)
+    tournament.play()
+    # Teams tied with the round robin's k-th best are as good a pick as it
+    kth = sorted(non_losses, reverse=True)[top_k - 1]
+    found = sum(non_losses[i] >= kth for i in tournament.get_top())
+    assert found >= 0.85 * top_k
+    assert tournament.battles < 0.2 * len(pairs)